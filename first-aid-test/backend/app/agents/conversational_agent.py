@@ -1,10 +1,20 @@
 # agents/conversational_agent.py
 # Orchestrates the flow among classifier, instruction, verification, and scoring.
-from typing import Dict, List, Optional
-from difflib import get_close_matches
+from typing import AsyncIterator, Dict, FrozenSet, Iterator, List, Optional, Tuple
+import asyncio
+import contextvars
+import time
 import re
-from . import emergency_classifier, instruction_agent, verification_agent, security_agent
-from ..services import mcp_server
+import threading
+from . import emergency_classifier, fused_agent, instruction_agent, local_triage, verification_agent, security_agent
+from ..services import admission, mcp_client, metrics, redaction
+from ..services.response_cache import CACHE as RESPONSE_CACHE
+from ..services.vectors import Embedding
+from ..services.fuzzy_index import SpellIndex, load_vocabulary
+from ..config import (
+    CLARIFY_VOCAB_PATH, CLARIFY_DICTIONARY_PATH, CLARIFY_MAX_EDIT_DISTANCE, BATCH_CONCURRENCY, BATCH_EMBED_SIZE,
+    LLM_FUSED_ENABLED, TOOLS_COUNTRY_CODE, has_openai,
+)
 import logging
 from ..services.risk_confidence import score_risk_confidence
 
@@ -26,75 +36,577 @@ def _gather_user_context(history: Optional[List[Dict]], user_input: str) -> str:
     return " \n".join(user_turns[-3:]).strip()
 
 
+def _build_spell_index() -> SpellIndex:
+    global _DICTIONARY
+    terms, _ = load_vocabulary(CLARIFY_VOCAB_PATH)
+    _DICTIONARY = frozenset(load_vocabulary(CLARIFY_DICTIONARY_PATH)[0])
+    return SpellIndex(list(terms) + sorted(KNOWN_EMERGENCY_TERMS), max_distance=CLARIFY_MAX_EDIT_DISTANCE)
+
+
+# English words ("should", "sling", "strait") that sit within an edit or two of a
+# vocabulary term but are spelled correctly; loaded with the spelling index.
+_DICTIONARY: FrozenSet[str] = frozenset()
+_SPELL_INDEX: Optional[SpellIndex] = None
+_SPELL_LOCK = threading.Lock()
+
+
+def spell_index() -> SpellIndex:
+    """The clarification spelling index, built once from the vocabulary file."""
+    global _SPELL_INDEX
+    if _SPELL_INDEX is None:
+        with _SPELL_LOCK:
+            if _SPELL_INDEX is None:
+                _SPELL_INDEX = _build_spell_index()
+    return _SPELL_INDEX
+
+
+# Irregular forms of vocabulary terms that suffix stripping cannot reach.
+_INFLECTIONS = {
+    "bled": "bleeding", "bleed": "bleeding", "bleeds": "bleeding", "broke": "break", "broken": "break",
+    "bit": "bite", "bitten": "bite", "burnt": "burn", "stung": "sting", "swollen": "swelling",
+    "choking": "choke", "dizziness": "dizzy", "fainting": "faint", "drowned": "drowning",
+}
+
+_SUFFIXES = ("ing", "ed", "es", "s", "d", "ly", "ness", "er")
+
+
+def _stems(token: str) -> List[str]:
+    """Candidate base forms of ``token``: "burned" -> "burn", "choked" -> "choke", "cutting" -> "cut"."""
+    out = [_INFLECTIONS[token]] if token in _INFLECTIONS else []
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            base = token[: -len(suffix)]
+            out += [base, base + "e"]
+            if base.endswith("i"):
+                out.append(base[:-1] + "y")
+            if base[-1] == base[-2]:
+                out.append(base[:-1])
+    return out
+
+
+def _is_known(token: str, index: SpellIndex) -> bool:
+    # Only the token itself is looked up in the dictionary: a stripped "bleding" -> "bled" is a word too.
+    return token in index or token in _DICTIONARY or any(stem in index for stem in _stems(token))
+
+
+def suggest_terms(text: str, limit: int = 3) -> List[Dict]:
+    """Return likely intended medical terms for misspelled tokens, best first.
+
+    Tokens that are vocabulary terms, inflections of one ("burned", "stung") or
+    dictionary words are never suggestions.
+    """
+    index = spell_index()
+    suggestions = []
+    seen = set()
+    for token in re.findall(r"[a-zA-Z']+", text.lower()):
+        if token in seen or len(token) < 4 or _is_known(token, index):
+            continue
+        seen.add(token)
+        # Tokens of up to 8 characters tolerate a single edit; longer ones two.
+        matches = index.lookup(token, max_distance=1 if len(token) <= 8 else 2, limit=limit)
+        if matches:
+            suggestions.append({
+                "token": token,
+                "suggestions": [{"term": term, "distance": dist} for term, dist in matches],
+            })
+    return suggestions
+
+
 def _detect_clarification_prompt(text: str) -> Optional[str]:
     """Look for likely typos or ambiguous medical terms and craft a prompt."""
-    tokens = re.findall(r"[a-zA-Z']+", text.lower())
-    for token in tokens:
-        if token in KNOWN_EMERGENCY_TERMS or len(token) < 4:
-            continue
-        match = get_close_matches(token, KNOWN_EMERGENCY_TERMS, n=1, cutoff=0.78)
-        if match:
-            guess = match[0]
-            return (
-                f"Got it — when you say “{token},” do you mean “{guess}” (an injury to the skin causing discoloration) "
-                "or something else? If it’s that injury I can walk you through first-aid. If it’s different, could you clarify?"
-            )
-    return None
+    return _clarification_prompt(suggest_terms(text, limit=1))
+
 
+def _clarification_prompt(found: List[Dict]) -> Optional[str]:
+    if not found:
+        return None
+    token = found[0]["token"]
+    guess = found[0]["suggestions"][0]["term"]
+    return (
+        f"Got it — when you say “{token},” do you mean “{guess}” (an injury to the skin causing discoloration) "
+        "or something else? If it’s that injury I can walk you through first-aid. If it’s different, could you clarify?"
+    )
 
-def handle_message(user_input: str, history: Optional[List[Dict]] = None) -> Dict:
+
+TOOL_CALLS = [
+    ("get_emergency_numbers", {"country_code": TOOLS_COUNTRY_CODE}),
+    ("get_location_from_maps", {"query": "nearest hospital"}),
+]
+
+
+def _start_tools() -> Optional[mcp_client.PendingCalls]:
+    """Send the tool calls now so they run alongside the LLM stages."""
     try:
-        # 0) Pull recent conversational context so the pipeline sees the full story.
-        context_text = _gather_user_context(history, user_input)
+        return mcp_client.RUNTIME.start(TOOL_CALLS)
+    except Exception as e:
+        logging.warning(f"Error starting MCP tool calls: {e}")
+        return None
 
-        # 1) Security & privacy layer
+
+def _fetch_tools(pending: Optional[mcp_client.PendingCalls] = None) -> Dict:
+    """Collect the MCP tool results (both calls run concurrently); tool failures never break the pipeline."""
+    em_numbers, maps_hint = {}, {}
+    try:
+        em_numbers, maps_hint = (pending or mcp_client.RUNTIME.start(TOOL_CALLS)).results()
+    except Exception as e:
+        logging.warning(f"Error getting tools from MCP server: {e}")
+        # Default values are already set, so we can just log and continue
+    return {"emergency_numbers": em_numbers, "maps": maps_hint}
+
+
+def _local_tools() -> Dict:
+    """Tool results from the cache or the in-process implementations (no server round trip)."""
+    em_numbers, maps_hint = mcp_client.RUNTIME.local(TOOL_CALLS)
+    return {"emergency_numbers": em_numbers, "maps": maps_hint}
+
+
+# Streaming requests run their tools and classify stages here; one pool for the process
+# instead of a fresh executor (and two new threads) per request.
+_STREAM_POOL = admission.WorkerPool("stream")
+
+
+def _stage(name: str, fn, *args):
+    """Run one pipeline stage under a timing span."""
+    with metrics.span(name):
+        return fn(*args)
+
+
+def _fused(sanitized: str, query_vector: Optional[Embedding] = None):
+    """Try fused mode; return ``((triage, instructions) or None, packed context or None, local triage)``.
+
+    Skipped when the local triage tier can classify the input on its own: then only
+    generation needs the LLM and the two-call path is already a single call. The
+    local answer is handed back so the classify stage does not score the text again.
+    """
+    local = emergency_classifier.classify_local(sanitized)
+    if not LLM_FUSED_ENABLED or local is not None:
+        return None, None, local
+    packed = instruction_agent.prepare_context(sanitized, query_vector)
+    return _stage("fused", fused_agent.respond, sanitized, packed), packed, local
+
+
+def _classify_and_generate(sanitized: str, query_vector: Optional[Embedding] = None) -> Tuple[Dict, Dict]:
+    fused, packed, local = _fused(sanitized, query_vector)
+    if fused:
+        return fused
+    # 2) Emergency classification
+    triage = _stage("classify", emergency_classifier.classify_with_local, sanitized, local)
+    # 4) Generate first aid instructions grounded on KB
+    instructions = _stage("generate", instruction_agent.generate, sanitized, query_vector, packed)
+    return triage, instructions
+
+
+async def _classify_and_generate_async(sanitized: str,
+                                       query_vector: Optional[Embedding] = None) -> Tuple[Dict, Dict]:
+    fused, packed, local = await asyncio.to_thread(_fused, sanitized, query_vector)
+    if fused:
+        return fused
+    triage, instructions = await asyncio.gather(
+        asyncio.to_thread(_stage, "classify", emergency_classifier.classify_with_local, sanitized, local),
+        asyncio.to_thread(_stage, "generate", instruction_agent.generate, sanitized, query_vector, packed),
+    )
+    return triage, instructions
+
+
+def _finalize(user_input: str, context_text: str, sec: Dict, triage: Dict,
+              tools: Dict, instructions: Dict) -> Dict:
+    """Run the dependent tail of the pipeline (verification, scoring) and build the result."""
+    # 5) Verify against guardrails
+    instruction_steps = instructions.get("steps")
+    if not instruction_steps:
+        raise ValueError("Instruction agent did not return 'steps'")
+    ver = _stage("verify", verification_agent.verify, instruction_steps)
+
+    # 6) Score risk & confidence
+    risk = score_risk_confidence(triage, ver)
+
+    suggestions = _stage("clarification", suggest_terms, user_input)
+    clarification_prompt = _clarification_prompt(suggestions)
+    needs_clarification = clarification_prompt is not None
+
+    # 7) Re-personalize: the steps were written (or cached) against placeholders
+    placeholders = sec.get("placeholders")
+    if placeholders:
+        instructions = dict(instructions, steps=redaction.restore(instruction_steps, placeholders))
+
+    return {
+        "security": {k: v for k, v in sec.items() if k != "placeholders"},
+        "triage": triage,
+        "tools": tools,
+        "instructions": instructions,
+        "verification": ver,
+        "risk_confidence": risk,
+        "conversation": {
+            "context": context_text,
+            "needs_clarification": needs_clarification,
+            "clarification_prompt": clarification_prompt,
+            "clarification_suggestions": suggestions,
+        }
+    }
+
+
+def shed_result(user_input: str, history: Optional[List[Dict]] = None,
+                context_text: Optional[str] = None, reason: str = "overloaded") -> Dict:
+    """Immediate conservative answer for a request shed by admission control.
+
+    Same shape as ``handle_message`` but built in-process without waiting on anything, so
+    it is safe to call on the event loop: the local triage tier's best guess (or an
+    unknown default), the rule-based steps with the emergency numbers (cached or
+    built-in) appended, and the usual verification and scoring. ``result["shed"]``
+    carries the reason.
+    """
+    try:
+        if context_text is None:
+            context_text = _gather_user_context(history, user_input)
         sec = security_agent.protect(context_text)
         sanitized = sec.get("sanitized", context_text)
+        # No LLM to defer to: keep the local guess even below the threshold (and its severity).
+        local, confidence = local_triage.classify(sanitized)
+        triage = dict(local, source="local", confidence=confidence) if local else {
+            "category": "unknown", "severity": "low", "keywords": []}
+        tools = _local_tools()
+        numbers = tools.get("emergency_numbers", {}).get("numbers", {})
+        ambulance = numbers.get("AMBULANCE") or "your local emergency number"
+        steps = instruction_agent._fallback_steps(sanitized)
+        steps += (f"\nThe service is very busy, so these are general steps. "
+                  f"If this could be life-threatening, call an ambulance ({ambulance}) now.")
+        metrics.fallback("load_shed")
+        instructions = {"steps": steps, "sources": [], "fallback": True, "shed": True}
+        result = _finalize(user_input, context_text, sec, triage, tools, instructions)
+        result["shed"] = {"reason": reason}
+        return result
+    except Exception as e:
+        return _error_result(e)
+
 
-        # 2) Emergency classification
-        triage = emergency_classifier.classify(sanitized)
+def stream_shed(user_input: str, history: Optional[List[Dict]] = None,
+                context_text: Optional[str] = None, reason: str = "overloaded") -> Iterator[Tuple[str, Dict]]:
+    """``stream_message``-style events for a shed request (see ``shed_result``)."""
+    result = shed_result(user_input, history, context_text, reason)
+    if result.get("error"):
+        yield "error", result
+        return
+    yield "triage", result["triage"]
+    yield "token", {"text": result["instructions"]["steps"]}
+    yield "verification", result["verification"]
+    yield "risk_confidence", result["risk_confidence"]
+    yield "done", result
 
-        # 3) Get external tools via MCP-like adapter
-        em_numbers, maps_hint = {}, {}
+
+def _with_cache_info(result: Dict, cached: Optional[Dict]) -> Dict:
+    if cached:
+        info = {"hit": True, "match": cached.get("match")}
+        if "similarity" in cached:
+            info["similarity"] = cached["similarity"]
+        result["cache"] = info
+    return result
+
+
+def _error_result(e: Exception) -> Dict:
+    logging.error(
+        f"An error occurred in the conversational agent pipeline: {e}", exc_info=True)
+    return {
+        "error": "An internal error occurred while processing your request.",
+        "details": str(e)
+    }
+
+
+def handle_message(user_input: str, history: Optional[List[Dict]] = None,
+                   context_text: Optional[str] = None) -> Dict:
+    try:
+        # 0) Pull recent conversational context so the pipeline sees the full story
+        #    (session-backed callers pass the precomputed context instead of history).
+        if context_text is None:
+            context_text = _gather_user_context(history, user_input)
+
+        # 1) Security & privacy layer
+        sec = _stage("security", security_agent.protect, context_text)
+        sanitized = sec.get("sanitized", context_text)
+
+        # 3) External tools via MCP: sent now, collected once the answer is ready
+        pending_tools = _start_tools()
+
+        # Common scenarios are served from the result cache (verification still re-runs)
+        cached = _stage("cache_lookup", RESPONSE_CACHE.lookup, sanitized, instruction_agent.embed)
+
+        if cached:
+            triage, instructions = cached["triage"], cached["instructions"]
+        else:
+            # 2) + 4) Classify and generate steps grounded on KB (one call in fused mode)
+            triage, instructions = _classify_and_generate(sanitized)
+            RESPONSE_CACHE.store(sanitized, triage, instructions, embed=instruction_agent.embed)
+        tools = _stage("tools", _fetch_tools, pending_tools)
+
+        result = _finalize(user_input, context_text, sec, triage, tools, instructions)
+        return _with_cache_info(result, cached)
+    except Exception as e:
+        return _error_result(e)
+
+
+async def handle_message_async(user_input: str, history: Optional[List[Dict]] = None,
+                               context_text: Optional[str] = None) -> Dict:
+    """Asyncio variant of ``handle_message`` with the same result shape.
+
+    Triage, tool lookups and the embed -> retrieve -> generate chain do not depend
+    on each other, so they run concurrently; only verification and scoring wait
+    for all of them. The agents are blocking, so each runs in a worker thread.
+    In fused mode triage and generation are a single call running beside the tools.
+    """
+    if context_text is None:
+        context_text = _gather_user_context(history, user_input)
+    return await _pipeline_async(user_input, context_text)
+
+
+def _embedder(sanitized: str, vector: Optional[Embedding]):
+    """``instruction_agent.embed``, short-circuited for a text whose vector is already known."""
+    if not vector:
+        return instruction_agent.embed
+    return lambda text: vector if text == sanitized else instruction_agent.embed(text)
+
+
+async def _pipeline_async(user_input: str, context_text: str, sec: Optional[Dict] = None,
+                          query_vector: Optional[Embedding] = None) -> Dict:
+    try:
+        if sec is None:
+            sec = _stage("security", security_agent.protect, context_text)
+        sanitized = sec.get("sanitized", context_text)
+        embed = _embedder(sanitized, query_vector)
+
+        cached = await asyncio.to_thread(_stage, "cache_lookup", RESPONSE_CACHE.lookup, sanitized, embed)
+        if cached:
+            tools = await asyncio.to_thread(_stage, "tools", _fetch_tools)
+            triage, instructions = cached["triage"], cached["instructions"]
+        else:
+            (triage, instructions), tools = await asyncio.gather(
+                _classify_and_generate_async(sanitized, query_vector),
+                asyncio.to_thread(_stage, "tools", _fetch_tools),
+            )
+            await asyncio.to_thread(RESPONSE_CACHE.store, sanitized, triage, instructions, embed)
+
+        result = _finalize(user_input, context_text, sec, triage, tools, instructions)
+        return _with_cache_info(result, cached)
+    except Exception as e:
+        return _error_result(e)
+
+
+def _protect(text: str) -> Optional[Dict]:
+    try:
+        return _stage("security", security_agent.protect, text)
+    except Exception as exc:
+        logging.warning("Security pass failed for a batch item: %s", exc)
+        return None  # the item's own pipeline run retries it and reports the error
+
+
+def _prefetch_embeddings(texts: List[str], stats: Dict) -> List[Optional[Embedding]]:
+    """Embed a chunk of batch inputs with one request; items left as None embed on their own."""
+    out: List[Optional[Embedding]] = [None] * len(texts)
+    if not texts or not has_openai():
+        return out
+    try:
+        with metrics.span("embed_batch"):
+            vectors = instruction_agent.embed_batch(texts)
+        stats["embedding_batches"] += 1
+        for i, vec in enumerate(vectors):
+            out[i] = vec or None
+    except Exception as exc:
+        stats["embedding_batch_failures"] += 1
+        logging.warning("Batch embedding failed (%s); items will embed individually", exc)
+    return out
+
+
+async def handle_batch_async(messages: List[str], concurrency: int = BATCH_CONCURRENCY,
+                             embed_batch_size: int = BATCH_EMBED_SIZE) -> AsyncIterator[Dict]:
+    """Run many independent messages through the pipeline, yielding records as they finish.
+
+    Identical inputs (after trimming) run once and every copy gets the result, marked
+    ``duplicate`` after the first. Embeddings are fetched ``embed_batch_size`` texts per
+    request; at most ``concurrency`` pipelines run at a time. The batch as a whole takes
+    one slot of the ``admission.REQUESTS`` gate it shares with the chat endpoints; if it
+    is shed, no item runs and every record is ``ok: False`` with ``"shed": True`` and an
+    ``error``, never a stand-in answer. Each record is
+    ``{"index", "ok", "shed", "duplicate", "ms", "result"}``; a failing item only affects
+    its own record. The last record is ``{"summary": {...}}`` with aggregate counts and
+    timing.
+    """
+    started = time.perf_counter()
+    groups: Dict[str, List[int]] = {}
+    for index, message in enumerate(messages):
+        groups.setdefault((message or "").strip(), []).append(index)
+    unique = list(groups)
+    stats = {"embedding_batches": 0, "embedding_batch_failures": 0}
+    queue: asyncio.Queue = asyncio.Queue()
+    limit = asyncio.Semaphore(max(1, concurrency))
+    admitted = await admission.REQUESTS.acquire_async()
+
+    async def run_one(text: str, sec: Optional[Dict], vector: Optional[Embedding]) -> None:
+        t0 = time.perf_counter()
         try:
-            em_numbers = mcp_server.get_emergency_numbers()
-            maps_hint = mcp_server.get_location_from_maps("nearest hospital")
+            if not text:
+                result = {"error": "Empty message"}
+            elif not admitted:
+                result = {"error": "Service overloaded; batch not admitted", "shed": {"reason": "overloaded"}}
+            else:
+                result = await _pipeline_async(text, text, sec=sec, query_vector=vector)
         except Exception as e:
-            logging.warning(f"Error getting tools from MCP server: {e}")
-            # Default values are already set, so we can just log and continue
-
-        # 4) Generate first aid instructions grounded on KB
-        instructions = instruction_agent.generate(sanitized)
-
-        # 5) Verify against guardrails
-        instruction_steps = instructions.get("steps")
-        if not instruction_steps:
-            raise ValueError("Instruction agent did not return 'steps'")
-        ver = verification_agent.verify(instruction_steps)
-
-        # 6) Score risk & confidence
-        risk = score_risk_confidence(triage, ver)
-
-        clarification_prompt = _detect_clarification_prompt(user_input)
-        needs_clarification = clarification_prompt is not None
-
-        return {
-            "security": sec,
-            "triage": triage,
-            "tools": {"emergency_numbers": em_numbers, "maps": maps_hint},
-            "instructions": instructions,
-            "verification": ver,
-            "risk_confidence": risk,
-            "conversation": {
-                "context": context_text,
-                "needs_clarification": needs_clarification,
-                "clarification_prompt": clarification_prompt,
-            }
-        }
+            result = _error_result(e)
+        finally:
+            limit.release()
+        await queue.put((text, result, time.perf_counter() - t0))
+
+    async def produce() -> None:
+        tasks = []
+        try:
+            for start in range(0, len(unique), max(1, embed_batch_size)):
+                chunk = unique[start:start + max(1, embed_batch_size)]
+                secs = [_protect(text) if text else None for text in chunk]
+                wanted = [i for i, (text, sec) in enumerate(zip(chunk, secs))
+                          if admitted and text and sec is not None]
+                vectors: List[Optional[Embedding]] = [None] * len(chunk)
+                fetched = await asyncio.to_thread(
+                    _prefetch_embeddings, [secs[i].get("sanitized", chunk[i]) for i in wanted], stats)
+                for i, vec in zip(wanted, fetched):
+                    vectors[i] = vec
+                for text, sec, vec in zip(chunk, secs, vectors):
+                    await limit.acquire()
+                    tasks.append(asyncio.create_task(run_one(text, sec, vec)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await queue.put(None)
+
+    producer = asyncio.create_task(produce())
+    latencies: List[float] = []
+    errors = shed = 0
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            text, result, elapsed = item
+            latencies.append(elapsed)
+            ok = not result.get("error")
+            was_shed = bool(result.get("shed"))
+            for n, index in enumerate(groups[text]):
+                errors += 0 if ok or was_shed else 1
+                shed += 1 if was_shed else 0
+                yield {"index": index, "ok": ok, "shed": was_shed, "duplicate": n > 0,
+                       "ms": round(elapsed * 1000, 1), "result": result}
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+        if admitted:
+            admission.REQUESTS.release()
+
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    yield {"summary": {
+        "items": len(messages),
+        "unique": len(unique),
+        "errors": errors,
+        "shed": shed,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(len(messages) / seconds, 2) if seconds else 0.0,
+        "latency_ms": {
+            "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0.0,
+            "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        **stats,
+    }}
+
+
+def handle_batch(messages: List[str], concurrency: int = BATCH_CONCURRENCY,
+                 embed_batch_size: int = BATCH_EMBED_SIZE) -> Dict:
+    """Blocking wrapper around ``handle_batch_async``: ``{"results": [...in input order], "summary"}``."""
+    async def collect() -> List[Dict]:
+        return [record async for record in handle_batch_async(messages, concurrency, embed_batch_size)]
+
+    records = asyncio.run(collect())
+    summary = records.pop()["summary"]
+    return {"results": sorted(records, key=lambda r: r["index"]), "summary": summary}
+
+
+def stream_message(user_input: str, history: Optional[List[Dict]] = None,
+                   context_text: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+    """Run the pipeline as a stream of ``(event, data)`` pairs.
+
+    Events: ``triage`` once classification finishes, ``token`` for each instruction
+    chunk, ``guardrail`` if the stream is cut off by a safety rule and ``partial`` if the
+    provider failed mid-answer (both with conservative replacement steps), then
+    ``verification``, ``risk_confidence`` and ``done`` carrying
+    the full ``handle_message``-shaped result. Errors end the stream with ``error``.
+    Streaming always uses separate classify and generate calls (fused mode returns one
+    JSON object, which cannot be shown token by token).
+    """
+    try:
+        if context_text is None:
+            context_text = _gather_user_context(history, user_input)
+        sec = _stage("security", security_agent.protect, context_text)
+        sanitized = sec.get("sanitized", context_text)
+        cached = _stage("cache_lookup", RESPONSE_CACHE.lookup, sanitized, instruction_agent.embed)
+
+        # Each task gets its own copy of the context so timing spans reach this request.
+        tools_future = _STREAM_POOL.submit(contextvars.copy_context().run, _stage, "tools", _fetch_tools)
+        restorer = redaction.StreamRestorer(sec.get("placeholders"))
+        if cached:
+            triage, instructions = cached["triage"], cached["instructions"]
+            yield "triage", triage
+            yield "token", {"text": redaction.restore(instructions["steps"], restorer.placeholders)}
+        else:
+            triage_future = _STREAM_POOL.submit(contextvars.copy_context().run,
+                                                _stage, "classify", emergency_classifier.classify, sanitized)
+            triage_sent = False
+            blocked = False
+            instructions = None
+            verifier = verification_agent.StreamVerifier()
+            pending = ""  # checked text not yet shown: the last ``holdback`` characters
+            stream = instruction_agent.generate_stream(sanitized)
+            try:
+                for event in stream:
+                    if not triage_sent and triage_future.done():
+                        triage_sent = True
+                        yield "triage", triage_future.result()
+                    if event.get("done"):
+                        instructions = event["result"]
+                        break
+                    if verifier.feed(event["delta"]):
+                        blocked = True
+                        break
+                    # Hold back the tail a deny term could still be completing in.
+                    pending += event["delta"]
+                    if len(pending) > verifier.holdback:
+                        text = restorer.feed(pending[:-verifier.holdback])
+                        pending = pending[-verifier.holdback:]
+                        if text:
+                            yield "token", {"text": text}
+                if not blocked and verifier.close():
+                    blocked = True
+                tail = "" if blocked else restorer.feed(pending) + restorer.flush()
+                if tail:
+                    yield "token", {"text": tail}
+            finally:
+                stream.close()
+            if blocked:
+                steps = instruction_agent._fallback_steps(sanitized)
+                instructions = {"steps": steps, "sources": [], "fallback": True, "blocked": True}
+                yield "guardrail", {"blocked": True, "replacement": steps}
+            elif instructions.get("partial"):
+                # The provider stopped mid-answer: the shown text is incomplete.
+                steps = instruction_agent._fallback_steps(sanitized)
+                instructions = {"steps": steps, "sources": [], "fallback": True, "partial": True}
+                yield "partial", {"partial": True, "replacement": steps}
+            triage = triage_future.result()
+            if not triage_sent:
+                yield "triage", triage
+            if not blocked:
+                RESPONSE_CACHE.store(sanitized, triage, instructions, embed=instruction_agent.embed)
+        tools = tools_future.result()
+
+        result = _finalize(user_input, context_text, sec, triage, tools, instructions)
+        yield "verification", result["verification"]
+        yield "risk_confidence", result["risk_confidence"]
+        yield "done", _with_cache_info(result, cached)
     except Exception as e:
-        logging.error(
-            f"An error occurred in the conversational agent pipeline: {e}", exc_info=True)
-        return {
-            "error": "An internal error occurred while processing your request.",
-            "details": str(e)
-        }
+        yield "error", _error_result(e)
@@ -1,36 +1,69 @@
 # agents/emergency_classifier.py
 # Classifies user input into emergency categories using LLM prompting.
-from typing import Dict
+from typing import Dict, Optional
 import logging
-import requests
-from ..config import MODEL_PREFERENCE, OPENAI_API_KEY, GROQ_API_KEY
-
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
+import threading
+from ..config import TRIAGE_LOCAL_ENABLED, TRIAGE_LOCAL_THRESHOLD
+from ..services import llm_router, metrics
+from . import local_triage
 
 SYSTEM = "You are an emergency triage classifier. Return JSON with fields: category, severity (low/medium/high), keywords."
 
+_STATS = {"local": 0, "remote": 0, "remote_failed": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _STATS_LOCK:
+        _STATS[key] += 1
+    if key == "remote_failed":
+        metrics.fallback("classification_default")
+
+
+def stats() -> Dict:
+    """Counts of classifications served locally vs by the LLM."""
+    with _STATS_LOCK:
+        data = dict(_STATS)
+    served = data["local"] + data["remote"]
+    data["local_share"] = (data["local"] / served) if served else 0.0
+    return data
+
+
+def classify_local(text: str) -> Optional[Dict]:
+    """The local tier's answer when it is confident enough to skip the LLM, else None."""
+    if TRIAGE_LOCAL_ENABLED:
+        local, confidence = local_triage.classify(text)
+        if local and confidence >= TRIAGE_LOCAL_THRESHOLD:
+            return dict(local, source="local", confidence=confidence)
+    return None
+
+
 def classify(text: str) -> Dict:
+    # Clear-cut inputs are answered by the local tier; only ambiguous ones pay for an LLM call
+    return classify_with_local(text, classify_local(text))
+
+
+def classify_with_local(text: str, local: Optional[Dict]) -> Dict:
+    """``classify`` for a caller that already has ``classify_local(text)`` in hand."""
+    if local:
+        _count("local")
+        return local
+    _count("remote")
+    return _classify_remote(text)
+
+
+def _classify_remote(text: str) -> Dict:
     try:
-        url = GROQ_CHAT_URL if MODEL_PREFERENCE == "groq" else OPENAI_CHAT_URL
-        token = GROQ_API_KEY if MODEL_PREFERENCE == 'groq' else OPENAI_API_KEY
-        if not token:
-            raise RuntimeError("Missing API key for selected provider")
-        headers = {"Authorization": f"Bearer {token}"}
-        model = "llama-3.1-70b-versatile" if MODEL_PREFERENCE == "groq" else "gpt-4o-mini"
-        resp = requests.post(url, headers=headers, json={
-            "model": model,
-            "messages": [
-                {"role":"system","content": SYSTEM},
-                {"role":"user","content": f"Text: {text}\nReturn JSON only."}
-            ],
-            "temperature": 0.1
-        }, timeout=15)
-        try:
-            content = resp.json()["choices"][0]["message"]["content"]
-        except Exception:
-            content = '{"category":"unknown","severity":"low","keywords":[]}'
+        with metrics.span("llm_classify"):
+            content = llm_router.complete("classify", {
+                "messages": [
+                    {"role":"system","content": SYSTEM},
+                    {"role":"user","content": f"Text: {text}\nReturn JSON only."}
+                ],
+                "temperature": 0.1
+            }, read_timeout=15).content
     except Exception as exc:
+        _count("remote_failed")
         logging.warning("Classification failed: %s", exc)
         content = '{"category":"unknown","severity":"low","keywords":[]}'
     # Best-effort parse
@@ -40,3 +73,6 @@ def classify(text: str) -> Dict:
     except Exception:
         data = {"category":"unknown","severity":"low","keywords":[]}
     return data
+
+
+metrics.register_collector("triage", stats)
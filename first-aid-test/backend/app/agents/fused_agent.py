@@ -0,0 +1,158 @@
+# agents/fused_agent.py
+# Fused mode: triage and first-aid steps from a single structured-output
+# completion over the retrieved context, instead of one classify and one
+# generate call. The reply is validated strictly; anything malformed returns
+# None and the caller falls back to the two-call path with the same context.
+import json
+import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..config import LLM_FUSED_RESPONSE_FORMAT
+from ..services import context_packer, llm_router, metrics
+from . import instruction_agent
+
+SEVERITIES = ("low", "medium", "high")
+MAX_STEPS = 12
+MAX_STEP_CHARS = 500
+MAX_KEYWORDS = 10
+
+SYSTEM = (
+    "You are an emergency triage classifier and First Aid instruction generator. "
+    "Classify the user's situation, then write clear, short first-aid steps using the provided 'context' strictly. "
+    "Include cautions. If unsure, say to contact emergency services. "
+    'Return JSON only: {"triage": {"category": string, "severity": "low"|"medium"|"high", '
+    '"keywords": [string]}, "steps": [string]}.'
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "triage": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string"},
+                "severity": {"type": "string", "enum": list(SEVERITIES)},
+                "keywords": {"type": "array", "items": {"type": "string"}},
+            },
+            "required": ["category", "severity", "keywords"],
+            "additionalProperties": False,
+        },
+        "steps": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["triage", "steps"],
+    "additionalProperties": False,
+}
+
+_NUMBERING = re.compile(r"^\s*(?:\d+\s*[.)]|[-*•])\s*")
+
+_STATS = {"calls": 0, "ok": 0, "malformed": 0, "failed": 0}
+_STATS_LOCK = threading.Lock()
+
+
+class FusedOutputError(ValueError):
+    """The completion did not match the fused schema."""
+
+
+def _count(key: str) -> None:
+    with _STATS_LOCK:
+        _STATS[key] += 1
+
+
+def stats() -> Dict:
+    with _STATS_LOCK:
+        return dict(_STATS)
+
+
+def _response_format() -> Optional[Dict]:
+    if LLM_FUSED_RESPONSE_FORMAT == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "first_aid_turn", "strict": True, "schema": SCHEMA}}
+    if LLM_FUSED_RESPONSE_FORMAT == "json_object":
+        return {"type": "json_object"}
+    return None
+
+
+def _payload(query: str, context_text: str) -> Dict:
+    payload = {
+        "messages": [
+            {"role": "system", "content": SYSTEM},
+            {"role": "user", "content": f"User query: {query}\n\ncontext:\n{context_text}\n\nReturn JSON only."},
+        ],
+        "temperature": 0.2,
+    }
+    response_format = _response_format()
+    if response_format:
+        payload["response_format"] = response_format
+    return payload
+
+
+def _string(value, field: str, limit: int) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise FusedOutputError(f"{field} must be a non-empty string")
+    value = value.strip()
+    if len(value) > limit:
+        raise FusedOutputError(f"{field} is longer than {limit} characters")
+    return value
+
+
+def parse(content: str) -> Tuple[Dict, str]:
+    """Validate a fused completion; return ``(triage, numbered steps text)`` or raise ``FusedOutputError``."""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError) as exc:
+        raise FusedOutputError(f"not JSON: {exc}") from exc
+    if not isinstance(data, dict) or not isinstance(data.get("triage"), dict):
+        raise FusedOutputError("missing triage object")
+    triage = data["triage"]
+    category = _string(triage.get("category"), "category", 64)
+    severity = _string(triage.get("severity"), "severity", 16).lower()
+    if severity not in SEVERITIES:
+        raise FusedOutputError(f"unknown severity {severity!r}")
+    keywords = triage.get("keywords", [])
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        raise FusedOutputError("keywords must be a list of strings")
+
+    raw_steps = data.get("steps")
+    if not isinstance(raw_steps, list) or not 1 <= len(raw_steps) <= MAX_STEPS:
+        raise FusedOutputError(f"steps must be a list of 1-{MAX_STEPS} strings")
+    steps: List[str] = []
+    for i, step in enumerate(raw_steps):
+        # The model sometimes numbers the items itself; the pipeline numbers them.
+        step = _NUMBERING.sub("", _string(step, f"steps[{i}]", MAX_STEP_CHARS))
+        if not step:
+            raise FusedOutputError(f"steps[{i}] is empty")
+        steps.append(step)
+
+    triage_out = {
+        "category": category,
+        "severity": severity,
+        "keywords": [k.strip() for k in keywords if k.strip()][:MAX_KEYWORDS],
+        "source": "fused",
+    }
+    return triage_out, "\n".join(f"{n}) {step}" for n, step in enumerate(steps, 1))
+
+
+def respond(query: str, packed: context_packer.PackedContext) -> Optional[Tuple[Dict, Dict]]:
+    """``(triage, instructions)`` shaped like ``classify`` and ``generate`` results, or None to fall back."""
+    _count("calls")
+    try:
+        with metrics.span("llm_fused"):
+            content = llm_router.complete("fused", _payload(query, packed.text), read_timeout=20).content
+    except Exception as exc:
+        _count("failed")
+        metrics.fallback("fused_two_call")
+        logging.warning("Fused completion failed: %s", exc)
+        return None
+    try:
+        triage, steps = parse(content)
+    except FusedOutputError as exc:
+        _count("malformed")
+        metrics.fallback("fused_two_call")
+        logging.warning("Fused completion rejected (%s); using separate calls", exc)
+        return None
+    _count("ok")
+    return triage, instruction_agent._result(steps, packed, fallback=False)
+
+
+metrics.register_collector("fused", stats)
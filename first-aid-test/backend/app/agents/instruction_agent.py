@@ -1,38 +1,110 @@
 # agents/instruction_agent.py
 # Generates step-by-step first-aid instructions grounded by retrieved guides.
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional
+import contextvars
+import json
 import logging
-import requests
-from ..config import MODEL_PREFERENCE, OPENAI_API_KEY, GROQ_API_KEY, EMBEDDING_MODEL, has_openai
-from ..services import vector_db
-from ..utils import chunk_text
+import time
+from ..config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, EMBEDDING_MODEL, EMBED_ENCODING_FORMAT, RETRIEVAL_TOP_K, RETRIEVAL_RRF_K,
+    has_openai,
+)
+from ..services import admission, context_packer, http_client, lexical_index, llm_router, metrics, vector_db
+from ..services.embedding_cache import CACHE as EMBED_CACHE
+from ..services.vectors import EMPTY, Embedding
+
+OPENAI_EMBED_URL = f"{OPENAI_BASE_URL}/embeddings"
+
+def embed(text: str) -> Embedding:
+    with metrics.span("embed"):
+        vec = _embed(text)
+    if not vec:
+        metrics.fallback("empty_embedding")
+    return vec
 
-OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
-GROQ_CHAT_URL = "https://api.groq.com/openai/v1/chat/completions"
-OPENAI_EMBED_URL = "https://api.openai.com/v1/embeddings"
+def _embed_request(inputs) -> Dict:
+    body = {"model": EMBEDDING_MODEL, "input": inputs}
+    if EMBED_ENCODING_FORMAT == "base64":
+        body["encoding_format"] = "base64"  # packed float32, decoded without a float list
+    return body
 
-def embed(text: str) -> List[float]:
+def _embed(text: str) -> Embedding:
     # Use OpenAI embeddings to query Astra vector search
     if not has_openai():
         logging.warning("OPENAI_API_KEY not set; returning empty embedding")
-        return []
+        return EMPTY
+    cached = EMBED_CACHE.get(text)
+    if cached is not None:
+        return cached
     try:
-        headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-        r = requests.post(OPENAI_EMBED_URL, headers=headers, json={
-            "model": EMBEDDING_MODEL,
-            "input": text
-        }, timeout=10)
+        with admission.stage_slot("embed"):
+            r = http_client.post(OPENAI_EMBED_URL, headers=http_client.bearer(OPENAI_API_KEY),
+                                 json=_embed_request(text), read_timeout=10)
+        r.raise_for_status()  # don't cache an empty vector for a provider error
         data = r.json()
-        return data.get("data", [{}])[0].get("embedding", [])
+        vec = Embedding.from_response(data.get("data", [{}])[0].get("embedding"))
+        EMBED_CACHE.put(text, vec)
+        return vec
     except Exception as exc:
         logging.warning("Embedding request failed: %s", exc)
-        return []
+        return EMPTY
+
+def embed_batch(texts: List[str], use_cache: bool = True, timeout: float = 30) -> List[Embedding]:
+    """Embed many texts with a single embeddings request.
 
-def retrieve_context(query: str) -> List[Dict]:
-    vec = embed(query)
+    Unlike ``embed`` this raises on provider errors so callers can retry the batch.
+    Cached texts are not re-sent when ``use_cache`` is set.
+    """
+    if not has_openai():
+        raise RuntimeError("OPENAI_API_KEY not set; cannot compute embeddings")
+    out: List = [EMBED_CACHE.get(t) if use_cache else None for t in texts]
+    missing = [i for i, vec in enumerate(out) if vec is None]
+    if missing:
+        r = http_client.post(OPENAI_EMBED_URL, headers=http_client.bearer(OPENAI_API_KEY),
+                             json=_embed_request([texts[i] for i in missing]), read_timeout=timeout)
+        r.raise_for_status()
+        for item in r.json().get("data", []):
+            i = missing[item["index"]]
+            out[i] = Embedding.from_response(item.get("embedding"))
+            if use_cache:
+                EMBED_CACHE.put(texts[i], out[i])
+    return [vec or EMPTY for vec in out]
+
+def _vector_search(query: str, vector: Optional[Embedding]) -> List[Dict]:
+    # Callers that embedded the query already (batch prefill) pass the vector in.
+    vec = vector or embed(query)
     if not vec:
         return []
-    return vector_db.similarity_search(vec, top_k=4)
+    with metrics.span("similarity_search"):
+        return vector_db.similarity_search(vec, top_k=RETRIEVAL_TOP_K)
+
+def _lexical_search(index: lexical_index.LexicalIndex, query: str) -> List[Dict]:
+    with metrics.span("lexical_search"):
+        return index.search(query, top_k=RETRIEVAL_TOP_K)
+
+# BM25 runs here while the calling thread does embed -> vector search.
+_LEXICAL_POOL = admission.WorkerPool("lexical")
+
+def retrieve_context(query: str, vector: Optional[Embedding] = None) -> List[Dict]:
+    """Guide passages for ``query``: vector and BM25 rankings fused by reciprocal rank.
+
+    Without embeddings (no key, or the call failed) the lexical ranking is used alone;
+    without a lexical index this is plain vector search.
+    """
+    index = lexical_index.get_index()
+    if index is None or not len(index):
+        return _vector_search(query, vector)
+    if not vector and not has_openai():
+        metrics.fallback("lexical_only")
+        return _lexical_search(index, query)
+    lexical = _LEXICAL_POOL.submit(contextvars.copy_context().run, _lexical_search, index, query)
+    dense = _vector_search(query, vector)
+    sparse = lexical.result()
+    if not dense:
+        if sparse:
+            metrics.fallback("lexical_only")
+        return sparse
+    return lexical_index.fuse_rankings([dense, sparse], RETRIEVAL_TOP_K, k=RETRIEVAL_RRF_K)
 
 SYSTEM = (
     "You are a First Aid instruction generator. Use provided 'context' strictly. "
@@ -105,28 +177,120 @@ def _fallback_steps(query: str) -> str:
     )
 
 
-def generate(query: str) -> Dict:
-    context_docs = retrieve_context(query)
-    context_text = "\n\n".join([d.get('document', {}).get('text','') for d in context_docs])
-    # Safety against long contexts
-    context_text = "\n\n".join(chunk_text(context_text, 400))
+CONTEXT_TOKENS = metrics.histogram("context_tokens", "Estimated tokens of retrieved context sent to the LLM.",
+                                   buckets=(50, 100, 250, 500, 750, 1000, 1500, 2000, 4000))
+
+
+def _pack_context(context_docs: List[Dict]) -> context_packer.PackedContext:
+    # Deduplicated, relevance/diversity-ordered passages cut to CONTEXT_TOKEN_BUDGET
+    with metrics.span("context_pack"):
+        packed = context_packer.pack(context_docs)
+    CONTEXT_TOKENS.observe(packed.tokens)
+    return packed
+
+
+def _chat_payload(query: str, context_text: str) -> Dict:
+    # The router fills in the model for whichever provider serves the call.
+    return {
+        "messages":[
+            {"role":"system","content":SYSTEM},
+            {"role":"user","content":f"User query: {query}\n\ncontext:\n{context_text}\n\nReturn numbered steps."}
+        ],
+        "temperature":0.2
+    }
+
+
+def _result(content: str, packed: context_packer.PackedContext, fallback: bool) -> Dict:
+    result = {"steps": content, "sources": packed.sources, "context": packed.stats()}
+    if fallback:
+        result["fallback"] = True
+    return result
+
+
+def prepare_context(query: str, query_vector: Optional[Embedding] = None) -> context_packer.PackedContext:
+    """Retrieve and pack the guide context for ``query``."""
+    return _pack_context(retrieve_context(query, query_vector))
+
+
+def generate(query: str, query_vector: Optional[Embedding] = None,
+             packed: Optional[context_packer.PackedContext] = None) -> Dict:
+    # ``packed`` lets a caller that already retrieved the context (fused-mode fallback) reuse it.
+    if packed is None:
+        packed = prepare_context(query, query_vector)
+    fallback = False
     try:
-        url = GROQ_CHAT_URL if MODEL_PREFERENCE == "groq" else OPENAI_CHAT_URL
-        token = GROQ_API_KEY if MODEL_PREFERENCE == 'groq' else OPENAI_API_KEY
-        if not token:
-            raise RuntimeError("Missing API key for selected provider")
-        headers = {"Authorization": f"Bearer {token}"}
-        model = "llama-3.1-70b-versatile" if MODEL_PREFERENCE == "groq" else "gpt-4o-mini"
-        r = requests.post(url, headers=headers, json={
-            "model": model,
-            "messages":[
-                {"role":"system","content":SYSTEM},
-                {"role":"user","content":f"User query: {query}\n\ncontext:\n{context_text}\n\nReturn numbered steps."}
-            ],
-            "temperature":0.2
-        }, timeout=20)
-        content = r.json().get("choices",[{}])[0].get("message",{}).get("content","No response")
+        with metrics.span("llm_generate"):
+            content = llm_router.complete("generate", _chat_payload(query, packed.text), read_timeout=20).content
     except Exception as exc:
         logging.warning("Chat generation failed: %s", exc)
+        metrics.fallback("instruction_steps")
         content = _fallback_steps(query)
-    return {"steps": content, "sources": [d.get('document',{}).get('_id') for d in context_docs]}
+        fallback = True
+    return _result(content, packed, fallback)
+
+
+def generate_stream(query: str) -> Iterator[Dict]:
+    """Stream instructions from the provider's streaming mode.
+
+    Yields ``{"delta": text}`` as tokens arrive and finally ``{"done": True, "result": {...}}``
+    with the same shape ``generate`` returns. If the provider fails before the first token
+    the rule-based steps are sent as a single delta; if it fails after, the result is marked
+    ``partial`` (and ``fallback``). Closing the generator early (e.g. on a guardrail hit)
+    closes the upstream connection.
+    """
+    packed = prepare_context(query)
+    parts: List[str] = []
+    fallback = False
+    partial = False
+    payload = dict(_chat_payload(query, packed.text), stream=True)
+    try:
+        # Holds a "generate" admission slot for the whole stream, like ``generate`` does per call.
+        with admission.stage_slot("generate"):
+            # Providers are tried in the router's order until one starts streaming; once tokens
+            # have been sent a mid-stream failure ends the answer early and marks it partial.
+            for route in llm_router.ROUTER.routes("generate"):
+                start = time.perf_counter()
+                try:
+                    with http_client.stream("POST", route.url, headers=route.headers,
+                                            json=dict(payload, model=route.model), read_timeout=20) as r:
+                        r.raise_for_status()
+                        for line in r.iter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                break
+                            try:
+                                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                            except (ValueError, KeyError, IndexError):
+                                continue
+                            if delta:
+                                parts.append(delta)
+                                yield {"delta": delta}
+                    llm_router.ROUTER.record(route.provider, time.perf_counter() - start, True)
+                    break
+                except GeneratorExit:
+                    # Consumer stopped early (e.g. guardrail hit): the provider was answering fine.
+                    llm_router.ROUTER.record(route.provider, time.perf_counter() - start, True)
+                    raise
+                except Exception as exc:
+                    # A stream dropped part-way is a provider failure too, or a provider that keeps
+                    # cutting answers off would never trip its breaker.
+                    llm_router.ROUTER.record_error(route.provider, time.perf_counter() - start, exc)
+                    logging.warning("Streaming chat generation failed on %s: %s", route.provider, exc)
+                    if parts:
+                        partial = True
+                        break
+    except admission.Overloaded as exc:
+        logging.warning("Streaming chat generation shed: %s", exc)
+    if partial:
+        metrics.fallback("instruction_partial")
+    if not parts:
+        metrics.fallback("instruction_steps")
+        fallback = True
+        parts = [_fallback_steps(query)]
+        yield {"delta": parts[0]}
+    result = _result("".join(parts) or "No response", packed, fallback or partial)
+    if partial:
+        result["partial"] = True
+    yield {"done": True, "result": result}
@@ -0,0 +1,186 @@
+# agents/local_triage.py
+# Local triage tier: answers clear-cut inputs without an LLM round trip.
+# Keyword rules (the same scenario vocabulary the fallback steps use) are combined
+# with a small multinomial naive Bayes model trained at startup from a labeled
+# JSONL file. Callers compare the returned confidence against a threshold and
+# send anything ambiguous to the remote classifier.
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from ..config import TRIAGE_TRAINING_PATH
+
+LOGGER = logging.getLogger(__name__)
+
+# category -> (default severity, keyword patterns). Each pattern is a whole word or
+# phrase with its inflections spelled out, so "cut" does not match "cute".
+RULES = {
+    "bleeding": ("medium", (r"bleed(?:s|ing)?", r"bled", r"blood(?:y)?", r"cut(?:s|ting)?", r"lacerations?",
+                            r"gash(?:es|ed)?", r"wound(?:s|ed)?")),
+    "burn": ("medium", (r"burn(?:s|ed|t|ing)?", r"scald(?:s|ed|ing)?", r"blister(?:s|ed|ing)?")),
+    "choking": ("high", (r"chok(?:e|es|ed|ing)",)),
+    "fainting": ("medium", (r"faint(?:s|ed|ing)?", r"dizzy", r"dizziness", r"light-?headed", r"vertigo",
+                            r"passed out")),
+    "headache": ("low", (r"headaches?", r"migraines?", r"head is aching")),
+    "sprain": ("low", (r"sprain(?:s|ed)?", r"strained (?:my |his |her )?(?:back|muscle|hamstring|calf|groin|neck)",
+                       r"twisted (?:my |his |her )?(?:ankle|knee|wrist)", r"rolled (?:my |his |her )?(?:ankle|foot)")),
+    "fracture": ("high", (r"fractur(?:e|es|ed)", r"broken bones?", r"broke (?:my|his|her)", r"bone is sticking")),
+    "allergic_reaction": ("high", (r"allerg(?:y|ic|ies)", r"anaphyla(?:xis|ctic)", r"hives", r"epipen",
+                                   r"epinephrine")),
+    "bruise": ("low", (r"bruis(?:e|es|ed|ing)", r"black eye")),
+}
+
+# Phrases that raise any category to high severity.
+RED_FLAGS = (
+    "unconscious", "not breathing", "stopped breathing", "won't stop", "wont stop", "spurting",
+    "turning blue", "seizure", "chest pain", "heavy bleeding", "unresponsive", "worst headache",
+)
+
+# Poisoning and airway signs: a keyword match is never enough, these always go to the LLM.
+ESCALATE = (
+    r"swallow(?:s|ed|ing)?", r"throat", r"breath(?:e|es|ing)?", r"can'?t breathe", r"wheez(?:e|es|ing)",
+    r"tongue", r"poison(?:s|ed|ing|ous)?", r"bleach", r"ingest(?:s|ed)?", r"vomit(?:s|ed|ing)?",
+    r"throwing up", r"threw up",
+)
+
+# Penetrating wounds, chest wounds, self-harm and head injuries: always high severity and
+# always sent to the LLM, whatever the keyword rules or the model say.
+CRITICAL = (
+    r"stab(?:s|bed|bing)?", r"gunshot", r"gun shot", r"(?:been|was|got|is|were|being) shot",
+    r"shot (?:in|through) (?:the|my|his|her|their)", r"impaled",
+    r"chest (?:wounds?|injur(?:y|ies))", r"(?:in|to|into) (?:the|my|his|her|their) chest",
+    r"on purpose", r"suicid(?:e|al)", r"kill(?:ing)? (?:my|him|her|them)sel(?:f|ves)", r"self[- ]harm(?:ing)?",
+    r"(?:hurt|harm|cut)(?:ing)? (?:my|him|her|them)sel(?:f|ves)", r"(?:cut|slit|slash)(?:ted)? (?:my|his|her|their) wrists?",
+    r"overdos(?:e|ed|ing)", r"took too many pills",
+    r"(?:hit|hits|hitting|bumped|banged|knocked|struck) (?:on )?(?:the|my|his|her|their) head",
+    r"(?:on|to) (?:the |my |his |her |their )?head", r"head (?:injur(?:y|ies)|wounds?|trauma)", r"concuss(?:ed|ion)",
+)
+
+_TOKEN = re.compile(r"[a-z']+")
+
+
+def _compile(patterns) -> re.Pattern:
+    # Whole words or phrases only: anchored at both ends
+    return re.compile(r"\b(?:" + "|".join(patterns) + r")\b")
+
+
+_RULE_PATTERNS = {cat: _compile(patterns) for cat, (_, patterns) in RULES.items()}
+_RED_FLAG_PATTERN = _compile(re.escape(flag) for flag in RED_FLAGS)
+_ESCALATE_PATTERN = _compile(ESCALATE)
+_CRITICAL_PATTERN = _compile(CRITICAL)
+
+
+class NaiveBayes:
+    """Multinomial naive Bayes over word tokens with Laplace smoothing."""
+
+    def __init__(self):
+        self.class_counts: Counter = Counter()
+        self.token_counts: Dict[str, Counter] = defaultdict(Counter)
+        self.token_totals: Counter = Counter()
+        self.vocab = set()
+
+    def fit(self, examples: List[Tuple[str, str]]) -> "NaiveBayes":
+        for text, label in examples:
+            tokens = _TOKEN.findall(text.lower())
+            self.class_counts[label] += 1
+            self.token_counts[label].update(tokens)
+            self.token_totals[label] += len(tokens)
+            self.vocab.update(tokens)
+        return self
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        if not self.class_counts:
+            return None, 0.0
+        tokens = [t for t in _TOKEN.findall(text.lower()) if t in self.vocab]
+        if not tokens:
+            return None, 0.0
+        total = sum(self.class_counts.values())
+        v = len(self.vocab)
+        scores = {}
+        for label, count in self.class_counts.items():
+            denom = self.token_totals[label] + v
+            counts = self.token_counts[label]
+            scores[label] = math.log(count / total) + sum(math.log((counts[t] + 1) / denom) for t in tokens)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        norm = sum(math.exp(s - top) for s in scores.values())
+        return best, 1.0 / norm
+
+
+_MODEL: Optional[NaiveBayes] = None
+_MODEL_LOCK = threading.Lock()
+
+
+def _load_examples(path: str) -> List[Tuple[str, str]]:
+    examples = []
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if record.get("text") and record.get("category"):
+                    examples.append((record["text"], record["category"]))
+    except (OSError, ValueError) as exc:
+        LOGGER.warning("Triage training data unavailable at %s: %s", path, exc)
+    return examples
+
+
+def model() -> NaiveBayes:
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:
+            if _MODEL is None:
+                _MODEL = NaiveBayes().fit(_load_examples(TRIAGE_TRAINING_PATH))
+    return _MODEL
+
+
+def classify(text: str) -> Tuple[Optional[Dict], float]:
+    """Return ``({category, severity, keywords}, confidence)``; ``(None, 0.0)`` if no signal.
+
+    Poisoning and airway signs (``ESCALATE``) always give confidence 0.0; ``CRITICAL`` signs
+    also raise the severity to high.
+    """
+    lowered = (text or "").lower()
+    hits = {}
+    for category, pattern in _RULE_PATTERNS.items():
+        found = {m.group() for m in pattern.finditer(lowered)}
+        if found:
+            hits[category] = found
+    nb_label, nb_prob = model().predict(lowered)
+
+    if len(hits) == 1:
+        # Served locally only when the model agrees or several keywords point the same way.
+        category = next(iter(hits))
+        if nb_label == category:
+            confidence = max(0.9, nb_prob)
+        elif len(hits[category]) > 1:
+            confidence = 0.7 if nb_label and nb_prob > 0.6 else 0.9
+        else:
+            confidence = 0.6
+    elif hits:
+        # Several scenarios mentioned: let the model break the tie, but stay cautious.
+        category = nb_label if nb_label in hits else max(hits, key=lambda c: len(hits[c]))
+        confidence = 0.5
+    elif nb_label:
+        category, confidence = nb_label, 0.8 * nb_prob
+    elif _CRITICAL_PATTERN.search(lowered):
+        category, confidence = "unknown", 0.0
+    else:
+        return None, 0.0
+
+    severity = RULES.get(category, ("low",))[0]
+    red_flags = sorted({m.group() for m in _RED_FLAG_PATTERN.finditer(lowered)})
+    critical = sorted({m.group() for m in _CRITICAL_PATTERN.finditer(lowered)})
+    if red_flags or critical:
+        severity = "high"
+    keywords = sorted(set().union(*hits.values())) if hits else []
+    if critical or _ESCALATE_PATTERN.search(lowered):
+        confidence = 0.0
+    return ({"category": category, "severity": severity, "keywords": keywords + red_flags + critical},
+            round(confidence, 4))
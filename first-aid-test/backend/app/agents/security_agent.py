@@ -3,7 +3,24 @@
 from ..utils import basic_sanitize
 from typing import Dict
 
+from ..config import PII_REDACTION_ENABLED, PII_REDACTION_KINDS
+from ..services import metrics
+from ..services.redaction import Redactor
+
+REDACTOR = Redactor(PII_REDACTION_KINDS.split(","))
+REDACTIONS = metrics.counter("pii_redactions_total", "Values masked before leaving the process.", ["type"])
+
+
 def protect(user_text: str) -> Dict:
-    clean = basic_sanitize(user_text)
-    # In a real app, mask phone/emails; here we keep it simple
-    return {"sanitized": clean, "redactions": []}
+    """Sanitize ``user_text`` and mask phones, emails, addresses, IDs and stated names.
+
+    ``sanitized`` is what the rest of the pipeline (and every provider) sees. ``redactions``
+    lists the masked spans as offsets into ``user_text``; ``placeholders`` maps each
+    placeholder back to its value so the answer can be re-personalized.
+    """
+    if not PII_REDACTION_ENABLED:
+        return {"sanitized": basic_sanitize(user_text), "redactions": [], "placeholders": {}}
+    result = REDACTOR.redact(user_text)
+    for span in result.spans:
+        REDACTIONS.inc(span["type"])
+    return {"sanitized": result.text, "redactions": result.spans, "placeholders": result.placeholders}
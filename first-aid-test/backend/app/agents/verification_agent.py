@@ -5,8 +5,24 @@ from ..services import rules_guardrails as guardrails
 
 def verify(generated_text: str) -> Dict:
     # Very simple policy checks with guardrails; extend with more signals (NLM, UMLS, etc.)
-    violations = guardrails.violates(generated_text)
+    violations = guardrails.find_matches(generated_text)
     return {
         "passed": not violations,
-        "policy_flags": ["guardrails_violation"] if violations else []
+        "policy_flags": ["guardrails_violation"] if violations else [],
+        "matches": [{"rule": m.rule, "term": m.term, "start": m.start, "end": m.end} for m in violations],
     }
+
+
+class StreamVerifier:
+    """Incremental guardrail check for streamed text (see ``rules_guardrails.StreamMatcher``)."""
+
+    def __init__(self):
+        self._matcher = guardrails.StreamMatcher()
+        # Text a match could still be growing into; callers hold this much back before showing it.
+        self.holdback = self._matcher.rules.max_match_length
+
+    def feed(self, chunk: str) -> bool:
+        return bool(self._matcher.feed(chunk))
+
+    def close(self) -> bool:
+        return bool(self._matcher.close())
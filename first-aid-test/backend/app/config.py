@@ -7,6 +7,9 @@ All sensitive settings are loaded from environment variables (optionally via a
 from __future__ import annotations
 
 import os
+import shlex
+import sys
+from pathlib import Path
 
 try:
     from dotenv import load_dotenv
@@ -16,6 +19,32 @@ except Exception:
     # ``python-dotenv`` is optional; ignore import/time errors during runtime.
     pass
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_path(name: str, default: str) -> str:
+    # An empty value (e.g. ``NAME=`` copied from .env.example) means "use the default", not ".".
+    return os.getenv(name) or default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in {"1", "true", "yes", "on"}
+
+
 # Provider API keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
@@ -31,6 +60,141 @@ ASTRA_DB_APPLICATION_TOKEN = os.getenv("ASTRA_DB_APPLICATION_TOKEN", "")
 MODEL_PREFERENCE = os.getenv("MODEL_PREFERENCE", "groq")  # 'groq' or 'openai'
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
 
+# Provider endpoints and chat models (override to route through a proxy or local stub)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").rstrip("/")
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+GROQ_CHAT_MODEL = os.getenv("GROQ_CHAT_MODEL", "llama-3.1-70b-versatile")
+
+# Shared outbound HTTP client (see services/http_client.py)
+HTTP_CONNECT_TIMEOUT = _env_float("HTTP_CONNECT_TIMEOUT", 3.0)
+HTTP_READ_TIMEOUT = _env_float("HTTP_READ_TIMEOUT", 20.0)
+HTTP_MAX_CONNECTIONS_PER_HOST = _env_int("HTTP_MAX_CONNECTIONS_PER_HOST", 20)
+HTTP_MAX_KEEPALIVE_PER_HOST = _env_int("HTTP_MAX_KEEPALIVE_PER_HOST", 10)
+HTTP_KEEPALIVE_EXPIRY = _env_float("HTTP_KEEPALIVE_EXPIRY", 30.0)
+HTTP2_ENABLED = _env_bool("HTTP2_ENABLED", True)
+
+# Embedding cache: in-process LRU + optional SQLite tier (empty path disables it)
+EMBED_CACHE_MAX_ENTRIES = _env_int("EMBED_CACHE_MAX_ENTRIES", 2048)
+EMBED_CACHE_TTL_SECONDS = _env_float("EMBED_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "")
+# In-memory cached vectors: none (float32), float16 or int8 (+ scale); the disk tier keeps float32
+EMBED_CACHE_QUANTIZATION = os.getenv("EMBED_CACHE_QUANTIZATION", "none").strip().lower()
+# Embeddings wire format requested from the provider: base64 (packed float32) or float (JSON numbers)
+EMBED_ENCODING_FORMAT = os.getenv("EMBED_ENCODING_FORMAT", "base64").strip().lower()
+# Send/receive Astra vectors as {"$binary": ...} through the Data API find/insertMany commands
+# instead of JSON number arrays on the legacy vector-search route
+ASTRA_VECTOR_BINARY = _env_bool("ASTRA_VECTOR_BINARY", False)
+
+# Triage + instructions result cache (0 entries disables it; threshold 0 disables near-duplicate lookup)
+RESPONSE_CACHE_MAX_ENTRIES = _env_int("RESPONSE_CACHE_MAX_ENTRIES", 512)
+RESPONSE_CACHE_TTL_SECONDS = _env_float("RESPONSE_CACHE_TTL_SECONDS", 3600)
+RESPONSE_CACHE_SEMANTIC_THRESHOLD = _env_float("RESPONSE_CACHE_SEMANTIC_THRESHOLD", 0.0)
+
+# Vector store backend: 'astra' (remote Data API) or 'local' (in-process mmap index)
+DATA_DIR = Path(_env_path("DATA_DIR", str(Path(__file__).resolve().parent / "data")))
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "astra").strip().lower()
+LOCAL_VECTOR_PATH = _env_path("LOCAL_VECTOR_PATH", str(DATA_DIR / "index" / "vectors"))
+LOCAL_VECTOR_SEARCH = os.getenv("LOCAL_VECTOR_SEARCH", "auto").strip().lower()  # exact | approx | auto
+LOCAL_VECTOR_ANN_MIN_DOCS = _env_int("LOCAL_VECTOR_ANN_MIN_DOCS", 20000)
+LOCAL_VECTOR_NPROBE = _env_int("LOCAL_VECTOR_NPROBE", 8)
+
+# Guardrail rules file; checked for changes (and hot-reloaded) at most every N seconds, 0 disables
+GUARDRAILS_PATH = _env_path("GUARDRAILS_PATH", str(Path(__file__).resolve().parent / "guardrails.yaml"))
+GUARDRAILS_RELOAD_SECONDS = _env_float("GUARDRAILS_RELOAD_SECONDS", 2.0)
+
+# Local triage tier: inputs classified locally with at least this confidence skip the LLM
+TRIAGE_LOCAL_ENABLED = _env_bool("TRIAGE_LOCAL_ENABLED", True)
+TRIAGE_LOCAL_THRESHOLD = _env_float("TRIAGE_LOCAL_THRESHOLD", 0.85)
+TRIAGE_TRAINING_PATH = _env_path("TRIAGE_TRAINING_PATH", str(DATA_DIR / "triage_examples.jsonl"))
+
+# Clarification prompts: spelling index vocabulary ("term" or "term|gloss" per line)
+CLARIFY_VOCAB_PATH = _env_path("CLARIFY_VOCAB_PATH", str(DATA_DIR / "emergency_terms.txt"))
+# Dictionary words (one per line) are never treated as typos
+CLARIFY_DICTIONARY_PATH = _env_path("CLARIFY_DICTIONARY_PATH", str(DATA_DIR / "english_words.txt"))
+CLARIFY_MAX_EDIT_DISTANCE = _env_int("CLARIFY_MAX_EDIT_DISTANCE", 2)
+
+# Server-side chat sessions: in-memory LRU with idle timeout, optional SQLite tier
+SESSION_MAX_ENTRIES = _env_int("SESSION_MAX_ENTRIES", 10000)
+SESSION_IDLE_SECONDS = _env_float("SESSION_IDLE_SECONDS", 1800)
+SESSION_MAX_MESSAGES = _env_int("SESSION_MAX_MESSAGES", 100)
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "")
+
+# Metrics: latency histograms and counters exposed at /api/metrics
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# Background dependency probes behind /api/health/details and /api/health/ready (0 disables)
+HEALTH_PROBE_INTERVAL_SECONDS = _env_float("HEALTH_PROBE_INTERVAL_SECONDS", 30)
+HEALTH_PROBE_TIMEOUT_SECONDS = _env_float("HEALTH_PROBE_TIMEOUT_SECONDS", 3)
+
+# Startup warm-up (see services/warmup.py): /api/health/ready reports 503 until it finishes.
+# Off by default; when on, a first health-probe round also calls the providers at startup.
+# The lifespan waits at most WARMUP_TIMEOUT_SECONDS before serving; unfinished steps keep running.
+# Embedding/response caches are snapshotted to CACHE_SNAPSHOT_DIR at shutdown. The snapshots hold
+# text derived from user input, so this is off (empty) unless a directory is set.
+WARMUP_ENABLED = _env_bool("WARMUP_ENABLED", False)
+WARMUP_TIMEOUT_SECONDS = _env_float("WARMUP_TIMEOUT_SECONDS", 30)
+CACHE_SNAPSHOT_DIR = os.getenv("CACHE_SNAPSHOT_DIR", "")
+
+# /api/chat/batch: max inputs per request, pipelines in flight, texts per embeddings call
+BATCH_MAX_ITEMS = _env_int("BATCH_MAX_ITEMS", 10000)
+BATCH_CONCURRENCY = _env_int("BATCH_CONCURRENCY", 8)
+BATCH_EMBED_SIZE = _env_int("BATCH_EMBED_SIZE", 64)
+
+# LLM provider router: circuit breaker and optional hedged requests (see services/llm_router.py)
+LLM_BREAKER_FAILURES = _env_int("LLM_BREAKER_FAILURES", 3)
+LLM_BREAKER_COOLDOWN_SECONDS = _env_float("LLM_BREAKER_COOLDOWN_SECONDS", 30)
+LLM_HEDGE_ENABLED = _env_bool("LLM_HEDGE_ENABLED", False)
+LLM_HEDGE_MIN_DELAY_MS = _env_float("LLM_HEDGE_MIN_DELAY_MS", 300)
+LLM_HEDGE_DEFAULT_DELAY_MS = _env_float("LLM_HEDGE_DEFAULT_DELAY_MS", 2000)
+
+# Retrieved context for instruction generation (see services/context_packer.py)
+RETRIEVAL_TOP_K = _env_int("RETRIEVAL_TOP_K", 6)
+CONTEXT_TOKEN_BUDGET = _env_int("CONTEXT_TOKEN_BUDGET", 800)
+CONTEXT_DEDUP_THRESHOLD = _env_float("CONTEXT_DEDUP_THRESHOLD", 0.8)
+CONTEXT_MMR_LAMBDA = _env_float("CONTEXT_MMR_LAMBDA", 0.7)
+
+# Local BM25 index built by ingestion; retrieval fuses it with vector search (reciprocal rank,
+# constant RETRIEVAL_RRF_K) and uses it alone when embeddings are unavailable.
+LEXICAL_INDEX_ENABLED = _env_bool("LEXICAL_INDEX_ENABLED", True)
+LEXICAL_INDEX_PATH = _env_path("LEXICAL_INDEX_PATH", str(DATA_DIR / "index" / "lexical"))
+RETRIEVAL_RRF_K = _env_int("RETRIEVAL_RRF_K", 60)
+
+# MCP tool layer (see services/mcp_client.py). MCP_SERVER_COMMAND is started once, from backend/,
+# and kept running; empty serves the tools in-process. TTLs are per tool, timeouts per call.
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND", f"{shlex.quote(sys.executable)} -m app.mcp_stdio_server")
+MCP_START_TIMEOUT_SECONDS = _env_float("MCP_START_TIMEOUT_SECONDS", 10)
+MCP_RESTART_BACKOFF_SECONDS = _env_float("MCP_RESTART_BACKOFF_SECONDS", 5)
+MCP_TOOL_TIMEOUT_MS = _env_float("MCP_TOOL_TIMEOUT_MS", 1000)
+MCP_CACHE_MAX_ENTRIES = _env_int("MCP_CACHE_MAX_ENTRIES", 1024)
+MCP_EMERGENCY_NUMBERS_TTL_SECONDS = _env_float("MCP_EMERGENCY_NUMBERS_TTL_SECONDS", 86400)
+MCP_MAPS_TTL_SECONDS = _env_float("MCP_MAPS_TTL_SECONDS", 600)
+TOOLS_COUNTRY_CODE = os.getenv("TOOLS_COUNTRY_CODE", "LK").strip().upper()
+
+# Fused mode: triage and steps from one structured-output completion (see agents/fused_agent.py).
+# Response format sent to the provider: json_schema, json_object or none.
+LLM_FUSED_ENABLED = _env_bool("LLM_FUSED_ENABLED", False)
+LLM_FUSED_RESPONSE_FORMAT = os.getenv("LLM_FUSED_RESPONSE_FORMAT", "json_schema").strip().lower()
+
+# Admission control (see services/admission.py). Chat requests beyond MAX_IN_FLIGHT wait in a
+# queue of QUEUE_SIZE for at most QUEUE_TIMEOUT_MS, else get rule-based steps at once.
+# STAGE_LIMITS caps concurrent outbound calls per stage ("stage=limit,..."). 0 disables a limit.
+ADMISSION_MAX_IN_FLIGHT = _env_int("ADMISSION_MAX_IN_FLIGHT", 32)
+ADMISSION_QUEUE_SIZE = _env_int("ADMISSION_QUEUE_SIZE", 64)
+ADMISSION_QUEUE_TIMEOUT_MS = _env_float("ADMISSION_QUEUE_TIMEOUT_MS", 2000)
+ADMISSION_STAGE_LIMITS = os.getenv("ADMISSION_STAGE_LIMITS", "classify=16,generate=16,fused=16,embed=32")
+ADMISSION_STAGE_TIMEOUT_MS = _env_float("ADMISSION_STAGE_TIMEOUT_MS", 500)
+
+# PII redaction before text leaves the process (see services/redaction.py): phones, emails,
+# addresses, IDs and stated names become placeholders such as [PHONE_1] for the LLM, embedding
+# and cache layers, and are put back into the steps shown to the user. KINDS limits what is masked.
+PII_REDACTION_ENABLED = _env_bool("PII_REDACTION_ENABLED", True)
+PII_REDACTION_KINDS = os.getenv("PII_REDACTION_KINDS", "EMAIL,PHONE,ID,ADDRESS,NAME")
+
+# Gzip JSON responses of at least this many bytes for clients that accept it (0 disables).
+# The streaming endpoints (SSE, NDJSON batch) are never compressed so events are not held back.
+RESPONSE_GZIP_MIN_BYTES = _env_int("RESPONSE_GZIP_MIN_BYTES", 1024)
+
 
 def has_openai() -> bool:
     """Return True when an OpenAI API key is configured."""
@@ -44,6 +208,13 @@ def has_groq() -> bool:
     return bool(GROQ_API_KEY)
 
 
+def stage_model(provider: str, stage: str) -> str:
+    """Model for a pipeline stage on a provider, e.g. ``GROQ_CLASSIFY_MODEL``; defaults to its chat model."""
+
+    default = GROQ_CHAT_MODEL if provider == "groq" else OPENAI_CHAT_MODEL
+    return os.getenv(f"{provider.upper()}_{stage.upper()}_MODEL", "") or default
+
+
 def has_astra() -> bool:
     """Return True when the Astra configuration is complete."""
 
@@ -0,0 +1,225 @@
+# ingest.py
+# Bulk knowledge-base ingestion: stream JSONL/Markdown guides, chunk them, embed
+# in batches (many inputs per embeddings call) and write to the configured vector
+# store with bounded concurrency. Completed chunk ids are appended to a
+# checkpoint file so an interrupted reload resumes where it stopped. Every
+# chunk (resumed ones included) also goes into the local BM25 index, which is
+# saved at the end and needs no embeddings.
+#
+#   python -m app.ingest guides/*.jsonl guides/*.md --checkpoint ingest.ckpt
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from .agents import instruction_agent
+from .services import lexical_index, vector_db
+
+LOGGER = logging.getLogger(__name__)
+
+_HEADING = re.compile(r"^#{1,6}\s+(.*)$")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def read_documents(path: Path) -> Iterator[Dict]:
+    """Yield ``{_id, text, meta}`` documents from a JSONL file or Markdown guide."""
+    if path.suffix.lower() in {".jsonl", ".ndjson"}:
+        with path.open("r", encoding="utf-8") as handle:
+            for lineno, line in enumerate(handle, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    LOGGER.warning("%s:%d: skipping invalid JSON (%s)", path, lineno, exc)
+                    continue
+                text = record.get("text") or record.get("content") or ""
+                if not text.strip():
+                    continue
+                meta = {k: v for k, v in record.items() if k not in ("_id", "id", "text", "content")}
+                meta.setdefault("source", path.name)
+                yield {"_id": str(record.get("_id") or record.get("id") or f"{path.stem}:{lineno}"),
+                       "text": text, "meta": meta}
+        return
+
+    # Markdown (or plain text): one document per heading section
+    section, title, lines = 0, path.stem, []
+    with path.open("r", encoding="utf-8") as handle:
+        for line in handle:
+            match = _HEADING.match(line)
+            if match:
+                if "".join(lines).strip():
+                    yield {"_id": f"{path.stem}#{section}", "text": "".join(lines).strip(),
+                           "meta": {"source": path.name, "title": title}}
+                    section += 1
+                title, lines = match.group(1).strip(), []
+            else:
+                lines.append(line)
+    if "".join(lines).strip():
+        yield {"_id": f"{path.stem}#{section}", "text": "".join(lines).strip(),
+               "meta": {"source": path.name, "title": title}}
+
+
+def chunk_document(doc: Dict, max_chars: int = 1200) -> List[Dict]:
+    """Split a document into paragraph/sentence-aligned chunks of at most ``max_chars``."""
+    pieces: List[str] = []
+    for para in re.split(r"\n\s*\n", doc["text"]):
+        para = para.strip()
+        if not para:
+            continue
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        for sentence in _SENTENCE.split(para):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+
+    return [
+        {"_id": f"{doc['_id']}::{i}", "text": text, "meta": dict(doc.get("meta", {}), parent=doc["_id"], chunk=i)}
+        for i, text in enumerate(chunks)
+    ]
+
+
+def _batched(items: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoint:
+    """Append-only record of chunk ids that were written successfully."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = Path(path) if path else None
+        self.done: Set[str] = set()
+        self._lock = threading.Lock()
+        if self.path and self.path.exists():
+            self.done = {line.strip() for line in self.path.read_text(encoding="utf-8").splitlines() if line.strip()}
+
+    def mark(self, ids: List[str]) -> None:
+        with self._lock:
+            self.done.update(ids)
+            if self.path:
+                with self.path.open("a", encoding="utf-8") as handle:
+                    handle.write("".join(f"{i}\n" for i in ids))
+
+
+def _write_batch(batch: List[Dict], retries: int, backoff: float) -> None:
+    for attempt in range(retries + 1):
+        try:
+            vectors = instruction_agent.embed_batch([c["text"] for c in batch], use_cache=False)
+            docs = [dict(c, embedding=v) for c, v in zip(batch, vectors) if v]
+            if len(docs) != len(batch):
+                raise RuntimeError(f"{len(batch) - len(docs)} chunks came back without an embedding")
+            vector_db.insert_many(docs)
+            return
+        except Exception as exc:
+            if attempt >= retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            LOGGER.warning("Batch starting %s failed (%s); retrying in %.1fs", batch[0]["_id"], exc, delay)
+            time.sleep(delay)
+
+
+def ingest(paths: Iterable[str], batch_size: int = 64, concurrency: int = 4, max_chars: int = 1200,
+           checkpoint: Optional[str] = None, retries: int = 3, backoff: float = 1.0, lexical: bool = True) -> Dict:
+    """Chunk, embed and store every document under ``paths``; return a summary."""
+    started = time.perf_counter()
+    ckpt = Checkpoint(checkpoint)
+    index = lexical_index.get_index() if lexical else None
+    stats = {"documents": 0, "chunks": 0, "skipped": 0, "batches": 0, "failed_batches": 0, "failed_chunks": 0}
+
+    def chunks() -> Iterator[Dict]:
+        for raw in paths:
+            for doc in read_documents(Path(raw)):
+                stats["documents"] += 1
+                for chunk in chunk_document(doc, max_chars=max_chars):
+                    if index is not None:
+                        index.add([chunk])
+                    if chunk["_id"] in ckpt.done:
+                        stats["skipped"] += 1
+                        continue
+                    stats["chunks"] += 1
+                    yield chunk
+
+    def run(batch: List[Dict]) -> List[Dict]:
+        _write_batch(batch, retries, backoff)
+        ckpt.mark([c["_id"] for c in batch])
+        return batch
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            pending = {}
+            for batch in _batched(chunks(), batch_size):
+                # Bounded in-flight work keeps memory flat for large corpora.
+                while len(pending) >= 2 * concurrency:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        _collect(fut, pending.pop(fut), stats)
+                pending[pool.submit(run, batch)] = batch
+            for fut in list(pending):
+                _collect(fut, pending.pop(fut), stats)
+    finally:
+        vector_db.flush()
+        if index is not None:
+            index.save()
+            stats["lexical_documents"] = len(index)
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def _collect(fut, batch: List[Dict], stats: Dict) -> None:
+    try:
+        fut.result()
+        stats["batches"] += 1
+    except Exception as exc:
+        LOGGER.error("Batch starting %s failed permanently: %s", batch[0]["_id"], exc)
+        stats["failed_batches"] += 1
+        stats["failed_chunks"] += len(batch)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load first-aid guides into the vector store.")
+    parser.add_argument("paths", nargs="+", help="JSONL (one {_id?, text, ...} per line) or Markdown files")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embeddings/insert call")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight")
+    parser.add_argument("--max-chars", type=int, default=1200, help="maximum chunk size in characters")
+    parser.add_argument("--checkpoint", help="file recording finished chunk ids, for resuming")
+    parser.add_argument("--retries", type=int, default=3, help="retries per batch")
+    parser.add_argument("--no-lexical", action="store_true", help="do not update the local BM25 index")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    stats = ingest(args.paths, batch_size=args.batch_size, concurrency=args.concurrency,
+                   max_chars=args.max_chars, checkpoint=args.checkpoint, retries=args.retries,
+                   lexical=not args.no_lexical)
+    print(json.dumps(stats, indent=2))
+    return 1 if stats["failed_batches"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
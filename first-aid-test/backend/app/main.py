@@ -1,18 +1,35 @@
 # main.py
 # FastAPI app exposing chat endpoint for the client.
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-import requests
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.middleware.gzip import GZipMiddleware
 from .config import (
     MODEL_PREFERENCE, has_openai, has_groq, has_astra,
-    ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_COLLECTION
+    ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_COLLECTION,
+    BATCH_MAX_ITEMS, BATCH_CONCURRENCY, RESPONSE_GZIP_MIN_BYTES,
+    VECTOR_BACKEND, WARMUP_ENABLED, WARMUP_TIMEOUT_SECONDS, CACHE_SNAPSHOT_DIR,
 )
+from .services import (
+    admission, embedding_cache, http_client, json_codec, lexical_index, llm_router, mcp_client, metrics,
+    response_cache, rules_guardrails, vector_db,
+)
+from .services.health import PROBER
+from .services.warmup import WARMUP
+from .services.session_store import STORE as SESSIONS, Session
 from pydantic import BaseModel
-from .agents import conversational_agent
+from .agents import conversational_agent, local_triage, security_agent
 from typing import List, Optional, Literal
 from textwrap import dedent
 
 
+LOGGER = logging.getLogger(__name__)
+
 Role = Literal['user', 'assistant', 'system']
+View = Literal['full', 'lean']
 
 
 class ChatMessage(BaseModel):
@@ -21,8 +38,56 @@ class ChatMessage(BaseModel):
 
 
 class ChatContinueRequest(BaseModel):
-    messages: List[ChatMessage]
+    # Stateless clients send the full history in ``messages``. Session clients send only
+    # the new ``message`` plus ``session_id``; the server keeps the conversation state.
+    messages: List[ChatMessage] = []
     session_id: Optional[str] = None
+    message: Optional[str] = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded by json_codec (orjson when installed).
+
+    Chat endpoints return it directly, which also skips FastAPI's jsonable_encoder
+    pass over the result dict.
+    """
+
+    def render(self, content) -> bytes:
+        return json_codec.dumps(content)
+
+
+def _lean_fields(view: str, fields: Optional[str]) -> Optional[set]:
+    """None for the full response; otherwise the heavy result sections to keep (``fields=a,b``)."""
+    if view != "lean" and fields is None:
+        return None
+    return {f.strip() for f in (fields or "").split(",") if f.strip()}
+
+
+def _lean_result(result: dict, fields: set) -> dict:
+    """Compact result summary plus the requested sections (triage, tools, instructions,
+    verification, security, conversation, ...). Error results are returned unchanged."""
+    if result.get("error"):
+        return result
+    triage = result.get("triage") or {}
+    summary = {
+        "category": triage.get("category"),
+        "severity": triage.get("severity"),
+        "risk_confidence": result.get("risk_confidence"),
+        "verified": (result.get("verification") or {}).get("passed", True),
+        "needs_clarification": bool((result.get("conversation") or {}).get("needs_clarification")),
+    }
+    instructions = result.get("instructions") or {}
+    if instructions.get("fallback"):
+        summary["fallback"] = True
+    if instructions.get("partial"):
+        summary["partial"] = True
+    for key in ("cache", "shed", "timings"):
+        if key in result:
+            summary[key] = result[key]
+    for key in fields:
+        if key in result:
+            summary[key] = result[key]
+    return summary
 
 
 def _normalize_steps(steps) -> str:
@@ -108,24 +173,153 @@ def _compose_assistant_message(result: dict, user_text: str, history: List[ChatM
     return response
 
 
-app = FastAPI(title="FirstAidGuide - Multi-Agent API")
+_WARMUP_TEXT = "My friend fell and is bleeding from a cut on the head, call 0771234567"
+
+
+def _warm_guardrails() -> int:
+    # Run the rule, PII and local-triage patterns once so their first real use is not the slow one.
+    rules = rules_guardrails.current()
+    rules.search(_WARMUP_TEXT)
+    security_agent.REDACTOR.redact(_WARMUP_TEXT)
+    local_triage.classify(_WARMUP_TEXT)
+    return rules.version
+
+
+def _warm_vector_store() -> int:
+    store = vector_db.get_store()
+    return store.warm() if hasattr(store, "warm") else 0
+
+
+def _restore_caches() -> str:
+    embeddings = embedding_cache.CACHE.load_snapshot(CACHE_SNAPSHOT_DIR)
+    responses = response_cache.CACHE.load_snapshot(CACHE_SNAPSHOT_DIR)
+    return f"{embeddings} embeddings, {responses} responses"
+
+
+def _save_caches() -> None:
+    try:
+        embeddings = embedding_cache.CACHE.save_snapshot(CACHE_SNAPSHOT_DIR)
+        responses = response_cache.CACHE.save_snapshot(CACHE_SNAPSHOT_DIR)
+        LOGGER.info("Saved cache snapshot to %s: %d embeddings, %d responses",
+                    CACHE_SNAPSHOT_DIR, embeddings, responses)
+    except (OSError, ValueError) as exc:
+        LOGGER.warning("Cache snapshot not saved: %s", exc)
+
+
+def _warmup_steps() -> dict:
+    # The BM25 index and the MCP server were always started here; the rest is optional warm-up.
+    steps = {
+        "lexical_index": lambda: len(lexical_index.get_index() or ()),
+        "tools": mcp_client.RUNTIME.warm,
+    }
+    if not WARMUP_ENABLED:
+        return steps
+    steps.update({
+        "guardrails": _warm_guardrails,
+        "spell_index": lambda: len(conversational_agent.spell_index()),
+        "triage_model": lambda: len(local_triage.model().vocab),
+    })
+    if VECTOR_BACKEND == "local":
+        steps["vector_store"] = _warm_vector_store
+    if CACHE_SNAPSHOT_DIR:
+        steps["caches"] = _restore_caches
+    return steps
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pipelines run their blocking stages via asyncio.to_thread; size that pool for the
+    # admission limits so admitted work never waits behind it.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=admission.worker_threads(), thread_name_prefix="pipeline"))
+    # The first probe round (network calls that also open the pooled connections) runs in the
+    # background; readiness waits for it through the prober, not through the warm-up timeout.
+    PROBER.start(once=WARMUP_ENABLED)
+    await WARMUP.start(_warmup_steps(), WARMUP_TIMEOUT_SECONDS)
+    yield
+    await WARMUP.stop()
+    await PROBER.stop()
+    if CACHE_SNAPSHOT_DIR and WARMUP.done:  # an interrupted restore must not overwrite the snapshot
+        await asyncio.to_thread(_save_caches)
+    mcp_client.RUNTIME.close()
+    http_client.close_all()
+    admission.shutdown_pools()
+
+
+app = FastAPI(title="FirstAidGuide - Multi-Agent API", lifespan=lifespan)
+
+# Streamed bodies are left alone: Starlette's gzip does not flush per chunk, so it
+# would hold SSE tokens and NDJSON records back until the compressor fills.
+STREAMING_PATHS = {"/api/chat/stream", "/api/chat/batch"}
+
+
+class _GZipExceptStreams(GZipMiddleware):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in STREAMING_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+if RESPONSE_GZIP_MIN_BYTES > 0:
+    app.add_middleware(_GZipExceptStreams, minimum_size=RESPONSE_GZIP_MIN_BYTES)
 
 class ChatRequest(BaseModel):
     message: str
 
+async def _run_pipeline(user_text: str, **pipeline_kwargs) -> dict:
+    """Run the pipeline under admission control; a shed request gets rule-based steps at once
+    (built in-process from local data, so shedding never blocks the event loop)."""
+    if not await admission.REQUESTS.acquire_async():
+        return conversational_agent.shed_result(user_text, **pipeline_kwargs)
+    try:
+        return await conversational_agent.handle_message_async(user_text, **pipeline_kwargs)
+    finally:
+        admission.REQUESTS.release()
+
+
 @app.post("/api/chat")
-def chat(req: ChatRequest):
-    # Orchestrate the multi-agent flow
-    result = conversational_agent.handle_message(req.message)
-    return {"ok": True, "result": result}
+async def chat(req: ChatRequest, timings: bool = False, view: View = "full", fields: Optional[str] = None):
+    # Orchestrate the multi-agent flow; independent stages run concurrently
+    with metrics.request_timings(enabled=timings) as timer:
+        result = await _run_pipeline(req.message)
+    if timings:
+        result["timings"] = timer.summary()
+    lean = _lean_fields(view, fields)
+    return FastJSONResponse({"ok": True, "result": result if lean is None else _lean_result(result, lean)})
+
+class ChatBatchRequest(BaseModel):
+    messages: List[str]
+    concurrency: Optional[int] = None  # lowers BATCH_CONCURRENCY for this request
+
+
+@app.post("/api/chat/batch")
+async def chat_batch(req: ChatBatchRequest):
+    """Run many independent messages; NDJSON records stream back as each one finishes, then a summary."""
+    if not req.messages:
+        return {"ok": False, "error": "No messages provided"}
+    if len(req.messages) > BATCH_MAX_ITEMS:
+        return {"ok": False, "error": f"At most {BATCH_MAX_ITEMS} messages per batch"}
+    concurrency = max(1, min(req.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY))
+    records = conversational_agent.handle_batch_async(req.messages, concurrency=concurrency)
+    return StreamingResponse((json_codec.dumps_str(r) + "\n" async for r in records),
+                             media_type="application/x-ndjson")
+
 
 @app.get("/api/health")
-def health():
+async def health():
+    # Async so liveness is answered on the event loop even when worker threads are saturated.
     return {"ok": True}
 
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition: stage/HTTP latency histograms, fallbacks, cache ratios."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/api/health/details")
-def health_details():
+async def health_details():
     details = {"ok": True}
     # Config presence
     details["config"] = {
@@ -134,25 +328,17 @@ def health_details():
         "has_groq_key": has_groq(),
         "has_astra_config": has_astra(),
     }
-    # Shallow external reachability checks (no secrets)
-    checks = {}
-    try:
-        r = requests.get("https://api.openai.com/v1/models", timeout=3)
-        checks["openai_models_head"] = r.status_code
-    except Exception as exc:
-        checks["openai_models_head"] = str(exc)
-    try:
-        r = requests.get("https://api.groq.com/openai/v1/models", timeout=3)
-        checks["groq_models_head"] = r.status_code
-    except Exception as exc:
-        checks["groq_models_head"] = str(exc)
-    if has_astra():
-        try:
-            r = requests.get(ASTRA_DB_API_ENDPOINT, timeout=3)
-            checks["astra_endpoint"] = r.status_code
-        except Exception as exc:
-            checks["astra_endpoint"] = str(exc)
-    details["connectivity"] = checks
+    # Reachability comes from the background prober's last round; nothing is called here.
+    probes = PROBER.snapshot()
+    legacy_keys = {"openai": "openai_models_head", "groq": "groq_models_head", "astra": "astra_endpoint"}
+    details["connectivity"] = {
+        legacy_keys.get(name, name): probe["status"] if probe["status"] is not None else probe["error"]
+        for name, probe in probes.items()
+    }
+    details["probes"] = probes
+    details["llm_router"] = llm_router.ROUTER.snapshot()
+    details["admission"] = admission.snapshot()
+    details["warmup"] = WARMUP.snapshot()
     details["astra"] = {
         "endpoint_set": bool(ASTRA_DB_API_ENDPOINT),
         "keyspace_set": bool(ASTRA_DB_KEYSPACE),
@@ -161,20 +347,125 @@ def health_details():
     return details
 
 
-@app.post("/api/chat/continue")
-def chat_continue(req: ChatContinueRequest):
+@app.get("/api/health/ready")
+async def health_ready():
+    """Readiness: 200 once warm-up has finished and a chat provider answered the last probe.
+    Unusable embeddings or vector store are reported under ``degraded``."""
+    state = PROBER.readiness()
+    if not WARMUP.done:
+        state["ready"] = False
+        state["reasons"].insert(0, "warming up")
+    state["warmup"] = WARMUP.snapshot()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+def _resolve_turn(req: ChatContinueRequest):
+    """Return ``(last_user, pipeline kwargs, session)`` for a continue/stream request,
+    or an error message."""
+    session = None
+    if req.session_id:
+        # IDs are issued by the server; an unknown one is never adopted as a new session.
+        session = SESSIONS.get(req.session_id)
+        if session is None and req.message is not None:
+            return "Unknown or expired session_id"
+        # A full-history client sent its whole transcript, so an expired session costs it nothing.
+    if req.message is not None:
+        if not req.message.strip():
+            return "No user message provided"
+        if session is None:
+            # First turn of a session client: start one, seeded with any history it sent.
+            session = SESSIONS.create([m.dict() for m in req.messages])
+        return req.message, {"context_text": session.context_for(req.message)}, session
+
     # Find the latest user message
     user_msgs = [m for m in req.messages if m.role == 'user']
     if not user_msgs:
-        return {"ok": False, "error": "No user message provided"}
-    last_user = user_msgs[-1].content
+        return "No user message provided"
+    return user_msgs[-1].content, {"history": [m.dict() for m in req.messages]}, session
+
+
+def _record_turn(req: ChatContinueRequest, session: Optional[Session], user_text: str, assistant_text: str):
+    if session is None:
+        return
+    if req.message is not None:
+        session.add_turn(user_text, assistant_text)
+    else:
+        # Full-history client naming its session: the history it sent is the transcript.
+        session.reset([m.dict() for m in req.messages] + [{"role": "assistant", "content": assistant_text}])
+    SESSIONS.save(session)
+
+
+@app.post("/api/chat/continue")
+async def chat_continue(req: ChatContinueRequest, timings: bool = False, view: View = "full",
+                        fields: Optional[str] = None):
+    """One chat turn. ``view=lean`` (or ``fields=...``) returns only the new assistant message
+    and a compact result summary instead of echoing the history and the full result."""
+    turn = _resolve_turn(req)
+    if isinstance(turn, str):
+        return {"ok": False, "error": turn}
+    last_user, pipeline_kwargs, session = turn
 
     # Run existing pipeline on the last user message
-    history = [m.dict() for m in req.messages]
-    result = conversational_agent.handle_message(last_user, history)
+    with metrics.request_timings(enabled=timings) as timer:
+        result = await _run_pipeline(last_user, **pipeline_kwargs)
+    if timings:
+        result["timings"] = timer.summary()
 
     # Compose assistant-style message
     assistant_text = _compose_assistant_message(result, last_user, req.messages)
+    _record_turn(req, session, last_user, assistant_text)
+
+    lean = _lean_fields(view, fields)
+    if lean is not None:
+        result = _lean_result(result, lean)
+    if req.message is not None or lean is not None:
+        # Session mode or lean view: the client already has the history, so only the new reply is returned.
+        body = {"ok": True, "message": {"role": "assistant", "content": assistant_text}, "result": result}
+        if session is not None:
+            body["session_id"] = session.session_id
+        return FastJSONResponse(body)
     new_messages = req.messages + [ChatMessage(role='assistant', content=assistant_text)]
-
-    return {"ok": True, "messages": [m.dict() for m in new_messages], "result": result}
+    return FastJSONResponse({"ok": True, "messages": [m.dict() for m in new_messages], "result": result})
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json_codec.dumps_str(data)}\n\n"
+
+
+@app.post("/api/chat/stream")
+def chat_stream(req: ChatContinueRequest, view: View = "full", fields: Optional[str] = None):
+    """Server-sent events: triage, instruction tokens, then verification/risk and the final result
+    (summarized as in ``/api/chat/continue`` with ``view=lean`` or ``fields=``)."""
+    turn = _resolve_turn(req)
+    if isinstance(turn, str):
+        return {"ok": False, "error": turn}
+    last_user, pipeline_kwargs, session = turn
+    lean = _lean_fields(view, fields)
+
+    def events():
+        # Admitted when the body starts streaming, so a response that is never sent holds no slot.
+        admitted = admission.REQUESTS.acquire()
+        if admitted:
+            stream = conversational_agent.stream_message(last_user, **pipeline_kwargs)
+        else:
+            stream = conversational_agent.stream_shed(last_user, **pipeline_kwargs)
+        try:
+            for event, data in stream:
+                if event == "done":
+                    assistant_text = _compose_assistant_message(data, last_user, req.messages)
+                    _record_turn(req, session, last_user, assistant_text)
+                    data = {"result": data if lean is None else _lean_result(data, lean),
+                            "assistant_message": assistant_text}
+                    if session is not None:
+                        data["session_id"] = session.session_id
+                yield _sse(event, data)
+        finally:
+            stream.close()
+            if admitted:
+                admission.REQUESTS.release()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,100 @@
+# mcp_stdio_server.py
+# Stand-in MCP tool server for offline runs and tests. It speaks MCP's stdio
+# transport: newline-delimited JSON-RPC 2.0 on stdin/stdout, with
+# initialize, ping, tools/list and tools/call. The tools come from
+# services/mcp_server.py. Each request is handled on its own thread, so
+# concurrent tool calls overlap. Diagnostics go to stderr only.
+#
+#   cd backend && python -m app.mcp_stdio_server [--latency-ms 50]
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from .services import mcp_server
+
+PROTOCOL_VERSION = "2025-06-18"
+
+_WRITE_LOCK = threading.Lock()
+
+
+def _send(message: Dict) -> None:
+    line = json.dumps(message, separators=(",", ":")) + "\n"
+    with _WRITE_LOCK:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def _call_tool(params: Dict, latency: float) -> Dict:
+    name = params.get("name")
+    fn, _, _ = mcp_server.TOOLS[name]
+    if latency:
+        time.sleep(latency)
+    try:
+        data = fn(**(params.get("arguments") or {}))
+    except Exception as exc:  # tool errors are results, not protocol errors
+        return {"content": [{"type": "text", "text": str(exc)}], "isError": True}
+    return {"content": [{"type": "text", "text": json.dumps(data)}], "structuredContent": data, "isError": False}
+
+
+def handle(message: Dict, latency: float = 0.0) -> Optional[Dict]:
+    """Response for one JSON-RPC message (None for notifications)."""
+    if "id" not in message:
+        return None  # notifications/initialized, notifications/cancelled
+    method, params = message.get("method"), message.get("params") or {}
+    reply = {"jsonrpc": "2.0", "id": message["id"]}
+    if method == "initialize":
+        reply["result"] = {
+            "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": "firstaid-tools", "version": "1.0"},
+        }
+    elif method == "ping":
+        reply["result"] = {}
+    elif method == "tools/list":
+        reply["result"] = {"tools": [
+            {"name": name, "description": description, "inputSchema": schema}
+            for name, (_, description, schema) in mcp_server.TOOLS.items()
+        ]}
+    elif method == "tools/call":
+        if params.get("name") not in mcp_server.TOOLS:
+            reply["error"] = {"code": -32602, "message": f"Unknown tool: {params.get('name')}"}
+        else:
+            reply["result"] = _call_tool(params, latency)
+    else:
+        reply["error"] = {"code": -32601, "message": f"Method not found: {method}"}
+    return reply
+
+
+def serve(latency: float = 0.0) -> None:
+    def run(message: Dict) -> None:
+        reply = handle(message, latency)
+        if reply is not None:
+            _send(reply)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            message = json.loads(line)
+        except ValueError:
+            _send({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}})
+            continue
+        threading.Thread(target=run, args=(message,), daemon=True).start()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Stand-in MCP tool server on stdio.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every tool call")
+    args = parser.parse_args()
+    try:
+        serve(args.latency_ms / 1000.0)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
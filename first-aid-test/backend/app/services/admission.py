@@ -0,0 +1,247 @@
+# services/admission.py
+# Concurrency governor for the chat endpoints. ``REQUESTS`` caps whole chat
+# pipelines in flight; stage gates cap concurrent outbound calls per stage
+# (LLM classify/generate/fused, embeddings). Work beyond a limit waits in a
+# bounded FIFO queue with a deadline. When the queue is full or the deadline
+# passes the caller is told to shed: the endpoints answer with the rule-based
+# first-aid steps and emergency numbers instead of queueing behind a slow
+# provider, and a shed stage takes its usual fallback.
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional
+
+from . import metrics
+from ..config import (
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_MS,
+    ADMISSION_STAGE_LIMITS, ADMISSION_STAGE_TIMEOUT_MS,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+WAIT_SECONDS = metrics.histogram("admission_wait_seconds", "Time spent queued for an admission slot.", ["gate"],
+                                 buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0))
+
+
+class Overloaded(RuntimeError):
+    """A gate refused work: its queue was full or the wait deadline passed."""
+
+    def __init__(self, gate: str, reason: str):
+        super().__init__(f"{gate} overloaded ({reason})")
+        self.gate = gate
+        self.reason = reason
+
+
+class _Waiter:
+    """A queued caller: a thread waits on an Event, a coroutine on a future of its loop."""
+
+    __slots__ = ("loop", "event", "future", "granted")
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def grant(self) -> None:
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(True)
+
+
+class Gate:
+    """In-flight limit with a bounded FIFO wait queue, usable from threads and coroutines.
+
+    A released slot is handed straight to the oldest waiter, so queued work is
+    admitted in arrival order. ``limit <= 0`` admits everything (still counted).
+    """
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self.in_flight = 0
+        self.peak_queue = 0
+        self.counts = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0}
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _enter(self, loop: Optional[asyncio.AbstractEventLoop]):
+        """Return ``(admitted, None)`` when decided now, or ``(None, waiter)`` to wait."""
+        with self._lock:
+            if self.limit <= 0 or (self.in_flight < self.limit and not self._waiters):
+                self.in_flight += 1
+                self.counts["admitted"] += 1
+                return True, None
+            if len(self._waiters) >= self.queue_size:
+                self.counts["shed_queue_full"] += 1
+                return False, None
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            self.counts["queued"] += 1
+            self.peak_queue = max(self.peak_queue, len(self._waiters))
+            return None, waiter
+
+    def _abandon(self, waiter: _Waiter, shed: bool = True) -> bool:
+        """Stop waiting; True if the slot was granted in the meantime (the caller then owns it)."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            if shed:
+                self.counts["shed_deadline"] += 1
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Blocking acquire for worker threads; False means shed."""
+        admitted, waiter = self._enter(None)
+        if waiter is None:
+            return admitted
+        start = time.perf_counter()
+        ok = waiter.event.wait(self.timeout if timeout is None else timeout) or self._abandon(waiter)
+        WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        return ok
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """Event-loop acquire; False means shed."""
+        admitted, waiter = self._enter(asyncio.get_running_loop())
+        if waiter is None:
+            return admitted
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout if timeout is None else timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            ok = self._abandon(waiter)
+        except asyncio.CancelledError:
+            if self._abandon(waiter, shed=False):
+                self.release()  # granted just as the client went away
+            raise
+        WAIT_SECONDS.observe(time.perf_counter() - start, self.name)
+        return ok
+
+    def release(self) -> None:
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().grant()  # the slot passes on; in_flight is unchanged
+                self.counts["admitted"] += 1
+            else:
+                self.in_flight -= 1
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Hold a slot for the block; raises ``Overloaded`` when shed."""
+        if not self.acquire(timeout):
+            raise Overloaded(self.name, "queue full or wait deadline passed")
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self.counts)
+            data.update(in_flight=self.in_flight, queue_depth=len(self._waiters), peak_queue_depth=self.peak_queue,
+                        limit=self.limit)
+        data["shed"] = data["shed_queue_full"] + data["shed_deadline"]
+        return data
+
+
+def _parse_limits(spec: str) -> Dict[str, int]:
+    limits = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if not name.strip():
+            continue
+        try:
+            limits[name.strip()] = int(value)
+        except ValueError:
+            LOGGER.warning("Ignoring malformed ADMISSION_STAGE_LIMITS entry %r", item)
+    return limits
+
+
+REQUESTS = Gate("requests", ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE_SIZE, ADMISSION_QUEUE_TIMEOUT_MS / 1000.0)
+STAGES: Dict[str, Gate] = {
+    name: Gate(name, limit, ADMISSION_QUEUE_SIZE, ADMISSION_STAGE_TIMEOUT_MS / 1000.0)
+    for name, limit in _parse_limits(ADMISSION_STAGE_LIMITS).items() if limit > 0
+}
+
+
+@contextmanager
+def stage_slot(stage: str):
+    """Hold a slot of ``stage``'s gate (no-op for unlimited stages); raises ``Overloaded`` when shed."""
+    gate = STAGES.get(stage)
+    if gate is None:
+        yield
+        return
+    with gate.slot():
+        yield
+
+
+def worker_threads() -> int:
+    """Threads the default executor needs so admitted pipelines never queue invisibly behind it.
+
+    Each admitted request keeps up to three blocking stages in worker threads at once
+    (classify or fused, generate, tools); the rest covers batches and health probes.
+    """
+    if REQUESTS.limit <= 0:
+        return 64
+    return max(32, REQUESTS.limit * 3 + 16)
+
+
+class WorkerPool:
+    """Threads for blocking sub-tasks of admitted work, capped at ``worker_threads()``.
+
+    The executor is created on first use and dropped by ``shutdown_pools`` when the app
+    stops (a later use starts a new one), so no module keeps an executor of its own.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        _POOLS.append(self)
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=worker_threads(), thread_name_prefix=self.name)
+            return self._pool.submit(fn, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_POOLS: List[WorkerPool] = []
+
+
+def shutdown_pools() -> None:
+    """Stop every ``WorkerPool`` (application shutdown)."""
+    for pool in _POOLS:
+        pool.shutdown()
+
+
+def snapshot() -> Dict[str, Dict]:
+    return {gate.name: gate.stats() for gate in [REQUESTS, *STAGES.values()]}
+
+
+def stats() -> Dict:
+    return {f"{name}_{key}": value for name, data in snapshot().items() for key, value in data.items()}
+
+
+metrics.register_collector("admission", stats)
@@ -0,0 +1,123 @@
+# services/cache.py
+# Small thread-safe LRU cache with TTL eviction and hit/miss counters.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded in-process LRU. Entries expire ``ttl`` seconds after insertion (0 = never).
+
+    ``on_evict(key)`` runs, outside the cache lock, for every entry dropped by the size
+    bound or found expired; explicit ``pop``/``clear`` do not call it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 on_evict: Optional[Callable[[Hashable], None]] = None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = max(0.0, float(ttl))
+        self._clock = clock
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires = item
+            if not expires or expires > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+            self.misses += 1
+        if self._on_evict is not None:
+            self._on_evict(key)
+        return default
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``; ``ttl`` overrides the cache-wide TTL for this entry."""
+        if self.max_entries == 0:
+            return
+        ttl = self.ttl if ttl is None else max(0.0, float(ttl))
+        expires = self._clock() + ttl if ttl else 0.0
+        evicted = []
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                evicted.append(self._data.popitem(last=False)[0])
+                self.evictions += 1
+        if self._on_evict is not None:
+            for old in evicted:
+                self._on_evict(old)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        """Snapshot of live ``(key, value)`` pairs, least recently used first."""
+        now = self._clock()
+        with self._lock:
+            return [(k, v) for k, (v, exp) in self._data.items() if not exp or exp > now]
+
+    def dump(self) -> List[Tuple[Hashable, Any, float]]:
+        """Live entries, least recently used first, as ``(key, value, expires_at)``.
+
+        ``expires_at`` is wall-clock seconds (0 = never) so a snapshot outlives the process.
+        """
+        now, wall = self._clock(), time.time()
+        with self._lock:
+            return [(k, v, wall + (exp - now) if exp else 0.0)
+                    for k, (v, exp) in self._data.items() if not exp or exp > now]
+
+    def load(self, entries: Iterable[Tuple[Hashable, Any, float]]) -> int:
+        """Re-insert ``dump()`` output, keeping each entry's expiry; expired ones are skipped."""
+        wall = time.time()
+        loaded = 0
+        for key, value, expires_at in entries:
+            if expires_at and expires_at <= wall:
+                continue
+            self.put(key, value, ttl=expires_at - wall if expires_at else 0.0)
+            loaded += 1
+        return loaded
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write ``data`` to ``path`` via a temp file + rename so readers never see a torn file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
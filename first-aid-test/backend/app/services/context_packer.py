@@ -0,0 +1,178 @@
+# services/context_packer.py
+# Builds the retrieved-guide context for instruction generation within a token
+# budget. Near-duplicate passages are dropped, the rest are ordered by maximal
+# marginal relevance (search score traded against overlap with passages
+# already picked), and the last passage that does not fit is cut at a sentence
+# boundary. Token counts use tiktoken when installed, otherwise a BPE-like
+# estimate that stays within a few percent on English prose.
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from ..config import CONTEXT_TOKEN_BUDGET, CONTEXT_DEDUP_THRESHOLD, CONTEXT_MMR_LAMBDA
+
+LOGGER = logging.getLogger(__name__)
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+SEPARATOR = "\n\n"
+
+
+def _load_encoder() -> Optional[Callable[[str], int]]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    except Exception as exc:  # encoding files unavailable offline
+        LOGGER.info("tiktoken encoding unavailable (%s); using the estimator", exc)
+        return None
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count: short words are one token, long ones ~4 chars per token,
+    digits ~3 per token and each punctuation mark one."""
+    total = 0
+    for piece in _PIECE.findall(text):
+        if piece[0].isalpha():
+            total += 1 if len(piece) <= 6 else math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            total += math.ceil(len(piece) / 3)
+        else:
+            total += 1
+    return total
+
+
+_ENCODER = _load_encoder()
+
+
+def count_tokens(text: str) -> int:
+    return _ENCODER(text) if _ENCODER else estimate_tokens(text)
+
+
+def _shingles(text: str, n: int = 3) -> FrozenSet[str]:
+    words = _WORD.findall(text.lower())
+    if len(words) < n:
+        return frozenset([" ".join(words)]) if words else frozenset()
+    return frozenset(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+
+def _overlap(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard overlap, or containment when one passage sits inside the other."""
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return max(inter / len(a | b), inter / min(len(a), len(b)))
+
+
+@dataclass
+class Passage:
+    doc_id: Optional[str]
+    text: str
+    score: float
+    shingles: FrozenSet[str] = field(default_factory=frozenset)
+    tokens: int = 0
+    trimmed: bool = False
+
+
+@dataclass
+class PackedContext:
+    text: str
+    tokens: int
+    budget: int
+    passages: List[Passage]
+    duplicates: int = 0
+
+    @property
+    def sources(self) -> List[Optional[str]]:
+        return [p.doc_id for p in self.passages]
+
+    def stats(self) -> Dict:
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "passages": len(self.passages),
+            "trimmed": sum(1 for p in self.passages if p.trimmed),
+            "duplicates_dropped": self.duplicates,
+        }
+
+
+def _passages(docs: List[Dict]) -> List[Passage]:
+    out = []
+    for rank, d in enumerate(docs):
+        doc = d.get("document", {}) if isinstance(d.get("document"), dict) else {}
+        text = (doc.get("text") or d.get("text") or "").strip()
+        if not text:
+            continue
+        score = d.get("$similarity")
+        # Without a search score keep the store's order.
+        score = float(score) if isinstance(score, (int, float)) else 1.0 - rank * 0.01
+        out.append(Passage(doc.get("_id") or d.get("_id"), text, score, _shingles(text)))
+    return out
+
+
+def _dedupe(passages: List[Passage], threshold: float) -> List[Passage]:
+    kept: List[Passage] = []
+    for p in sorted(passages, key=lambda p: -p.score):
+        if any(_overlap(p.shingles, k.shingles) >= threshold for k in kept):
+            continue
+        kept.append(p)
+    return kept
+
+
+def _mmr(passages: List[Passage], lam: float) -> List[Passage]:
+    """Order by maximal marginal relevance: lam * score - (1 - lam) * max overlap with picks."""
+    remaining = list(passages)
+    ordered: List[Passage] = []
+    while remaining:
+        best = max(remaining, key=lambda p: lam * p.score - (1 - lam) * max(
+            (_overlap(p.shingles, q.shingles) for q in ordered), default=0.0))
+        ordered.append(best)
+        remaining.remove(best)
+    return ordered
+
+
+def _trim(text: str, budget: int) -> str:
+    """Longest run of leading sentences that fits ``budget`` tokens ("" if none does)."""
+    kept, used = [], 0
+    for sentence in _SENTENCE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        cost = count_tokens(sentence) + (1 if kept else 0)
+        if used + cost > budget:
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept)
+
+
+def pack(docs: List[Dict], budget: int = CONTEXT_TOKEN_BUDGET,
+         dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD, mmr_lambda: float = CONTEXT_MMR_LAMBDA) -> PackedContext:
+    """Assemble search results (``{"_id", "document": {"text"}, "$similarity"}``) into a context block."""
+    candidates = _passages(docs)
+    unique = _dedupe(candidates, dedup_threshold)
+    sep_tokens = count_tokens(SEPARATOR)
+    chosen: List[Passage] = []
+    used = 0
+    for p in _mmr(unique, mmr_lambda):
+        remaining = budget - used - (sep_tokens if chosen else 0)
+        if remaining <= 0:
+            break
+        tokens = count_tokens(p.text)
+        if tokens > remaining:
+            text = _trim(p.text, remaining)
+            if not text:
+                continue  # not even one sentence fits; a shorter passage further down might
+            p = Passage(p.doc_id, text, p.score, p.shingles, count_tokens(text), trimmed=True)
+        else:
+            p.tokens = tokens
+        chosen.append(p)
+        used += p.tokens + (sep_tokens if len(chosen) > 1 else 0)
+    text = SEPARATOR.join(p.text for p in chosen)
+    return PackedContext(text, used, budget, chosen, duplicates=len(candidates) - len(unique))
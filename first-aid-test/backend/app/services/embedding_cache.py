@@ -0,0 +1,160 @@
+# services/embedding_cache.py
+# Embedding cache keyed by normalized text + embedding model.
+# Tier 1 is an in-process LRU with TTL holding compact ``Embedding`` buffers
+# (optionally quantized, EMBED_CACHE_QUANTIZATION); tier 2 is an optional SQLite
+# file so embeddings survive restarts. Vectors are stored on disk as packed float32
+# and read back as zero-copy views of the BLOB. The memory tier can also be
+# snapshotted to an .npz at shutdown and restored at startup (see warmup.py).
+import hashlib
+import io
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from . import metrics
+from .cache import LRUCache, write_atomic
+from .vectors import QUANTIZATIONS, Embedding
+from ..config import (
+    EMBEDDING_MODEL, EMBED_CACHE_MAX_ENTRIES, EMBED_CACHE_TTL_SECONDS, EMBED_CACHE_PATH, EMBED_CACHE_QUANTIZATION,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "embeddings.npz"
+
+_WS = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    return _WS.sub(" ", text or "").strip().lower()
+
+
+def cache_key(text: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\x00{normalize(text)}".encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, created REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Embedding]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created FROM embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created = row
+        if self.ttl and created + self.ttl <= time.time():
+            return None
+        return Embedding.from_bytes(blob)
+
+    def put(self, key: str, model: str, vector: Embedding) -> None:
+        blob = vector.to_bytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, created) VALUES (?, ?, ?, ?)",
+                (key, model, blob, time.time()),
+            )
+            self._conn.commit()
+
+
+class EmbeddingCache:
+    def __init__(self, max_entries: int, ttl: float, path: str = "", quantization: str = "none"):
+        self.memory = LRUCache(max_entries=max_entries, ttl=ttl)
+        if quantization not in QUANTIZATIONS:
+            LOGGER.warning("Unknown EMBED_CACHE_QUANTIZATION %r; keeping float32", quantization)
+            quantization = "none"
+        self.quantization = quantization
+        self.disk: Optional[_DiskTier] = None
+        self.disk_hits = 0
+        if path:
+            try:
+                self.disk = _DiskTier(path, ttl)
+            except sqlite3.Error as exc:
+                LOGGER.warning("Embedding disk cache unavailable at %s: %s", path, exc)
+
+    def get(self, text: str, model: str = EMBEDDING_MODEL) -> Optional[Embedding]:
+        key = cache_key(text, model)
+        vec = self.memory.get(key)
+        if vec is not None:
+            return vec
+        if self.disk is not None:
+            try:
+                vec = self.disk.get(key)
+            except sqlite3.Error as exc:
+                LOGGER.warning("Embedding disk cache read failed: %s", exc)
+                vec = None
+            if vec is not None:
+                self.disk_hits += 1
+                return self._remember(key, vec)
+        return None
+
+    def _remember(self, key: str, vector: Embedding) -> Embedding:
+        compact = vector.quantize(self.quantization)
+        self.memory.put(key, compact)
+        return compact
+
+    def put(self, text: str, vector: Embedding, model: str = EMBEDDING_MODEL) -> None:
+        if not vector:
+            return
+        vector = Embedding.from_response(vector)
+        key = cache_key(text, model)
+        self._remember(key, vector)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, model, vector)
+            except sqlite3.Error as exc:
+                LOGGER.warning("Embedding disk cache write failed: %s", exc)
+
+    def save_snapshot(self, directory: str) -> int:
+        """Write the memory tier to ``directory``/embeddings.npz; returns the number of vectors."""
+        entries = [(k, v, exp) for k, v, exp in self.memory.dump() if v]
+        if entries:
+            dims = len(entries[-1][1])
+            entries = [e for e in entries if len(e[1]) == dims]
+        if not entries:
+            return 0
+        buf = io.BytesIO()
+        np.savez(buf, keys=np.array([k for k, _, _ in entries]),
+                 vectors=np.stack([v.array() for _, v, _ in entries]),
+                 expires=np.array([exp for _, _, exp in entries], dtype=np.float64))
+        write_atomic(os.path.join(directory, SNAPSHOT_FILE), buf.getvalue())
+        return len(entries)
+
+    def load_snapshot(self, directory: str) -> int:
+        """Restore vectors saved by ``save_snapshot``; expired ones are skipped."""
+        path = os.path.join(directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as data:
+            keys, vectors, expires = data["keys"], data["vectors"].astype(np.float32, copy=False), data["expires"]
+        vectors.flags.writeable = False
+        return self.memory.load(
+            (str(key), Embedding(vectors[i]).quantize(self.quantization), float(expires[i]))
+            for i, key in enumerate(keys))
+
+    def stats(self) -> dict:
+        data = self.memory.stats()
+        data["disk_enabled"] = self.disk is not None
+        data["disk_hits"] = self.disk_hits
+        data["quantization"] = self.quantization
+        data["memory_vector_bytes"] = sum(v.nbytes for _, v in self.memory.items())
+        return data
+
+
+CACHE = EmbeddingCache(EMBED_CACHE_MAX_ENTRIES, EMBED_CACHE_TTL_SECONDS, EMBED_CACHE_PATH, EMBED_CACHE_QUANTIZATION)
+metrics.register_collector("embedding_cache", CACHE.stats)
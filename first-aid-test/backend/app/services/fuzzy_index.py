@@ -0,0 +1,107 @@
+# services/fuzzy_index.py
+# Symmetric-delete spelling index (SymSpell-style) for near-miss medical terms.
+# Every vocabulary term is expanded once into its variants with up to
+# ``max_distance`` characters deleted; a lookup generates the same deletes for the
+# query token and only verifies the handful of terms that share one, instead of
+# comparing the token against the whole vocabulary.
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    out = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        nxt = set()
+        for w in frontier:
+            if len(w) <= 1:
+                continue
+            for i in range(len(w)):
+                nxt.add(w[:i] + w[i + 1:])
+        nxt -= out
+        out |= nxt
+        frontier = nxt
+    return out
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal-string-alignment distance (adjacent swaps count once); ``limit + 1`` if above ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = cur[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else limit + 1
+
+
+class SpellIndex:
+    def __init__(self, terms: Iterable[str] = (), max_distance: int = 2):
+        self.max_distance = max_distance
+        self.terms: Dict[str, int] = {}  # term -> insertion rank (earlier terms win ties)
+        self._deletes: Dict[str, List[str]] = defaultdict(list)
+        for term in terms:
+            self.add(term)
+
+    def add(self, term: str) -> None:
+        term = term.strip().lower()
+        if not term or term in self.terms:
+            return
+        self.terms[term] = len(self.terms)
+        for variant in _deletes(term, self.max_distance):
+            self._deletes[variant].append(term)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.terms
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def lookup(self, token: str, max_distance: Optional[int] = None, limit: int = 3) -> List[Tuple[str, int]]:
+        """Return up to ``limit`` ``(term, distance)`` pairs ranked by distance, then vocabulary order."""
+        token = token.lower()
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates: Set[str] = set()
+        for variant in _deletes(token, max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+        ranked = []
+        for term in candidates:
+            dist = 0 if term == token else edit_distance(token, term, max_distance)
+            if dist <= max_distance:
+                ranked.append((dist, self.terms[term], term))
+        ranked.sort()
+        return [(term, dist) for dist, _, term in ranked[:limit]]
+
+
+def load_vocabulary(path: str) -> Tuple[List[str], Dict[str, str]]:
+    """Read ``term`` or ``term|gloss`` lines (``#`` comments allowed) from ``path``."""
+    terms: List[str] = []
+    glosses: Dict[str, str] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                term, _, gloss = line.partition("|")
+                term = term.strip().lower()
+                if term:
+                    terms.append(term)
+                    if gloss.strip():
+                        glosses[term] = gloss.strip()
+    except OSError as exc:
+        LOGGER.warning("Clarification vocabulary unavailable at %s: %s", path, exc)
+    return terms, glosses
@@ -0,0 +1,224 @@
+# services/health.py
+# Background reachability checks for the upstream dependencies. A single task
+# started from the app lifespan probes every target concurrently each
+# HEALTH_PROBE_INTERVAL_SECONDS and keeps the latest result per target (status,
+# timestamps, rolling latency). /api/health/details and /api/health/ready only
+# read that snapshot, so polling them never triggers outbound traffic.
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from . import http_client, vector_db
+from ..config import (
+    GROQ_API_KEY, GROQ_BASE_URL, OPENAI_API_KEY, OPENAI_BASE_URL, MODEL_PREFERENCE, VECTOR_BACKEND,
+    HEALTH_PROBE_INTERVAL_SECONDS, HEALTH_PROBE_TIMEOUT_SECONDS, has_astra,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 20
+
+
+class Target:
+    """One dependency to probe. ``usable`` means it answered and accepted our credentials."""
+
+    def __init__(self, name: str, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                 body: Optional[Dict] = None, configured: bool = True):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.headers = headers or {}
+        self.body = body
+        self.configured = configured
+
+
+class _State:
+    def __init__(self, target: Target):
+        self.target = target
+        self.status = None  # last HTTP status, or None
+        self.error = ""
+        self.reachable = False
+        self.usable = False
+        self.checked_at = 0.0
+        self.last_ok_at = 0.0
+        self.consecutive_failures = 0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record(self, status: Optional[int], error: str, elapsed: float, usable: bool) -> None:
+        self.status = status
+        self.error = error
+        self.reachable = status is not None
+        self.usable = usable
+        self.checked_at = time.time()
+        self.latencies.append(elapsed)
+        if usable:
+            self.last_ok_at = self.checked_at
+            self.consecutive_failures = 0
+        else:
+            self.consecutive_failures += 1
+
+    def snapshot(self) -> Dict:
+        lat = sorted(self.latencies)
+        return {
+            "configured": self.target.configured,
+            "reachable": self.reachable,
+            "usable": self.usable,
+            "status": self.status,
+            "error": self.error or None,
+            "checked_at": self.checked_at or None,
+            "last_ok_at": self.last_ok_at or None,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ms": {
+                "last": round(self.latencies[-1] * 1000, 1) if lat else None,
+                "avg": round(sum(lat) / len(lat) * 1000, 1) if lat else None,
+                "max": round(lat[-1] * 1000, 1) if lat else None,
+            },
+        }
+
+
+def default_targets() -> List[Target]:
+    """Provider model listings (authenticated when a key is set) and the Astra keyspace."""
+    targets = [
+        Target("openai", "GET", f"{OPENAI_BASE_URL}/models",
+               http_client.bearer(OPENAI_API_KEY) if OPENAI_API_KEY else None, configured=bool(OPENAI_API_KEY)),
+        Target("groq", "GET", f"{GROQ_BASE_URL}/models",
+               http_client.bearer(GROQ_API_KEY) if GROQ_API_KEY else None, configured=bool(GROQ_API_KEY)),
+    ]
+    if has_astra():
+        targets.append(Target("astra", "POST", vector_db.BASE, vector_db.HEADERS, {"findCollections": {}}))
+    return targets
+
+
+def required_targets() -> Dict[str, List[str]]:
+    """What a request cannot be served without, each satisfied by any one of its targets.
+
+    Chat goes through the LLM router, so either provider will do (preferred one listed first).
+    """
+    chat = ["groq", "openai"] if MODEL_PREFERENCE == "groq" else ["openai", "groq"]
+    return {"chat": chat}
+
+
+def optional_targets() -> Dict[str, List[str]]:
+    """Dependencies whose loss only degrades answers: without embeddings or the vector store,
+    retrieval falls back to the local BM25 index."""
+    optional = {"embeddings": ["openai"]}
+    if VECTOR_BACKEND == "astra":
+        optional["vector_store"] = ["astra"]
+    return optional
+
+
+class HealthProber:
+    def __init__(self, targets: List[Target], interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self._states = {t.name: _State(t) for t in targets}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+
+    def _probe(self, target: Target):
+        start = time.perf_counter()
+        status, error = None, ""
+        try:
+            kwargs = {"headers": target.headers, "read_timeout": self.timeout}
+            if target.body is not None:
+                kwargs["content"] = json.dumps(target.body)
+            r = http_client.request(target.method, target.url, **kwargs)
+            status = r.status_code
+            usable = target.configured and 200 <= status < 300
+            if usable and target.body is not None:
+                errors = r.json().get("errors")  # the Data API reports failures in a 200 body
+                if errors:
+                    usable, error = False, str(errors[0].get("message", errors[0]))[:200]
+            elif not usable:
+                error = "not configured" if not target.configured else f"HTTP {status}"
+        except Exception as exc:
+            usable, error = False, str(exc)[:200]
+        return status, error, time.perf_counter() - start, usable
+
+    async def probe_once(self) -> None:
+        """Probe every target concurrently and record the results."""
+        states = list(self._states.values())
+        results = await asyncio.gather(*(asyncio.to_thread(self._probe, s.target) for s in states))
+        with self._lock:
+            for state, result in zip(states, results):
+                state.record(*result)
+            self.rounds += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe_once()
+            except Exception as exc:  # keep probing; the snapshot goes stale if this persists
+                LOGGER.warning("Health probe round failed: %s", exc)
+            await asyncio.sleep(self.interval)
+
+    def start(self, once: bool = False) -> None:
+        """Probe in the background every ``interval`` seconds.
+
+        With probing off, ``once`` still runs a single round to open the pooled connections.
+        """
+        if self._task is not None:
+            return
+        if self.interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="health-prober")
+        elif once:
+            self._task = asyncio.get_running_loop().create_task(self.probe_once(), name="health-prober")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {name: state.snapshot() for name, state in self._states.items()}
+
+    def _problems(self, names: List[str], snap: Dict[str, Dict], now: float) -> List[str]:
+        """Why none of ``names`` is usable; empty when one of them is."""
+        problems = []
+        for name in names:
+            dep = snap.get(name)
+            if dep is None:
+                problems.append(f"{name} not configured")
+            elif dep["checked_at"] is None:
+                problems.append(f"{name} not probed yet")
+            elif now - dep["checked_at"] > 3 * self.interval:
+                problems.append(f"{name} probe is stale")
+            elif not dep["usable"]:
+                problems.append(f"{name} {dep['error'] or 'unusable'}")
+            else:
+                return []
+        return problems
+
+    def readiness(self) -> Dict:
+        """Ready when a chat provider was usable in a recent probe round.
+
+        Unusable embeddings or vector store are listed under ``degraded`` but do not block.
+        """
+        now = time.time()
+        snap = self.snapshot()
+        if self.interval <= 0:
+            return {"ready": True, "probing": False, "reasons": [], "degraded": [], "dependencies": snap}
+        reasons, degraded = [], []
+        for need, names in required_targets().items():
+            problems = self._problems(names, snap, now)
+            if problems:
+                reasons.append(f"{need}: " + "; ".join(problems))
+        for need, names in optional_targets().items():
+            problems = self._problems(names, snap, now)
+            if problems:
+                degraded.append(f"{need}: " + "; ".join(problems))
+        return {"ready": not reasons, "probing": True, "reasons": reasons, "degraded": degraded,
+                "dependencies": snap}
+
+
+PROBER = HealthProber(default_targets(), HEALTH_PROBE_INTERVAL_SECONDS, HEALTH_PROBE_TIMEOUT_SECONDS)
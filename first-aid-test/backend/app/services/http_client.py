@@ -0,0 +1,148 @@
+# services/http_client.py
+# Process-wide pooled HTTP client shared by every agent and service.
+# One keep-alive pool per origin (scheme + host + port) so connection limits apply
+# per host, TLS handshakes are reused across requests, and HTTP/2 is negotiated
+# when the optional ``h2`` package is installed.
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import metrics
+from ..config import (
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_KEEPALIVE_PER_HOST, HTTP_KEEPALIVE_EXPIRY, HTTP2_ENABLED,
+    OPENAI_BASE_URL, GROQ_BASE_URL, ASTRA_DB_API_ENDPOINT,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+_CLIENTS: Dict[str, httpx.Client] = {}
+_LOCK = threading.Lock()
+
+
+def _http2_available() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+HTTP2 = _http2_available()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}".lower()
+
+
+# Metric label for each configured upstream; other hosts are labeled by host name.
+# Matched by URL prefix (longest first) so providers behind one proxy host stay distinguishable.
+_PROVIDERS = sorted(
+    ((base.rstrip("/").lower(), name)
+     for name, base in (("openai", OPENAI_BASE_URL), ("groq", GROQ_BASE_URL), ("astra", ASTRA_DB_API_ENDPOINT))
+     if base),
+    key=lambda item: len(item[0]), reverse=True,
+)
+
+
+def _labels(url: str):
+    host = urlsplit(url).netloc.lower()
+    lowered = url.lower()
+    for prefix, name in _PROVIDERS:
+        if lowered.startswith(prefix):
+            return name, host
+    return host, host
+
+
+def make_timeout(read: Optional[float] = None, connect: Optional[float] = None) -> httpx.Timeout:
+    """Build a timeout with separate connect and read budgets."""
+    read = HTTP_READ_TIMEOUT if read is None else read
+    connect = HTTP_CONNECT_TIMEOUT if connect is None else connect
+    return httpx.Timeout(read, connect=min(connect, read))
+
+
+def get_client(url: str) -> httpx.Client:
+    """Return the pooled client for the origin of ``url``, creating it on first use."""
+    origin = _origin(url)
+    client = _CLIENTS.get(origin)
+    if client is not None:
+        return client
+    with _LOCK:
+        client = _CLIENTS.get(origin)
+        if client is None:
+            client = httpx.Client(
+                http2=HTTP2,
+                timeout=make_timeout(),
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE_PER_HOST,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            _CLIENTS[origin] = client
+    return client
+
+
+def request(method: str, url: str, *, read_timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+    """Send a request through the shared pool for the target host."""
+    provider, host = _labels(url)
+    start = time.perf_counter()
+    status = "error"
+    try:
+        resp = get_client(url).request(method, url, timeout=make_timeout(read_timeout), **kwargs)
+        status = str(resp.status_code)
+        return resp
+    finally:
+        metrics.observe_http(provider, host, method, status, time.perf_counter() - start)
+
+
+@contextmanager
+def stream(method: str, url: str, *, read_timeout: Optional[float] = None, **kwargs):
+    """Context manager for a streamed response (e.g. server-sent events).
+
+    The recorded latency is time to response headers, i.e. until streaming starts.
+    """
+    provider, host = _labels(url)
+    start = time.perf_counter()
+    started = False
+    try:
+        with get_client(url).stream(method, url, timeout=make_timeout(read_timeout), **kwargs) as resp:
+            started = True
+            metrics.observe_http(provider, host, method, str(resp.status_code), time.perf_counter() - start)
+            yield resp
+    except httpx.HTTPError:
+        if not started:
+            metrics.observe_http(provider, host, method, "error", time.perf_counter() - start)
+        raise
+
+
+def get(url: str, **kwargs) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+def bearer(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def close_all() -> None:
+    """Close every pooled client (used on application shutdown)."""
+    with _LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as exc:
+            LOGGER.debug("Error closing HTTP client: %s", exc)
@@ -0,0 +1,38 @@
+# services/json_codec.py
+# JSON encoding for API responses, NDJSON batch records and SSE events.
+# Uses orjson when it is installed (several times faster than the stdlib
+# encoder on the nested pipeline result) and falls back to compact stdlib
+# json otherwise. Output matches Starlette's JSONResponse either way:
+# UTF-8, no ASCII escaping, no whitespace. numpy scalars/arrays and objects
+# with ``tolist()`` (embeddings) are encoded as numbers and lists.
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder is used instead
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    def dumps_str(obj: Any) -> str:
+        return orjson.dumps(obj, default=_default, option=_OPTIONS).decode("utf-8")
+else:
+    def dumps(obj: Any) -> bytes:
+        return dumps_str(obj).encode("utf-8")
+
+    def dumps_str(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default)
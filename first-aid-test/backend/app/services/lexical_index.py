@@ -0,0 +1,261 @@
+# services/lexical_index.py
+# Local BM25 inverted index over the knowledge base. It is built by ingestion
+# alongside the vector store and persisted as one compressed .npz of
+# CSR-style posting arrays (term offsets, document rows, term frequencies)
+# plus a JSON file with the vocabulary and document texts. Retrieval fuses
+# its ranking with vector search by reciprocal rank, and uses it alone when
+# embeddings are unavailable. Exact medical terms ("anaphylaxis",
+# "epinephrine") are matched here even when an embedding blurs them.
+import json
+import logging
+import math
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import LEXICAL_INDEX_ENABLED, LEXICAL_INDEX_PATH
+
+LOGGER = logging.getLogger(__name__)
+
+POSTINGS_FILE = "postings.npz"
+META_FILE = "lexical.json"
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does for from had has have he her him his how i if in into is it "
+    "its me my no not of on or our she so than that the their them then there they this to too was we were "
+    "what when where which while who will with would you your".split()
+)
+
+
+def _stem(word: str) -> str:
+    """Light suffix stripping so "burns"/"burned"/"burning" and "bruise"/"bruises" meet."""
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        word = word[:-3]
+    elif len(word) > 4 and word.endswith("ed"):
+        word = word[:-2]
+    if len(word) > 4 and word.endswith("e"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN.findall(text.lower().replace("'", "")) if t not in STOPWORDS]
+
+
+class LexicalIndex:
+    """BM25 (Okapi) over ``{_id, text, meta}`` documents; re-adding an id replaces it."""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.2, b: float = 0.75):
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []  # row -> id (None marks a replaced/removed row)
+        self._rows: Dict[str, int] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._lengths: List[int] = []
+        self._total_length = 0
+        # Postings are kept as numpy arrays per term for search; a term is copied into a
+        # dict only when documents are added to it.
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._dicts: Dict[str, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # -- building ----------------------------------------------------------
+    def _postings(self, term: str) -> Dict[int, int]:
+        postings = self._dicts.get(term)
+        if postings is None:
+            rows, tfs = self._arrays.pop(term, (np.empty(0, np.int32), np.empty(0, np.float32)))
+            postings = self._dicts[term] = dict(zip(rows.tolist(), (int(t) for t in tfs.tolist())))
+        return postings
+
+    def _remove_row(self, row: int) -> None:
+        doc_id = self._ids[row]
+        text = self._docs.get(doc_id, {}).get("text", "")
+        for term in set(tokenize(text)):
+            self._postings(term).pop(row, None)
+        self._total_length -= self._lengths[row]
+        self._lengths[row] = 0
+        self._ids[row] = None
+
+    def add(self, docs: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            for d in docs:
+                text = (d.get("text") or "").strip()
+                if not text:
+                    continue
+                doc_id = str(d.get("_id"))
+                old = self._rows.pop(doc_id, None)
+                if old is not None:
+                    self._remove_row(old)
+                tokens = tokenize(text)
+                row = len(self._ids)
+                self._ids.append(doc_id)
+                self._rows[doc_id] = row
+                self._lengths.append(len(tokens))
+                self._total_length += len(tokens)
+                self._docs[doc_id] = {"_id": doc_id, "text": text, **({"meta": d["meta"]} if d.get("meta") else {})}
+                counts: Dict[str, int] = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for term, tf in counts.items():
+                    self._postings(term)[row] = tf
+                added += 1
+        return added
+
+    def remove(self, ids: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(str(doc_id), None)
+                if row is not None:
+                    self._remove_row(row)
+                    self._docs.pop(str(doc_id), None)
+                    removed += 1
+        return removed
+
+    # -- persistence -------------------------------------------------------
+    def save(self) -> None:
+        """Write the index with live rows renumbered densely (replaced rows are dropped)."""
+        if self.path is None:
+            return
+        with self._lock:
+            live = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            remap = np.full(len(self._ids), -1, dtype=np.int64)
+            remap[live] = np.arange(len(live))
+            vocab, offsets, rows, tfs = [], [0], [], []
+            for term in sorted(set(self._arrays) | set(self._dicts)):
+                term_rows, term_tfs = self._frozen(term)
+                keep = remap[term_rows] >= 0 if len(term_rows) else np.empty(0, dtype=bool)
+                if not keep.any():
+                    continue
+                vocab.append(term)
+                rows.append(remap[term_rows[keep]].astype(np.int32))
+                tfs.append(term_tfs[keep].astype(np.uint16))
+                offsets.append(offsets[-1] + int(keep.sum()))
+            ids = [self._ids[row] for row in live]
+            meta = {"version": 1, "vocab": vocab, "ids": ids, "docs": [self._docs[i] for i in ids]}
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp = self.path / (POSTINGS_FILE + ".tmp.npz")
+            np.savez_compressed(
+                tmp,
+                offsets=np.asarray(offsets, dtype=np.int64),
+                rows=np.concatenate(rows) if rows else np.empty(0, np.int32),
+                tfs=np.concatenate(tfs) if tfs else np.empty(0, np.uint16),
+                lengths=np.asarray([self._lengths[row] for row in live], dtype=np.int32),
+            )
+            meta_tmp = self.path / (META_FILE + ".tmp")
+            with meta_tmp.open("w", encoding="utf-8") as handle:
+                json.dump(meta, handle, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, self.path / POSTINGS_FILE)
+            os.replace(meta_tmp, self.path / META_FILE)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        """Open the index at ``path`` (empty if missing or unreadable)."""
+        index = cls(path)
+        meta_path, postings_path = index.path / META_FILE, index.path / POSTINGS_FILE
+        if not meta_path.exists() or not postings_path.exists():
+            return index
+        try:
+            with meta_path.open("r", encoding="utf-8") as handle:
+                meta = json.load(handle)
+            with np.load(postings_path) as data:
+                offsets, rows, tfs, lengths = data["offsets"], data["rows"], data["tfs"], data["lengths"]
+        except (OSError, ValueError, KeyError) as exc:
+            LOGGER.warning("Lexical index at %s unreadable: %s", path, exc)
+            return index
+        index._ids = list(meta["ids"])
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        index._docs = {doc["_id"]: doc for doc in meta["docs"]}
+        index._lengths = lengths.tolist()
+        index._total_length = int(lengths.sum())
+        tf_values = tfs.astype(np.float32)
+        for i, term in enumerate(meta["vocab"]):
+            index._arrays[term] = (rows[offsets[i]:offsets[i + 1]], tf_values[offsets[i]:offsets[i + 1]])
+        return index
+
+    # -- search ------------------------------------------------------------
+    def _frozen(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        postings = self._dicts.get(term)
+        if postings is None:
+            return self._arrays.get(term, (np.empty(0, np.int32), np.empty(0, np.float32)))
+        return (np.fromiter(postings.keys(), dtype=np.int32, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float32, count=len(postings)))
+
+    def search(self, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
+        """Best ``top_k`` documents as ``{"_id", "document", "$bm25"}``, highest score first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._rows)
+            if not n or not terms:
+                return []
+            lengths = np.asarray(self._lengths, dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / n or 1.0))
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in terms:
+                rows, tfs = self._frozen(term)
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+            hits = np.flatnonzero(scores > 0)
+            if not len(hits):
+                return []
+            k = min(top_k, len(hits))
+            top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [{"_id": self._ids[row], "document": self._docs[self._ids[row]], "$bm25": float(scores[row])}
+                    for row in top.tolist()]
+
+
+def fuse_rankings(rankings: List[List[Dict[str, Any]]], top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: each document scores sum(1 / (k + rank)) over the lists it is in.
+
+    ``$similarity`` on the result is that score scaled to 0..1 (1 = first in every list),
+    so the context packer can weigh it like a cosine score; per-list scores are kept.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, 1):
+            doc_id = str(hit.get("_id") or hit.get("document", {}).get("_id"))
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            merged = fused.setdefault(doc_id, {"_id": doc_id, "document": hit.get("document", {})})
+            if "$similarity" in hit:
+                merged["$vector_similarity"] = hit["$similarity"]
+            if "$bm25" in hit:
+                merged["$bm25"] = hit["$bm25"]
+    best = len([r for r in rankings if r]) / (k + 1.0)
+    ordered = sorted(fused, key=lambda doc_id: -scores[doc_id])[:top_k]
+    return [dict(fused[doc_id], **{"$rrf": scores[doc_id], "$similarity": scores[doc_id] / best}) for doc_id in ordered]
+
+
+_INDEX: Optional[LexicalIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index() -> Optional[LexicalIndex]:
+    """The knowledge-base index, loaded once from LEXICAL_INDEX_PATH (None when disabled)."""
+    global _INDEX
+    if not LEXICAL_INDEX_ENABLED:
+        return None
+    if _INDEX is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = LexicalIndex.load(LEXICAL_INDEX_PATH)
+                if len(_INDEX):
+                    LOGGER.info("Loaded lexical index: %d documents", len(_INDEX))
+    return _INDEX
@@ -0,0 +1,325 @@
+# services/llm_router.py
+# Shared router for chat-completion calls. Each provider (Groq, OpenAI) keeps a
+# rolling window of latencies and outcomes and a circuit breaker: after
+# LLM_BREAKER_FAILURES consecutive failures (timeouts, connection errors, 429 and
+# 5xx; other 4xx responses are the request's fault and do not count) it is skipped for
+# LLM_BREAKER_COOLDOWN_SECONDS, then a single trial request decides whether it
+# comes back. Calls go to the healthiest provider first and fail over to the
+# next one. With LLM_HEDGE_ENABLED a second provider is also asked once the
+# first has been slower than its own p95, and the first good answer wins.
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeout, wait
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Optional
+
+import httpx
+
+from . import admission, http_client, metrics
+from ..config import (
+    GROQ_API_KEY, GROQ_BASE_URL, OPENAI_API_KEY, OPENAI_BASE_URL, MODEL_PREFERENCE, stage_model,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SECONDS, LLM_HEDGE_ENABLED, LLM_HEDGE_MIN_DELAY_MS,
+    LLM_HEDGE_DEFAULT_DELAY_MS,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+WINDOW = 50
+MIN_SAMPLES = 10  # below this the observed p95 is not trusted for hedging
+EWMA_ALPHA = 0.3  # weight of the newest latency in the routing score
+EXPLORE_EVERY = 20  # every Nth call tries the runner-up first so its stats stay current
+
+
+class RouterError(RuntimeError):
+    """Every provider failed or was unavailable for this call."""
+
+
+def is_provider_failure(exc: BaseException) -> bool:
+    """Whether ``exc`` says the provider is unhealthy: a timeout, a connection error, 429 or 5xx.
+
+    Other 4xx responses (e.g. an unsupported ``response_format``) are about the request and
+    would fail the same way every time, so they must not open the circuit.
+    """
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+@dataclass
+class Route:
+    provider: str
+    url: str
+    headers: Dict[str, str]
+    model: str
+
+
+@dataclass
+class Completion:
+    content: str
+    provider: str
+    model: str
+    seconds: float
+    hedged: bool = False
+
+
+class _Provider:
+    def __init__(self, name: str, base_url: str, api_key: str):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.latencies: Deque[float] = deque(maxlen=WINDOW)
+        self.outcomes: Deque[bool] = deque(maxlen=WINDOW)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def route(self, stage: str) -> Route:
+        return Route(self.name, f"{self.base_url}/chat/completions", http_client.bearer(self.api_key),
+                     stage_model(self.name, stage))
+
+    # -- circuit breaker -------------------------------------------------
+    def state(self, now: float) -> str:
+        if not self.opened_at:
+            return "closed"
+        return "half_open" if now - self.opened_at >= LLM_BREAKER_COOLDOWN_SECONDS else "open"
+
+    def acquire(self, now: float) -> bool:
+        """Whether a request may go out now (a half-open breaker lets one trial through)."""
+        with self.lock:
+            state = self.state(now)
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """End a call that says nothing about provider health (frees a half-open trial)."""
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.outcomes.append(ok)
+            self.trial_in_flight = False
+            if ok:
+                self.latencies.append(seconds)
+                self.ewma = seconds if self.ewma is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * self.ewma
+                self.consecutive_failures = 0
+                if self.opened_at:
+                    LOGGER.info("LLM provider %s recovered; closing circuit", self.name)
+                self.opened_at = 0.0
+            else:
+                self.consecutive_failures += 1
+                if self.opened_at or self.consecutive_failures >= LLM_BREAKER_FAILURES:
+                    if not self.opened_at:
+                        LOGGER.warning("LLM provider %s failed %d times in a row; opening circuit",
+                                       self.name, self.consecutive_failures)
+                    self.opened_at = time.monotonic()
+
+    # -- rolling stats ---------------------------------------------------
+    def percentile(self, pct: float) -> Optional[float]:
+        with self.lock:
+            lat = sorted(self.latencies)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(len(lat) * pct / 100.0))]
+
+    def error_rate(self) -> float:
+        with self.lock:
+            outcomes = list(self.outcomes)
+        return (outcomes.count(False) / len(outcomes)) if outcomes else 0.0
+
+    def score(self) -> Optional[float]:
+        """Lower is better: recent latency inflated by the recent error rate (None before any answer)."""
+        ewma = self.ewma
+        if ewma is None:
+            return None
+        return ewma * (1 + 4 * self.error_rate())
+
+    def snapshot(self) -> Dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        with self.lock:
+            samples, failures = len(self.outcomes), self.consecutive_failures
+        return {
+            "configured": bool(self.api_key),
+            "circuit": self.state(time.monotonic()),
+            "consecutive_failures": failures,
+            "samples": samples,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class LLMRouter:
+    def __init__(self, providers: List[_Provider], preferred: str, hedge: bool = False):
+        self.providers = {p.name: p for p in providers}
+        self.preferred = preferred
+        self.hedge = hedge
+        self.counts = {"calls": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0, "exhausted": 0, "shed": 0}
+        self._lock = threading.Lock()
+        self._rankings = 0
+        # Hedged calls run both attempts here so the caller can stop waiting on the slow one.
+        self._pool = admission.WorkerPool("llm-hedge")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def ranked(self) -> List[_Provider]:
+        """Configured providers, healthiest first; the preferred one wins ties and cold starts."""
+        configured = [p for p in self.providers.values() if p.api_key]
+        now = time.monotonic()
+
+        def key(p: _Provider):
+            blocked = p.state(now) == "open"
+            score = p.score()
+            if score is None:
+                # No answer yet: an untried preferred provider goes first, anything else goes last.
+                score = 0.0 if p.name == self.preferred and not p.outcomes else float("inf")
+            # Keep the preferred provider ahead unless it is clearly worse (25% margin).
+            bias = 0.8 if p.name == self.preferred else 1.0
+            return (blocked, score * bias, p.name != self.preferred)
+
+        ranked = sorted(configured, key=key)
+        with self._lock:
+            self._rankings += 1
+            explore = self._rankings % EXPLORE_EVERY == 0
+        if explore and len(ranked) > 1 and ranked[1].state(now) != "open":
+            ranked[0], ranked[1] = ranked[1], ranked[0]
+        return ranked
+
+    def routes(self, stage: str) -> Iterator[Route]:
+        """Yield routes to try in order, skipping providers whose circuit is open.
+
+        For callers that manage the request themselves (streaming); report each
+        attempt with ``record``.
+        """
+        for provider in self.ranked():
+            if provider.acquire(time.monotonic()):
+                yield provider.route(stage)
+
+    def record(self, provider: str, seconds: float, ok: bool) -> None:
+        self.providers[provider].record(seconds, ok)
+
+    def record_error(self, provider: str, seconds: float, exc: BaseException) -> None:
+        """Count ``exc`` against ``provider``'s breaker only if it is a provider failure."""
+        if is_provider_failure(exc):
+            self.record(provider, seconds, False)
+        else:
+            self.providers[provider].release()
+
+    def _attempt(self, route: Route, payload: Dict, read_timeout: float) -> Completion:
+        start = time.perf_counter()
+        try:
+            r = http_client.post(route.url, headers=route.headers, json=dict(payload, model=route.model),
+                                 read_timeout=read_timeout)
+            r.raise_for_status()
+            content = r.json()["choices"][0]["message"]["content"]
+        except Exception as exc:
+            self.record_error(route.provider, time.perf_counter() - start, exc)
+            raise RouterError(f"{route.provider}: {exc}") from exc
+        elapsed = time.perf_counter() - start
+        self.record(route.provider, elapsed, True)
+        return Completion(content, route.provider, route.model, elapsed)
+
+    def _hedge_delay(self, provider: str) -> float:
+        p = self.providers[provider]
+        p95 = p.percentile(95) if len(p.latencies) >= MIN_SAMPLES else None
+        delay_ms = p95 * 1000 if p95 is not None else LLM_HEDGE_DEFAULT_DELAY_MS
+        return max(delay_ms, LLM_HEDGE_MIN_DELAY_MS) / 1000.0
+
+    def _hedged(self, first: Route, backups: Iterator[Route], payload: Dict, read_timeout: float) -> Completion:
+        submit = lambda route: self._pool.submit(contextvars.copy_context().run, self._attempt, route, payload, read_timeout)
+        primary = submit(first)
+        try:
+            return primary.result(timeout=self._hedge_delay(first.provider))
+        except FutureTimeout:
+            pass  # slower than usual: ask the next provider too
+        except RouterError:
+            raise
+        second = next(backups, None)
+        if second is None:
+            return primary.result()
+        self._count("hedges")
+        pending = {primary, submit(second)}
+        errors = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    result = fut.result()
+                except RouterError as exc:
+                    errors.append(str(exc))
+                    continue
+                if fut is not primary:
+                    self._count("hedge_wins")
+                result.hedged = True
+                return result  # the slower call finishes in the background and only updates stats
+        raise RouterError("; ".join(errors))
+
+    def complete(self, stage: str, payload: Dict, read_timeout: float = 20) -> Completion:
+        """Send a chat-completions ``payload`` (without ``model``) for ``stage``.
+
+        Tries providers in health order, optionally hedging the first one, and raises
+        ``RouterError`` when none produced an answer.
+        """
+        self._count("calls")
+        try:
+            with admission.stage_slot(stage):
+                return self._complete(stage, payload, read_timeout)
+        except admission.Overloaded as exc:
+            self._count("shed")
+            raise RouterError(str(exc)) from exc
+
+    def _complete(self, stage: str, payload: Dict, read_timeout: float) -> Completion:
+        routes = self.routes(stage)
+        errors = []
+        first = True
+        for route in routes:
+            if not first:
+                self._count("failovers")
+            first = False
+            try:
+                if self.hedge:
+                    return self._hedged(route, routes, payload, read_timeout)
+                return self._attempt(route, payload, read_timeout)
+            except RouterError as exc:
+                errors.append(str(exc))
+                LOGGER.warning("LLM %s call failed on %s", stage, exc)
+        self._count("exhausted")
+        raise RouterError("; ".join(errors) or "no LLM provider available")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self.counts)
+        for name, p in self.providers.items():
+            snap = p.snapshot()
+            data[f"{name}_circuit_open"] = 0 if snap["circuit"] == "closed" else 1
+            data[f"{name}_error_rate"] = snap["error_rate"]
+            data[f"{name}_p95_ms"] = snap["p95_ms"] or 0.0
+        return data
+
+    def snapshot(self) -> Dict:
+        return {"preferred": self.preferred, "hedging": self.hedge,
+                "providers": {name: p.snapshot() for name, p in self.providers.items()}}
+
+
+ROUTER = LLMRouter(
+    [_Provider("groq", GROQ_BASE_URL, GROQ_API_KEY), _Provider("openai", OPENAI_BASE_URL, OPENAI_API_KEY)],
+    preferred=MODEL_PREFERENCE,
+    hedge=LLM_HEDGE_ENABLED,
+)
+metrics.register_collector("llm_router", ROUTER.stats)
+
+
+def complete(stage: str, payload: Dict, read_timeout: float = 20) -> Completion:
+    return ROUTER.complete(stage, payload, read_timeout)
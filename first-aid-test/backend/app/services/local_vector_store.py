@@ -0,0 +1,354 @@
+# services/local_vector_store.py
+# In-process vector index: an alternative to Astra vector-search for small KBs
+# and offline runs. Unit-normalized embeddings live in one contiguous float32
+# matrix backed by a memory-mapped file, so cosine similarity is a single
+# matrix-vector product. Large corpora can switch to an approximate IVF mode
+# (spherical k-means buckets, probing the closest ``nprobe`` of them).
+# Document metadata is a snapshot (meta.json) plus an append-only log
+# (meta.log, one JSON record per write batch), so a batch costs O(batch) instead
+# of rewriting every document. ``flush``/``close`` fold the log into the snapshot.
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .vectors import Embedding
+
+LOGGER = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.json"
+LOG_FILE = "meta.log"
+
+
+def _unit(vec) -> Optional[np.ndarray]:
+    arr = np.asarray(vec, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(arr))
+    if not arr.size or not norm:
+        return None
+    return arr / norm
+
+
+class _IVF:
+    """Coarse quantizer: rows bucketed by nearest centroid."""
+
+    def __init__(self, centroids: np.ndarray, lists: List[List[int]]):
+        self.centroids = centroids
+        self.lists = lists
+        self.bucket_of = {row: c for c, rows in enumerate(lists) for row in rows}
+        self.size = sum(len(rows) for rows in lists)
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, rows: np.ndarray, iterations: int = 10, seed: int = 0) -> "_IVF":
+        nlist = max(1, int(np.sqrt(len(rows))))
+        rng = np.random.default_rng(seed)
+        sample = rows if len(rows) <= 50_000 else rng.choice(rows, 50_000, replace=False)
+        data = matrix[sample]
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    norm = np.linalg.norm(mean)
+                    if norm:
+                        centroids[c] = mean / norm
+        ivf = cls(centroids, [[] for _ in range(nlist)])
+        ivf.add(matrix, rows)
+        return ivf
+
+    def add(self, matrix: np.ndarray, rows) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        assign = np.argmax(matrix[rows] @ self.centroids.T, axis=1)
+        for row, c in zip(rows.tolist(), assign.tolist()):
+            self.lists[c].append(row)
+            self.bucket_of[row] = c
+        self.size += len(rows)
+
+    def move(self, matrix: np.ndarray, rows) -> None:
+        """Re-bucket rows whose vectors were overwritten in place."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows):
+            return
+        assign = np.argmax(matrix[rows] @ self.centroids.T, axis=1)
+        for row, c in zip(rows.tolist(), assign.tolist()):
+            old = self.bucket_of.get(row)
+            if old == c:
+                continue
+            if old is not None:
+                self.lists[old].remove(row)
+            else:
+                self.size += 1
+            self.lists[c].append(row)
+            self.bucket_of[row] = c
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.lists))
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        picked = [self.lists[c] for c in probe.tolist() if self.lists[c]]
+        if not picked:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate([np.asarray(p, dtype=np.int64) for p in picked]))
+
+
+class LocalVectorStore:
+    """Vector store with the same ``upsert_documents``/``similarity_search`` API as Astra."""
+
+    def __init__(self, path: str, search_mode: str = "auto", ann_min_docs: int = 20_000, nprobe: int = 8):
+        self.path = Path(path)
+        self.search_mode = search_mode
+        self.ann_min_docs = ann_min_docs
+        self.nprobe = max(1, nprobe)
+        self._lock = threading.RLock()
+        self.dim = 0
+        self.capacity = 0
+        self._ids: List[Optional[str]] = []  # row -> id (None marks a deleted row)
+        self._rows: Dict[str, int] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._matrix: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ivf: Optional[_IVF] = None
+        self._generation = 0  # bumped when rows are renumbered (compaction)
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+    def _load(self) -> None:
+        meta_path = self.path / META_FILE
+        if meta_path.exists():
+            try:
+                with meta_path.open("r", encoding="utf-8") as handle:
+                    meta = json.load(handle)
+            except (OSError, ValueError) as exc:
+                LOGGER.warning("Local vector index at %s unreadable: %s", self.path, exc)
+                return
+            self.dim = int(meta.get("dim", 0))
+            self.capacity = int(meta.get("capacity", 0))
+            self._ids = list(meta.get("ids", []))
+            self._docs = dict(meta.get("docs", {}))
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids) if doc_id is not None}
+        self._replay_log()
+        if self.dim:
+            self._open_matrix(max(self.capacity, len(self._ids)))
+        self._alive = np.array([doc_id is not None for doc_id in self._ids], dtype=bool)
+
+    def _replay_log(self) -> None:
+        log_path = self.path / LOG_FILE
+        if not log_path.exists():
+            return
+        with log_path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn last line from an interrupted write
+                self.dim = int(record.get("dim", self.dim))
+                self.capacity = int(record.get("capacity", self.capacity))
+                for row, doc in record.get("docs", []):
+                    doc_id = doc["_id"]
+                    if row == len(self._ids):
+                        self._ids.append(doc_id)
+                    else:
+                        self._ids[row] = doc_id
+                    self._rows[doc_id] = row
+                    self._docs[doc_id] = doc
+                for doc_id in record.get("deleted", []):
+                    row = self._rows.pop(doc_id, None)
+                    if row is not None:
+                        self._ids[row] = None
+                        self._docs.pop(doc_id, None)
+
+    def _open_matrix(self, capacity: int) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        vec_path = self.path / VECTORS_FILE
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        with open(vec_path, "a+b") as handle:
+            handle.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(vec_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self.capacity = capacity
+
+    def _save(self) -> None:
+        """Write the full metadata snapshot and drop the log it now contains."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self._matrix is not None:
+            self._matrix.flush()
+        meta = {"dim": self.dim, "capacity": self.capacity, "ids": self._ids, "docs": self._docs}
+        tmp = self.path / (META_FILE + ".tmp")
+        with tmp.open("w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        os.replace(tmp, self.path / META_FILE)
+        (self.path / LOG_FILE).unlink(missing_ok=True)
+
+    def _append_log(self, record: Dict[str, Any]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        if self._matrix is not None:
+            self._matrix.flush()  # vectors reach disk before the metadata that points at them
+        with (self.path / LOG_FILE).open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(record) + "\n")
+
+    def flush(self) -> None:
+        """Fold the metadata log into meta.json (call once a bulk load has finished)."""
+        with self._lock:
+            if (self.path / LOG_FILE).exists():
+                self._save()
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._matrix = None
+
+    # -- mutation ----------------------------------------------------------
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows > self.capacity:
+            self._open_matrix(max(rows, self.capacity * 2, 256))
+
+    def upsert_documents(self, docs: List[Dict[str, Any]]):
+        """Add or replace documents; each needs an ``embedding`` (or ``$vector``) list."""
+        resps = []
+        added: List[int] = []
+        updated: List[int] = []
+        written = []
+        with self._lock:
+            for d in docs:
+                vec = d.get("embedding")
+                if vec is None:
+                    vec = d.get("$vector")
+                unit = _unit(vec) if vec is not None else None
+                if unit is None:
+                    resps.append((400, "missing or empty embedding"))
+                    continue
+                if not self.dim:
+                    self.dim = unit.size
+                if unit.size != self.dim:
+                    resps.append((400, f"embedding has {unit.size} dims, index uses {self.dim}"))
+                    continue
+                doc_id = str(d.get("_id") or uuid.uuid4().hex)
+                row = self._rows.get(doc_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ensure_capacity(row + 1)
+                    self._ids.append(doc_id)
+                    self._rows[doc_id] = row
+                    added.append(row)
+                else:
+                    updated.append(row)
+                self._matrix[row] = unit
+                self._docs[doc_id] = {k: v for k, v in d.items() if k not in ("embedding", "$vector")}
+                self._docs[doc_id]["_id"] = doc_id
+                written.append([row, self._docs[doc_id]])
+                resps.append((200, doc_id))
+            if added:
+                self._alive = np.concatenate([self._alive, np.ones(len(added), dtype=bool)])
+                if self._ivf is not None:
+                    self._ivf.add(self._matrix, added)
+            if updated and self._ivf is not None:
+                self._ivf.move(self._matrix, updated)
+            if written:
+                self._append_log({"dim": self.dim, "capacity": self.capacity, "docs": written})
+        return resps
+
+    def delete_documents(self, ids: List[str]) -> int:
+        removed = 0
+        with self._lock:
+            for doc_id in ids:
+                row = self._rows.pop(str(doc_id), None)
+                if row is None:
+                    continue
+                self._ids[row] = None
+                self._docs.pop(str(doc_id), None)
+                removed += 1
+            if removed:
+                self._alive = np.array([doc_id is not None for doc_id in self._ids], dtype=bool)
+                if len(self._rows) * 2 < len(self._ids):
+                    self._compact()
+                    self._save()  # rows were renumbered: the log no longer applies
+                else:
+                    self._append_log({"deleted": [str(i) for i in ids]})
+        return removed
+
+    def _compact(self) -> None:
+        live = np.flatnonzero(self._alive)
+        vectors = np.array(self._matrix[live]) if self._matrix is not None else None
+        self._ids = [self._ids[row] for row in live.tolist()]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        if vectors is not None:
+            self._matrix[: len(live)] = vectors
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._ivf = None
+        self._generation += 1
+
+    # -- search ------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _use_ann(self) -> bool:
+        if self.search_mode == "approx":
+            return True
+        return self.search_mode == "auto" and len(self._rows) >= self.ann_min_docs
+
+    def _candidate_ivf(self) -> _IVF:
+        live = len(self._rows)
+        if self._ivf is None or live > 2 * max(1, self._ivf.size):
+            self._ivf = _IVF.build(self._matrix, np.flatnonzero(self._alive))
+        return self._ivf
+
+    def warm(self) -> int:
+        """Fault the vector matrix into the page cache (and build the ANN index if it is used)."""
+        with self._lock:
+            if self._matrix is None or not self._rows:
+                return 0
+            float(self._matrix[: len(self._ids)].sum())
+            if self._use_ann():
+                self._candidate_ivf()
+            return len(self._rows)
+
+    def similarity_search(self, embedding: Embedding, top_k: int = 4) -> List[Dict[str, Any]]:
+        query = _unit(embedding) if embedding is not None else None
+        if query is None:
+            return []
+        while True:
+            # Only the snapshot and the id lookup hold the lock; the matrix scan runs outside it
+            # so concurrent queries do not queue. ``_alive`` is replaced, never mutated.
+            with self._lock:
+                if not self._rows or query.size != self.dim:
+                    return []
+                generation = self._generation
+                n = len(self._ids)
+                matrix, alive = self._matrix, self._alive
+                rows = None
+                if self._use_ann():
+                    rows = self._candidate_ivf().candidates(query, self.nprobe)
+                    rows = rows[alive[rows]]
+            if rows is not None:
+                scores = matrix[rows] @ query
+            else:
+                rows = np.arange(n)
+                scores = np.where(alive, matrix[:n] @ query, -np.inf)
+            if not len(rows):
+                return []
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            with self._lock:
+                if self._generation != generation:
+                    continue  # a compaction renumbered the rows meanwhile
+                results = []
+                for idx in top.tolist():
+                    doc_id = self._ids[int(rows[idx])]
+                    if not np.isfinite(scores[idx]) or doc_id is None:
+                        continue
+                    doc = self._docs.get(doc_id, {"_id": doc_id})
+                    results.append({"_id": doc_id, "document": doc, "$similarity": float(scores[idx])})
+                return results
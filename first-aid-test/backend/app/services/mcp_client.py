@@ -0,0 +1,372 @@
+# services/mcp_client.py
+# Tool layer for the pipeline. One long-lived MCP tool-server process
+# (MCP_SERVER_COMMAND) is started on first use and spoken to over stdio with
+# newline-delimited JSON-RPC. Requests carry ids, so any number of tool calls
+# share the pipe concurrently and are sent before the caller needs the
+# answers. Results are cached per tool and arguments with a per-tool TTL.
+# Every call has its own deadline. A timeout, a tool error or a dead server
+# falls back to the in-process implementation in mcp_server.py. A crashed
+# server is restarted on a background thread, at most once per
+# MCP_RESTART_BACKOFF_SECONDS; calls made meanwhile use the fallback at once
+# instead of waiting for the handshake.
+import itertools
+import json
+import logging
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import mcp_server, metrics
+from .cache import LRUCache
+from ..config import (
+    MCP_SERVER_COMMAND, MCP_START_TIMEOUT_SECONDS, MCP_RESTART_BACKOFF_SECONDS, MCP_TOOL_TIMEOUT_MS,
+    MCP_CACHE_MAX_ENTRIES, MCP_EMERGENCY_NUMBERS_TTL_SECONDS, MCP_MAPS_TTL_SECONDS,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = "2025-06-18"
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+class MCPError(RuntimeError):
+    """The tool server is unavailable, answered with an error, or the tool reported one."""
+
+
+class MCPClient:
+    """A persistent stdio connection to one MCP server process."""
+
+    def __init__(self, command: List[str], start_timeout: float = 10.0, restart_backoff: float = 5.0,
+                 cwd: Optional[str] = None):
+        self.command = command
+        self.start_timeout = start_timeout
+        self.restart_backoff = restart_backoff
+        self.cwd = cwd
+        self.tools: List[str] = []
+        self.starts = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()  # process lifecycle
+        self._write_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._restarting = False
+        self._closed = False
+        # Set once the initialize handshake of the current process has finished.
+        self.initialized = threading.Event()
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    # -- lifecycle ---------------------------------------------------------
+    def start(self) -> None:
+        """Start the server and run the initialize handshake (no-op when already running)."""
+        with self._lock:
+            if self._closed:
+                raise MCPError("tool server is shut down")
+            if self.alive:
+                return
+            if time.monotonic() < self._retry_at:
+                raise MCPError("tool server unavailable (waiting to restart)")
+            self._retry_at = time.monotonic() + self.restart_backoff
+            try:
+                self._spawn()
+                init = self._send("initialize", {
+                    "protocolVersion": PROTOCOL_VERSION,
+                    "capabilities": {},
+                    "clientInfo": {"name": "firstaid-backend", "version": "1.0"},
+                })
+                self._result(init, self.start_timeout)
+                self._notify("notifications/initialized")
+                self.initialized.set()
+                listed = self._result(self._send("tools/list", {}), self.start_timeout)
+                self.tools = [t.get("name") for t in listed.get("tools", [])]
+            except Exception as exc:
+                self._kill()
+                raise MCPError(f"tool server failed to start: {exc}") from exc
+            self.starts += 1
+            LOGGER.info("MCP tool server started (pid %s, tools: %s)", self._proc.pid, ", ".join(self.tools))
+
+    def restart_in_background(self) -> None:
+        """Start the server on a daemon thread (after any remaining backoff) unless one is pending."""
+        with self._pending_lock:
+            if self._restarting or self.alive or self._closed:
+                return
+            self._restarting = True
+        threading.Thread(target=self._restart, name="mcp-restart", daemon=True).start()
+
+    def _restart(self) -> None:
+        try:
+            time.sleep(max(0.0, self._retry_at - time.monotonic()))
+            with self._lock:
+                if self._closed:
+                    return  # shut down while waiting out the backoff
+            self.start()
+        except MCPError as exc:
+            if not self._closed:
+                LOGGER.warning("%s; retrying in %.0f s", exc, self.restart_backoff)
+        finally:
+            with self._pending_lock:
+                self._restarting = False
+
+    def _spawn(self) -> None:
+        self.initialized.clear()
+        self._proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                      cwd=self.cwd, bufsize=0)
+        # Each process gets its own pending map, so a dying one cannot fail its successor's calls.
+        with self._pending_lock:
+            self._pending = {}
+        threading.Thread(target=self._read, args=(self._proc, self._pending), name="mcp-reader", daemon=True).start()
+
+    def _read(self, proc: subprocess.Popen, pending: Dict[int, Future]) -> None:
+        for line in proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                LOGGER.warning("MCP server wrote a non-JSON line: %r", line[:200])
+                continue
+            with self._pending_lock:
+                future = pending.pop(message.get("id"), None) if "id" in message else None
+            if future is not None and not future.done():
+                future.set_result(message)
+        # EOF: the process exited; fail whatever was still waiting on it.
+        with self._pending_lock:
+            waiting = list(pending.values())
+            pending.clear()
+        for future in waiting:
+            if not future.done():
+                future.set_exception(MCPError("tool server exited"))
+
+    def _kill(self) -> None:
+        self.initialized.clear()
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True  # start() checks this under the lock, so no restart outlives shutdown
+            self._kill()
+
+    # -- messaging ---------------------------------------------------------
+    def _write(self, message: Dict) -> None:
+        proc = self._proc
+        if proc is None or proc.poll() is not None:
+            raise MCPError("tool server is not running")
+        data = (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+        try:
+            with self._write_lock:
+                proc.stdin.write(data)
+                proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as exc:
+            raise MCPError(f"tool server pipe closed: {exc}") from exc
+
+    def _send(self, method: str, params: Dict) -> Tuple[int, Future]:
+        request_id = next(self._ids)
+        future: Future = Future()
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            self._write({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        except MCPError:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise
+        return request_id, future
+
+    def _notify(self, method: str, params: Optional[Dict] = None) -> None:
+        self._write({"jsonrpc": "2.0", "method": method, **({"params": params} if params else {})})
+
+    def _result(self, sent: Tuple[int, Future], timeout: float) -> Dict:
+        request_id, future = sent
+        try:
+            message = future.result(timeout=max(0.0, timeout))
+        except FutureTimeout:
+            self.cancel(request_id)
+            raise
+        if "error" in message:
+            raise MCPError(message["error"].get("message", "error"))
+        return message.get("result") or {}
+
+    def cancel(self, request_id: int) -> None:
+        """Stop waiting for ``request_id`` and tell the server it may drop the work."""
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+        try:
+            self._notify("notifications/cancelled", {"requestId": request_id, "reason": "timeout"})
+        except MCPError:
+            pass
+
+    def call_tool(self, name: str, arguments: Dict, timeout: Optional[float] = None) -> Tuple[int, Future]:
+        """Send a ``tools/call`` without waiting; resolve it with ``tool_result``.
+
+        Raises ``MCPError`` at once while the server is down; the restart runs in the background.
+        A server that is running but still in its initialize handshake is waited for, at most
+        ``timeout`` seconds (default ``start_timeout``): no request may precede the handshake.
+        """
+        if not self.alive:
+            self.restart_in_background()
+            raise MCPError("tool server is not running (restarting in the background)")
+        if not self.initialized.wait(self.start_timeout if timeout is None else max(0.0, timeout)):
+            raise MCPError("tool server is still initializing")
+        return self._send("tools/call", {"name": name, "arguments": arguments})
+
+    def tool_result(self, sent: Tuple[int, Future], timeout: float) -> Any:
+        result = self._result(sent, timeout)
+        if result.get("isError"):
+            text = " ".join(c.get("text", "") for c in result.get("content", []) if c.get("type") == "text")
+            raise MCPError(text or "tool error")
+        if "structuredContent" in result:
+            return result["structuredContent"]
+        for item in result.get("content", []):
+            if item.get("type") == "text":
+                return json.loads(item["text"])
+        raise MCPError("tool returned no content")
+
+
+@dataclass
+class ToolSpec:
+    name: str
+    ttl: float  # seconds a result stays cached (0 = do not cache)
+    timeout: float  # seconds
+    fallback: Callable[..., Dict]
+
+
+class PendingCalls:
+    """Tool calls already sent; ``results()`` waits for each up to its own deadline."""
+
+    def __init__(self, runtime: "ToolRuntime", items: List[Dict]):
+        self.runtime = runtime
+        self.items = items
+
+    def results(self) -> List[Dict]:
+        return [self.runtime._finish(item) for item in self.items]
+
+
+class ToolRuntime:
+    def __init__(self, client: Optional[MCPClient], specs: Dict[str, ToolSpec], cache_entries: int = 1024):
+        self.client = client
+        self.specs = specs
+        self.cache = LRUCache(max_entries=cache_entries)
+        self.counts = {"calls": 0, "cache_hits": 0, "remote": 0, "local": 0, "timeouts": 0, "errors": 0,
+                       "fallbacks": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def start(self, calls: List[Tuple[str, Dict]]) -> PendingCalls:
+        """Send every uncached call now so they run while the caller does other work."""
+        items = []
+        for name, arguments in calls:
+            self._count("calls")
+            key = (name, json.dumps(arguments, sort_keys=True))
+            item = {"name": name, "arguments": arguments, "key": key, "sent_at": time.monotonic()}
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count("cache_hits")
+                item["value"] = cached
+            elif self.client is None:
+                item["value"] = self.specs[name].fallback(**arguments)
+            else:
+                try:
+                    item["sent"] = self.client.call_tool(name, arguments, timeout=self.specs[name].timeout)
+                except MCPError as exc:
+                    item["error"] = exc
+            items.append(item)
+        return PendingCalls(self, items)
+
+    def _finish(self, item: Dict) -> Dict:
+        if "value" in item:
+            return item["value"]
+        spec = self.specs[item["name"]]
+        error = item.get("error")
+        if error is None:
+            remaining = spec.timeout - (time.monotonic() - item["sent_at"])
+            try:
+                value = self.client.tool_result(item["sent"], remaining)
+                self._count("remote")
+                if spec.ttl:
+                    self.cache.put(item["key"], value, ttl=spec.ttl)
+                return value
+            except FutureTimeout:
+                self._count("timeouts")
+                error = f"timed out after {spec.timeout * 1000:.0f} ms"
+            except (MCPError, ValueError) as exc:
+                error = exc
+        if not isinstance(error, str):
+            self._count("errors")
+        LOGGER.warning("MCP tool %s failed (%s); using the local fallback", item["name"], error)
+        self._count("fallbacks")
+        metrics.fallback(f"tool_{item['name']}")
+        return spec.fallback(**item["arguments"])
+
+    def call(self, name: str, arguments: Dict) -> Dict:
+        return self.start([(name, arguments)]).results()[0]
+
+    def local(self, calls: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Answer from the cache or the in-process implementations without touching the server.
+
+        Never blocks, so it is safe on the event loop (used for shed requests).
+        """
+        values = []
+        for name, arguments in calls:
+            self._count("calls")
+            cached = self.cache.get((name, json.dumps(arguments, sort_keys=True)))
+            if cached is not None:
+                self._count("cache_hits")
+                values.append(cached)
+            else:
+                self._count("local")
+                values.append(self.specs[name].fallback(**arguments))
+        return values
+
+    def warm(self) -> None:
+        """Start the tool server now instead of on the first request (errors are logged)."""
+        if self.client is not None:
+            try:
+                self.client.start()
+            except MCPError as exc:
+                LOGGER.warning("%s; tools will use local fallbacks until it starts", exc)
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            data = dict(self.counts)
+        data["cache_size"] = len(self.cache)
+        if self.client is not None:
+            data["server_alive"] = 1 if self.client.alive else 0
+            data["server_starts"] = self.client.starts
+        return data
+
+
+def _spec(name: str, ttl: float) -> ToolSpec:
+    return ToolSpec(name, ttl, MCP_TOOL_TIMEOUT_MS / 1000.0, mcp_server.TOOLS[name][0])
+
+
+RUNTIME = ToolRuntime(
+    MCPClient(shlex.split(MCP_SERVER_COMMAND), MCP_START_TIMEOUT_SECONDS, MCP_RESTART_BACKOFF_SECONDS,
+              cwd=str(BACKEND_DIR)) if MCP_SERVER_COMMAND.strip() else None,
+    {
+        "get_emergency_numbers": _spec("get_emergency_numbers", MCP_EMERGENCY_NUMBERS_TTL_SECONDS),
+        "get_location_from_maps": _spec("get_location_from_maps", MCP_MAPS_TTL_SECONDS),
+    },
+    cache_entries=MCP_CACHE_MAX_ENTRIES,
+)
+metrics.register_collector("tools", RUNTIME.stats)
@@ -1,12 +1,30 @@
 # services/mcp_server.py
-# Placeholder "MCP server" adapter for assignment: exposes tool-like functions.
-# In a real MCP server you'd run a separate process; here we simulate calls.
-import requests
+# Tool implementations behind the MCP tool layer. The stand-in tool server
+# (app/mcp_stdio_server.py) serves these over MCP's stdio transport, and
+# services/mcp_client.py falls back to calling them in-process when the tool
+# server is unavailable or slow. Swap the server command for a real MCP server
+# to use live data.
+
+# Ambulance/police/fire numbers by ISO country code.
+EMERGENCY_NUMBERS = {
+    "LK": {"POLICE": "119", "AMBULANCE": "1990", "FIRE": "110"},
+    "IN": {"POLICE": "100", "AMBULANCE": "108", "FIRE": "101"},
+    "US": {"POLICE": "911", "AMBULANCE": "911", "FIRE": "911"},
+    "CA": {"POLICE": "911", "AMBULANCE": "911", "FIRE": "911"},
+    "GB": {"POLICE": "999", "AMBULANCE": "999", "FIRE": "999"},
+    "AU": {"POLICE": "000", "AMBULANCE": "000", "FIRE": "000"},
+    "NZ": {"POLICE": "111", "AMBULANCE": "111", "FIRE": "111"},
+}
+# 112 reaches emergency services from any mobile phone in most countries.
+DEFAULT_NUMBERS = {"POLICE": "112", "AMBULANCE": "112", "FIRE": "112"}
+
 
 def get_emergency_numbers(country_code: str = "LK") -> dict:
-    # Placeholder: static map for demo; extend with a real API if needed.
-    defaults = {"POLICE": "119", "AMBULANCE": "1990", "FIRE": "110"}
-    return {"country": country_code, "numbers": defaults}
+    code = (country_code or "LK").strip().upper()
+    numbers = EMERGENCY_NUMBERS.get(code)
+    if numbers is None:
+        return {"country": code, "numbers": dict(DEFAULT_NUMBERS), "default": True}
+    return {"country": code, "numbers": dict(numbers)}
 
 def get_location_from_maps(query: str) -> dict:
     # Placeholder for a Maps API. Returns a fake, well-formed object.
@@ -15,3 +33,18 @@ def get_location_from_maps(query: str) -> dict:
 def call_other_api(name: str, payload: dict) -> dict:
     # Placeholder generic API
     return {"api": name, "ok": True, "echo": payload}
+
+
+# MCP tool descriptors: name -> (function, description, JSON schema of the arguments)
+TOOLS = {
+    "get_emergency_numbers": (
+        get_emergency_numbers,
+        "Emergency phone numbers (police, ambulance, fire) for an ISO country code.",
+        {"type": "object", "properties": {"country_code": {"type": "string"}}},
+    ),
+    "get_location_from_maps": (
+        get_location_from_maps,
+        "Resolve a place query (e.g. 'nearest hospital') to coordinates.",
+        {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+    ),
+}
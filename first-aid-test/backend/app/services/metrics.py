@@ -0,0 +1,215 @@
+# services/metrics.py
+# Lightweight in-process metrics with Prometheus text exposition.
+# ``span(stage)`` times a pipeline stage into a latency histogram and, when the
+# current request asked for it, into a per-request timing breakdown. Components
+# with their own counters (caches, triage tier) register a collector that is
+# read at scrape time. With METRICS_ENABLED=false spans and counters are no-ops.
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import METRICS_ENABLED
+
+ENABLED = METRICS_ENABLED
+PREFIX = "firstaid"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0)
+
+_LOCK = threading.Lock()
+_METRICS: Dict[str, "_Metric"] = {}
+_COLLECTORS: Dict[str, Callable[[], Dict]] = {}
+_TIMINGS: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "firstaid_request_timings", default=None)
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = f"{PREFIX}_{name}"
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            state[1] += 1
+            state[2] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for labels, (counts, count, total) in items:
+            for bound, c in zip(self.buckets, counts):
+                le = 'le="%s"' % _fmt_value(bound)
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {c}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {count}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, labels)} {_fmt_value(total)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    with _LOCK:
+        return _METRICS.setdefault(name, Counter(name, help_text, labelnames))  # type: ignore[return-value]
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    with _LOCK:
+        return _METRICS.setdefault(name, Histogram(name, help_text, labelnames, buckets))  # type: ignore[return-value]
+
+
+def register_collector(name: str, fn: Callable[[], Dict]) -> None:
+    """Expose the numeric fields of ``fn()`` as ``firstaid_<name>_<field>`` gauges at scrape time."""
+    with _LOCK:
+        _COLLECTORS[name] = fn
+
+
+STAGE_SECONDS = histogram("stage_seconds", "Latency of pipeline stages.", ["stage"])
+HTTP_SECONDS = histogram("http_request_seconds", "Latency of outbound HTTP calls.", ["provider", "host", "method"])
+HTTP_REQUESTS = counter("http_requests_total", "Outbound HTTP calls by result.", ["provider", "host", "status"])
+FALLBACKS = counter("fallbacks_total", "Degraded paths taken (rule-based steps, empty embeddings, default triage).", ["kind"])
+
+
+class span:
+    """Time a block as pipeline stage ``stage``."""
+
+    __slots__ = ("stage", "_start", "_timings")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._timings = _TIMINGS.get()
+        self._start = time.perf_counter() if (ENABLED or self._timings is not None) else 0.0
+        return self
+
+    def __exit__(self, *exc):
+        if self._start:
+            elapsed = time.perf_counter() - self._start
+            STAGE_SECONDS.observe(elapsed, self.stage)
+            if self._timings is not None:
+                self._timings.append((self.stage, elapsed))
+        return False
+
+
+def observe_http(provider: str, host: str, method: str, status: str, elapsed: float) -> None:
+    HTTP_SECONDS.observe(elapsed, provider, host, method)
+    HTTP_REQUESTS.inc(provider, host, status)
+    timings = _TIMINGS.get()
+    if timings is not None:
+        timings.append((f"http:{provider}", elapsed))
+
+
+def fallback(kind: str) -> None:
+    FALLBACKS.inc(kind)
+
+
+class request_timings:
+    """Collect a per-request stage breakdown for code running in this context (and its threads)."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.entries: List[Tuple[str, float]] = []
+        self._token = None
+        self._start = 0.0
+        self.total = 0.0
+
+    def __enter__(self):
+        if self.enabled:
+            self._token = _TIMINGS.set(self.entries)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self._token is not None:
+            self.total = time.perf_counter() - self._start
+            _TIMINGS.reset(self._token)
+        return False
+
+    def summary(self) -> Dict:
+        return {
+            "total_ms": round(self.total * 1000, 2),
+            "stages": [{"stage": stage, "ms": round(secs * 1000, 2)} for stage, secs in self.entries],
+        }
+
+
+def render() -> str:
+    """Prometheus text exposition of every metric and registered collector."""
+    with _LOCK:
+        metrics = list(_METRICS.values())
+        collectors = list(_COLLECTORS.items())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for name, fn in collectors:
+        try:
+            data = fn() or {}
+        except Exception as exc:  # a broken collector must not break the scrape
+            lines.append(f"# collector {name} failed: {_escape(exc)}")
+            continue
+        for key, value in sorted(data.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"{PREFIX}_{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {_fmt_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+# services/redaction.py
+# Single-pass PII redaction for text that leaves the process (LLM prompts,
+# embeddings, cache keys). Every detector is one alternative of a single
+# precompiled regex, so the input is scanned once. The same pass also does
+# the control-character cleanup that basic_sanitize used to do and collapses
+# runs of whitespace. Every alternative is anchored on a word edge and has
+# bounded repeats, so cost stays linear in the input length (see
+# benchmarks/bench_redaction.py).
+#
+# Detected values become numbered placeholders such as [PHONE_1]. A repeated
+# value reuses its placeholder. The placeholder -> value map lets
+# ``restore`` put the originals back into the steps shown to the user.
+# Because placeholders are numbered per message, "my son's number is
+# 0771234567" and "my son's number is 0719876543" normalize to the same
+# text, so they share response-cache entries.
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+KINDS = ("EMAIL", "PHONE", "ID", "ADDRESS", "NAME")
+
+# Capitalised words that follow a name cue without being a name ("her name is Unknown",
+# "name: Not given"); the NAME detector leaves them alone.
+_NOT_NAMES = (
+    "Not", "No", "Now", "Unknown", "Unsure", "None", "Here", "There", "Still", "Just", "Also",
+    "Burned", "Bleeding", "Hurt", "Injured", "Sick", "Help", "Please", "Asap", "Urgent",
+)
+
+# (group, pattern). Each pattern has exactly one capturing group, the named one, holding
+# the value to mask; cue words before it ("my name is") are matched but kept. The kind is
+# the group name up to the first underscore. Order matters where alternatives overlap:
+# IDs are tried before phones so an NIC or card number is not reported as a phone.
+_DETECTORS: List[Tuple[str, str]] = [
+    ("EMAIL", r"(?<![\w.%+-])(?P<EMAIL>[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63}){0,8}"
+              r"\.[A-Za-z]{2,24})(?![\w-])"),
+    ("ID_SSN", r"(?<![\w-])(?P<ID_SSN>\d{3}-\d{2}-\d{4})(?![\w-])"),
+    # Sri Lankan NIC: 9 digits + V/X (old) or 12 digits starting with the birth year (new)
+    ("ID_NIC", r"(?<!\w)(?P<ID_NIC>\d{9}[VvXx]|(?:19|20)\d{10})(?!\w)"),
+    ("ID_CARD", r"(?<![\w-])(?P<ID_CARD>\d{4}(?:[ -]?\d{4}){3})(?![\w-])"),
+    ("ID_CUE", r"(?i:\b(?:nic|id|passport|ssn|mrn|licen[cs]e)(?: ?(?:number|num|no\.?|#))? ?[:#]? ?)"
+               r"(?P<ID_CUE>(?=[A-Za-z0-9-]{0,19}\d)[A-Za-z0-9-]{5,20})(?![\w-])"),
+    # 9-15 digits with single separators, or fewer after a +country code or (area code)
+    # (not followed by ":", so "2024-01-15 10:30" is left alone)
+    ("PHONE", r"(?<![\w+])(?P<PHONE>(?:\+\d{1,3}[ .-]?(?:\(\d{1,4}\)[ .-]?)?|\(\d{1,4}\)[ .-]?)\d(?:[ .-]?\d){5,13}"
+              r"|\d(?:[ .-]?\d){8,14})(?![\w:])"),
+    ("ADDRESS", r"(?<!\w)(?P<ADDRESS>\d{1,5}[A-Za-z]?(?:/\d{1,4})?,? (?:[A-Z][A-Za-z'-]{0,30}\.? ){1,4}"
+                r"(?:Street|St|Road|Rd|Avenue|Ave|Lane|Ln|Mawatha|Drive|Dr|Boulevard|Blvd|Place|Pl|Court|Ct|"
+                r"Way|Terrace|Close|Crescent|Highway|Hwy)\b)"),
+    ("ADDRESS_CUE", r"(?i:\b(?:my address is|i live at|address ?:) *)(?P<ADDRESS_CUE>[^\s.;!?][^.;!?\n]{2,79})"),
+    # "call me" is not a cue: "call me Now" and "call me Asap" are requests, not names.
+    ("NAME", r"(?i:\b(?:my name is|my name's|name ?:|i am called|(?:his|her|their) name is) +)"
+             r"(?!(?:%s)\b)(?P<NAME>[A-Z][a-z'-]{1,30}(?: [A-Z][a-z'-]{1,30}){0,2})" % "|".join(_NOT_NAMES)),
+]
+# Control characters (always blanked, like basic_sanitize) and whitespace runs of two or more.
+_WHITESPACE = r"(?P<WS>(?:[\x00-\x1f\x7f]|\s(?=[\s\x00-\x1f\x7f]))[\s\x00-\x1f\x7f]*)"
+_WHITESPACE_RE = re.compile(_WHITESPACE)
+
+PLACEHOLDER_RE = re.compile(r"\[(?:%s)_\d{1,4}\]" % "|".join(KINDS))
+_MAX_PLACEHOLDER = 16  # longest placeholder a streamed chunk may end inside
+
+
+def _kind(group: str) -> str:
+    return group.split("_", 1)[0]
+
+
+def _value_key(kind: str, value: str) -> str:
+    """Spelling-insensitive identity of a value, so repeats share one placeholder."""
+    if kind in ("PHONE", "ID"):
+        return "".join(ch for ch in value if ch.isalnum()).upper()
+    return " ".join(value.split()).lower()
+
+
+@dataclass
+class Redacted:
+    text: str
+    # one entry per masked span of the input: {"type", "start", "end", "placeholder"}
+    spans: List[Dict] = field(default_factory=list)
+    placeholders: Dict[str, str] = field(default_factory=dict)  # placeholder -> original value
+
+
+class Redactor:
+    """Masks the enabled ``kinds`` of PII in one regex pass over the text."""
+
+    def __init__(self, kinds: Optional[Iterable[str]] = None):
+        wanted = {k.strip().upper() for k in (kinds if kinds is not None else KINDS) if k.strip()}
+        detectors = [(group, pattern) for group, pattern in _DETECTORS if _kind(group) in wanted]
+        self.kinds = sorted({_kind(group) for group, _ in detectors})
+        # Every detector starts at a word edge; checking that once up front lets the scan skip
+        # positions inside words without trying each alternative there.
+        alternatives = "|".join(pattern for _, pattern in detectors)
+        self._pattern = re.compile(f"(?<!\\w)(?:{alternatives})|{_WHITESPACE}" if detectors else _WHITESPACE)
+        # Only one group takes part in any match, so ``match.lastindex`` identifies the detector.
+        self._groups = {index: name for name, index in self._pattern.groupindex.items()}
+
+    def redact(self, text: str) -> Redacted:
+        out: List[str] = []
+        spans: List[Dict] = []
+        placeholders: Dict[str, str] = {}
+        seen: Dict[Tuple[str, str], str] = {}
+        counts: Dict[str, int] = {}
+        last = 0
+        for match in self._pattern.finditer(text):
+            group = self._groups[match.lastindex]
+            if group == "WS":
+                out.append(text[last:match.start()])
+                out.append(" ")
+                last = match.end()
+                continue
+            start, end = match.span(match.lastindex)
+            kind = _kind(group)
+            value = text[start:end]
+            key = (kind, _value_key(kind, value))
+            placeholder = seen.get(key)
+            if placeholder is None:
+                counts[kind] = counts.get(kind, 0) + 1
+                placeholder = seen[key] = f"[{kind}_{counts[kind]}]"
+                placeholders[placeholder] = value
+            out.append(text[last:match.start()])
+            # cue words before the value are kept, with their whitespace normalized
+            out.append(_WHITESPACE_RE.sub(" ", text[match.start():start]))
+            out.append(placeholder)
+            last = end
+            spans.append({"type": kind, "start": start, "end": end, "placeholder": placeholder})
+        out.append(text[last:])
+        return Redacted("".join(out).strip(), spans, placeholders)
+
+
+def restore(text: str, placeholders: Optional[Dict[str, str]]) -> str:
+    """Put the original values back in place of their placeholders (unknown ones are left alone)."""
+    if not placeholders or "[" not in text:
+        return text
+    return PLACEHOLDER_RE.sub(lambda m: placeholders.get(m.group(0), m.group(0)), text)
+
+
+class StreamRestorer:
+    """``restore`` for streamed text: holds back a chunk's tail while it could be half a placeholder."""
+
+    def __init__(self, placeholders: Optional[Dict[str, str]]):
+        self.placeholders = placeholders or {}
+        self._tail = ""
+
+    def feed(self, delta: str) -> str:
+        if not self.placeholders:
+            return delta
+        text = self._tail + delta
+        cut = text.rfind("[")
+        if cut != -1 and "]" not in text[cut:] and len(text) - cut < _MAX_PLACEHOLDER:
+            text, self._tail = text[:cut], text[cut:]
+        else:
+            self._tail = ""
+        return restore(text, self.placeholders)
+
+    def flush(self) -> str:
+        tail, self._tail = self._tail, ""
+        return restore(tail, self.placeholders)
@@ -0,0 +1,209 @@
+# services/response_cache.py
+# Result cache for the triage + instructions part of the pipeline.
+# Exact hits are keyed on the normalized sanitized context; near-duplicates are
+# found by cosine similarity of the (already cached) query embedding. Entries are
+# dropped whenever the guardrail registry reloads guardrails.yaml. Verification
+# is never cached: callers re-run it on every hit. Entries can be snapshotted
+# at shutdown and restored at startup; a snapshot taken under different models or
+# guardrails (a different fingerprint) is ignored.
+import copy
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import json_codec, metrics
+from .cache import LRUCache, write_atomic
+from .embedding_cache import normalize
+from . import rules_guardrails
+from ..config import (
+    MODEL_PREFERENCE, EMBEDDING_MODEL, stage_model,
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "responses.json"
+VECTORS_FILE = "responses.npz"
+
+
+# The router may answer from either provider, so every stage model counts. Model settings
+# only change with a restart, so this part is read once.
+_MODELS = "|".join([MODEL_PREFERENCE, *(stage_model(p, stage) for p in ("groq", "openai")
+                                        for stage in ("classify", "generate", "fused")), EMBEDDING_MODEL])
+
+
+def _fingerprint() -> str:
+    """Identify everything that makes a cached answer stale (no file I/O: the guardrail
+    registry already tracks the rules file)."""
+    return f"{_MODELS}|{rules_guardrails.stamp()}"
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int, ttl: float, semantic_threshold: float = 0.0):
+        self.entries = LRUCache(max_entries=max_entries, ttl=ttl, on_evict=self._drop_vector)
+        self.semantic_threshold = semantic_threshold
+        self.semantic_hits = 0
+        self.invalidations = 0
+        # Unit query vectors, one row per cached key, kept in step with store/eviction so
+        # a lookup is a single matrix-vector product. Freed rows are zeroed and reused.
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+        self._row_keys: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._lock = threading.Lock()
+        self._fingerprint = _fingerprint()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+    def rules_changed(self, rules=None) -> None:
+        """Guardrails were reloaded: drop every answer that was checked against the old rules."""
+        LOGGER.info("Guardrails changed; clearing response cache")
+        self.invalidate()
+        self._fingerprint = _fingerprint()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self._reset_vectors(0)
+            self.invalidations += 1
+
+    def _reset_vectors(self, dim: int) -> None:
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._row_keys, self._rows, self._free = [], {}, []
+
+    def _set_vector(self, key: str, unit: np.ndarray) -> None:
+        """Write ``key``'s unit vector into its row, taking a free row or growing the matrix."""
+        if self._matrix.shape[1] != unit.size:
+            self._reset_vectors(unit.size)  # a different embedding model; old rows are meaningless
+        row = self._rows.get(key)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                row = len(self._row_keys)
+                if row == len(self._matrix):
+                    grown = np.zeros((max(16, row * 2), unit.size), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._row_keys.append(None)
+            self._rows[key] = row
+            self._row_keys[row] = key
+        self._matrix[row] = unit
+
+    def _drop_vector(self, key) -> None:
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is not None:
+                self._row_keys[row] = None
+                self._matrix[row] = 0.0
+                self._free.append(row)
+
+    def _semantic_lookup(self, vector: List[float]) -> Optional[Dict]:
+        query = np.asarray(vector, dtype=np.float32)
+        qnorm = float(np.linalg.norm(query))
+        if not qnorm:
+            return None
+        with self._lock:
+            if not self._rows or self._matrix.shape[1] != query.size:
+                return None
+            sims = self._matrix[: len(self._row_keys)] @ (query / qnorm)
+            best = int(np.argmax(sims))
+            key, score = self._row_keys[best], float(sims[best])
+        if key is None or score < self.semantic_threshold:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            self._drop_vector(key)  # evicted while its vector was being written
+            return None
+        self.semantic_hits += 1
+        return dict(entry, match="semantic", similarity=round(score, 4))
+
+    def lookup(self, text: str, embed: Optional[Callable[[str], List[float]]] = None) -> Optional[Dict]:
+        """Return a copy of ``{"triage", "instructions", "match"}`` for ``text`` or None."""
+        entry = self.entries.get(self.key(text))
+        if entry is not None:
+            return copy.deepcopy(dict(entry, match="exact"))
+        if self.semantic_threshold > 0 and embed is not None:
+            vector = embed(text)
+            if vector:
+                entry = self._semantic_lookup(vector)
+                if entry is not None:
+                    return copy.deepcopy(entry)
+        return None
+
+    def store(self, text: str, triage: Dict, instructions: Dict,
+              embed: Optional[Callable[[str], List[float]]] = None) -> None:
+        # Degraded answers (classifier default, rule-based or cut-off steps) are not worth keeping.
+        if (instructions.get("fallback") or instructions.get("partial")
+                or str(triage.get("category", "unknown")).lower() == "unknown"):
+            return
+        key = self.key(text)
+        self.entries.put(key, {"triage": copy.deepcopy(triage), "instructions": copy.deepcopy(instructions)})
+        if self.semantic_threshold > 0 and embed is not None:
+            vector = embed(text)
+            if vector:
+                vec = np.asarray(vector, dtype=np.float32)
+                norm = float(np.linalg.norm(vec))
+                if norm:
+                    with self._lock:
+                        self._set_vector(key, vec / norm)
+
+    def save_snapshot(self, directory: str) -> int:
+        """Write live entries (and their similarity vectors) to ``directory``; returns the count."""
+        entries = self.entries.dump()
+        if not entries:
+            return 0
+        live = {k for k, _, _ in entries}
+        with self._lock:
+            vectors = [(k, self._matrix[row].copy()) for k, row in self._rows.items() if k in live]
+        body = {"fingerprint": self._fingerprint, "entries": [list(e) for e in entries]}
+        write_atomic(os.path.join(directory, SNAPSHOT_FILE), json_codec.dumps(body))
+        if vectors:
+            buf = io.BytesIO()
+            np.savez(buf, keys=np.array([k for k, _ in vectors]), vectors=np.stack([v for _, v in vectors]))
+            write_atomic(os.path.join(directory, VECTORS_FILE), buf.getvalue())
+        return len(entries)
+
+    def load_snapshot(self, directory: str) -> int:
+        """Restore a ``save_snapshot`` written under the current fingerprint; returns the count."""
+        path = os.path.join(directory, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as fh:
+            body = json.load(fh)
+        if body.get("fingerprint") != _fingerprint():
+            LOGGER.info("Response cache snapshot is for other guardrails/models; ignoring it")
+            return 0
+        loaded = self.entries.load(tuple(e) for e in body.get("entries", []))
+        vectors_path = os.path.join(directory, VECTORS_FILE)
+        if loaded and self.semantic_threshold > 0 and os.path.exists(vectors_path):
+            live = {k for k, _ in self.entries.items()}
+            with np.load(vectors_path) as data:
+                keys, matrix = data["keys"], data["vectors"]
+            with self._lock:
+                for i, key in enumerate(keys):
+                    if str(key) in live:
+                        self._set_vector(str(key), matrix[i])
+        return loaded
+
+    def stats(self) -> Dict:
+        data = self.entries.stats()
+        data.update({
+            "semantic_threshold": self.semantic_threshold,
+            "semantic_hits": self.semantic_hits,
+            "invalidations": self.invalidations,
+        })
+        return data
+
+
+CACHE = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SEMANTIC_THRESHOLD)
+metrics.register_collector("response_cache", CACHE.stats)
+rules_guardrails.subscribe(CACHE.rules_changed)
@@ -1,43 +1,237 @@
 # services/rules_guardrails.py
-# This module loads/validates guardrails from YAML; here we keep minimal helpers.
+# This module loads/validates guardrails from YAML and compiles them into a single matcher.
+# All deny terms are folded into one trie-shaped regex (shared prefixes become shared
+# branches), so scan cost grows very slowly with the number of terms instead of
+# linearly as with a per-term loop. The compiled rule set is immutable; when guardrails.yaml changes
+# on disk a new one is built and swapped in with a single reference assignment.
 import logging
 import re
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
 
 import yaml
 
+from ..config import GUARDRAILS_PATH as _GUARDRAILS_PATH, GUARDRAILS_RELOAD_SECONDS
+
 LOGGER = logging.getLogger(__name__)
-GUARDRAILS_PATH = Path(__file__).resolve().parent.parent / "guardrails.yaml"
+GUARDRAILS_PATH = Path(_GUARDRAILS_PATH)
+
+DENY_RULE = "deny_terms"
+DIAGNOSIS_RULE = "block_unqualified_medical_diagnosis"
+# prevent prescriptive diagnosis strings
+DIAGNOSIS_PATTERN = r"diagnose|prescribe|dose\b"
+
 
+@dataclass(frozen=True)
+class Match:
+    rule: str
+    term: str
+    start: int
+    end: int
 
-def _load_rules() -> dict:
-    if not GUARDRAILS_PATH.exists():
-        LOGGER.warning("Guardrails config missing at %s; falling back to defaults", GUARDRAILS_PATH)
+
+def _load_rules(path: Path = GUARDRAILS_PATH) -> Optional[dict]:
+    if not path.exists():
+        LOGGER.warning("Guardrails config missing at %s; falling back to defaults", path)
         return {}
     try:
-        with GUARDRAILS_PATH.open("r", encoding="utf-8") as handle:
+        with path.open("r", encoding="utf-8") as handle:
             data = yaml.safe_load(handle) or {}
     except (OSError, yaml.YAMLError) as exc:
         LOGGER.warning("Unable to load guardrails config: %s", exc)
-        return {}
+        return None
     if not isinstance(data, dict):
         LOGGER.warning("Guardrails config must be a mapping; using empty defaults")
         return {}
     return data
 
 
-RULES = _load_rules()
+def _trie_regex(terms: Iterable[str]) -> str:
+    """Build a regex matching any of ``terms`` with common prefixes factored out."""
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def render(node: Dict) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + render(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        singles = [b for b in branches if len(b) == 1]
+        body = "|".join([b for b in branches if len(b) != 1] + (["[" + "".join(singles) + "]"] if len(singles) > 1 else singles))
+        return f"(?:{body})" + ("?" if end else "")
+
+    return render(trie)
+
+
+class RuleSet:
+    """Compiled, immutable view of one guardrails.yaml revision."""
+
+    def __init__(self, rules: dict, version: int = 0):
+        self.rules = rules
+        self.version = version
+        self.deny_terms = tuple(sorted({str(t).lower() for t in rules.get("deny_terms", []) or [] if str(t).strip()}))
+        self.block_diagnosis = bool(rules.get(DIAGNOSIS_RULE, True))
+        parts = []
+        if self.deny_terms:
+            parts.append(f"(?P<{DENY_RULE}>{_trie_regex(self.deny_terms)})")
+        if self.block_diagnosis:
+            parts.append(f"(?P<{DIAGNOSIS_RULE}>{DIAGNOSIS_PATTERN})")
+        # Terms are lowercase and the text is lowercased once per scan, which is several
+        # times faster than IGNORECASE. The IGNORECASE copy is only used for the rare text
+        # whose length changes when lowercased (match spans must index the original).
+        self.pattern = re.compile("|".join(parts)) if parts else None
+        self.pattern_ci = re.compile("|".join(parts), re.IGNORECASE) if parts else None
+        # Longest text a single match can span; streamed input keeps this much overlap.
+        self.max_match_length = max([len(t) for t in self.deny_terms] + [len("prescribe")]) + 1
+
+    def _prepare(self, text: str):
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            return self.pattern, lowered
+        return self.pattern_ci, text
+
+    def search(self, text: str) -> bool:
+        if self.pattern is None:
+            return False
+        pattern, subject = self._prepare(text)
+        return pattern.search(subject) is not None
+
+    def finditer(self, text: str):
+        if self.pattern is None:
+            return
+        pattern, subject = self._prepare(text)
+        for m in pattern.finditer(subject):
+            yield Match(m.lastgroup, m.group().lower(), m.start(), m.end())
+
+    def match(self, text: str) -> List[Match]:
+        return list(self.finditer(text))
+
+
+class _Registry:
+    """Holds the active rule set and reloads it when the YAML file changes."""
+
+    def __init__(self, path: Path, interval: float):
+        self.path = path
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._stamp = self._file_stamp()
+        self._listeners: List[Callable[[RuleSet], None]] = []
+        self.active = RuleSet(_load_rules(path) or {}, version=1)
+        self.active_stamp = self._stamp  # file stamp the active rules were loaded from
+
+    def _file_stamp(self):
+        try:
+            st = self.path.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def current(self) -> RuleSet:
+        if self.interval > 0 and time.monotonic() >= self._next_check:
+            self.maybe_reload()
+        return self.active
 
-# Simple evaluators for demo
-DENYLIST = set(RULES.get("deny_terms", []))
-BLOCK_MEDICAL_DIAGNOSIS = RULES.get("block_unqualified_medical_diagnosis", True)
+    def maybe_reload(self, force: bool = False) -> bool:
+        if not self._lock.acquire(blocking=False):
+            return False  # another thread is already reloading
+        try:
+            self._next_check = time.monotonic() + self.interval
+            stamp = self._file_stamp()
+            if not force and stamp == self._stamp:
+                return False
+            self._stamp = stamp
+            rules = _load_rules(self.path)
+            if rules is None:
+                return False  # keep serving the last good rule set
+            self.active = RuleSet(rules, version=self.active.version + 1)
+            self.active_stamp = stamp
+            LOGGER.info("Guardrails reloaded from %s (version %d)", self.path, self.active.version)
+            for listener in list(self._listeners):
+                try:
+                    listener(self.active)
+                except Exception:
+                    LOGGER.exception("Guardrail reload listener failed")
+            return True
+        finally:
+            self._lock.release()
+
+
+_REGISTRY = _Registry(GUARDRAILS_PATH, GUARDRAILS_RELOAD_SECONDS)
+
+
+def current() -> RuleSet:
+    """Return the active compiled rule set (checking for file changes at most every interval)."""
+    return _REGISTRY.current()
+
+
+def reload(force: bool = True) -> bool:
+    return _REGISTRY.maybe_reload(force=force)
+
+
+def subscribe(listener: Callable[[RuleSet], None]) -> None:
+    """Call ``listener(new_rules)`` after every successful reload."""
+    _REGISTRY._listeners.append(listener)
+
+
+def stamp() -> str:
+    """``mtime_ns:size`` of the file the active rules came from ("missing" if there was none)."""
+    loaded = _REGISTRY.active_stamp
+    return f"{loaded[0]}:{loaded[1]}" if loaded else "missing"
 
 
 def violates(text: str) -> bool:
-    t = text.lower()
-    if any(term.lower() in t for term in DENYLIST):
-        return True
-    # prevent prescriptive diagnosis strings
-    if BLOCK_MEDICAL_DIAGNOSIS and re.search("diagnose|prescribe|dose\\b", t, re.I):
-        return True
-    return False
+    return current().search(text)
+
+
+def find_matches(text: str) -> List[Match]:
+    """Return every rule hit in ``text`` with its character span."""
+    return current().match(text)
+
+
+class StreamMatcher:
+    """Incremental matcher for text that arrives in chunks.
+
+    Only the tail that could still hold the start of a match is rescanned with each
+    chunk, so a term split across chunks is found and total work stays linear.
+    Diagnosis matches that touch the end of the buffer are held back until more text
+    (or ``close``) arrives, since their trailing word boundary may not be settled yet.
+    """
+
+    def __init__(self, rules: Optional[RuleSet] = None):
+        self.rules = rules or current()
+        self._buffer = ""
+        self._offset = 0
+        self._reported_end = 0
+
+    def _scan(self, final: bool) -> List[Match]:
+        found = []
+        for m in self.rules.finditer(self._buffer):
+            start, end = self._offset + m.start, self._offset + m.end
+            if start < self._reported_end:
+                continue
+            if not final and m.end == len(self._buffer) and m.rule == DIAGNOSIS_RULE:
+                break
+            found.append(Match(m.rule, m.term, start, end))
+            self._reported_end = end
+        keep = self.rules.max_match_length
+        if len(self._buffer) > keep:
+            self._offset += len(self._buffer) - keep
+            self._buffer = self._buffer[-keep:]
+        return found
+
+    def feed(self, chunk: str) -> List[Match]:
+        self._buffer += chunk
+        return self._scan(final=False)
+
+    def close(self) -> List[Match]:
+        return self._scan(final=True)
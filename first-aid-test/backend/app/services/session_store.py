@@ -0,0 +1,166 @@
+# services/session_store.py
+# Server-side conversation state keyed by ``session_id`` so /api/chat/continue
+# clients can send only the new message. Sessions live in an in-memory LRU that
+# evicts them after an idle timeout; an optional SQLite tier keeps them across
+# restarts and between workers (rows idle past SESSION_IDLE_SECONDS are purged
+# periodically). Each session carries the recent user turns the pipeline needs, so
+# no history has to be re-filtered per request. Session IDs are always generated
+# here; an ID a client made up is never accepted.
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from . import metrics
+from .cache import LRUCache
+from ..config import SESSION_MAX_ENTRIES, SESSION_IDLE_SECONDS, SESSION_DB_PATH, SESSION_MAX_MESSAGES
+
+LOGGER = logging.getLogger(__name__)
+
+# Matches conversational_agent._gather_user_context: the pipeline sees the last 3 user turns.
+CONTEXT_USER_TURNS = 3
+
+
+@dataclass
+class Session:
+    session_id: str
+    messages: List[Dict[str, str]] = field(default_factory=list)
+    recent_user: List[str] = field(default_factory=list)
+    updated: float = field(default_factory=time.time)
+    # Concurrent turns on one session must not interleave their updates.
+    lock: threading.RLock = field(default_factory=threading.RLock, repr=False, compare=False)
+
+    def context_for(self, user_input: str) -> str:
+        """Condensed context for the next turn (same text ``_gather_user_context`` builds)."""
+        with self.lock:
+            turns = self.recent_user[-(CONTEXT_USER_TURNS - 1):] + [user_input]
+        return " \n".join(turns).strip()
+
+    def add_message(self, role: str, content: str) -> None:
+        with self.lock:
+            self.messages.append({"role": role, "content": content})
+            if len(self.messages) > SESSION_MAX_MESSAGES:
+                del self.messages[: len(self.messages) - SESSION_MAX_MESSAGES]
+            if role == "user":
+                self.recent_user.append(content)
+                del self.recent_user[: -CONTEXT_USER_TURNS]
+            self.updated = time.time()
+
+    def add_turn(self, user_text: str, assistant_text: str) -> None:
+        """Append a user message and its reply as one update."""
+        with self.lock:
+            self.add_message("user", user_text)
+            self.add_message("assistant", assistant_text)
+
+    def reset(self, messages: List[Dict[str, str]]) -> None:
+        """Replace the transcript (full-history clients resend the whole conversation)."""
+        with self.lock:
+            self.messages, self.recent_user = [], []
+            for m in messages:
+                self.add_message(m["role"], m["content"])
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {"session_id": self.session_id, "messages": list(self.messages),
+                    "recent_user": list(self.recent_user), "updated": self.updated}
+
+
+class _SQLiteTier:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, data TEXT, updated REAL)"
+        )
+        self._conn.commit()
+
+    def load(self, session_id: str, idle_seconds: float) -> Optional[Session]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, updated FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or (idle_seconds and row[1] + idle_seconds <= time.time()):
+            return None
+        return Session(**json.loads(row[0]))
+
+    def save(self, session: Session) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated) VALUES (?, ?, ?)",
+                (session.session_id, json.dumps(session.to_dict()), session.updated),
+            )
+            self._conn.commit()
+
+    def purge(self, idle_seconds: float) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM sessions WHERE updated < ?", (time.time() - idle_seconds,))
+            self._conn.commit()
+            return cur.rowcount
+
+
+class SessionStore:
+    def __init__(self, max_entries: int, idle_seconds: float, db_path: str = ""):
+        self.idle_seconds = idle_seconds
+        # Sessions are re-put on every turn, so the LRU's TTL acts as an idle timeout.
+        self.memory = LRUCache(max_entries=max_entries, ttl=idle_seconds)
+        self.db: Optional[_SQLiteTier] = None
+        # Expired rows are deleted from SQLite at most this often, from ``save``.
+        self.purge_interval = min(idle_seconds, 300.0) if idle_seconds > 0 else 0.0
+        self._next_purge = time.monotonic() + self.purge_interval
+        self.purged = 0
+        if db_path:
+            try:
+                self.db = _SQLiteTier(db_path)
+            except sqlite3.Error as exc:
+                LOGGER.warning("Session database unavailable at %s: %s", db_path, exc)
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self.memory.get(session_id)
+        if session is None and self.db is not None:
+            try:
+                session = self.db.load(session_id, self.idle_seconds)
+            except (sqlite3.Error, ValueError, TypeError) as exc:
+                LOGGER.warning("Session load failed: %s", exc)
+                session = None
+            if session is not None:
+                self.memory.put(session_id, session)
+        return session
+
+    def create(self, messages: Optional[List[Dict[str, str]]] = None) -> Session:
+        """Start a session under a new random ID, seeded with ``messages``."""
+        session = Session(session_id=uuid.uuid4().hex)
+        session.reset(messages or [])
+        self.save(session)
+        return session
+
+    def save(self, session: Session) -> None:
+        self.memory.put(session.session_id, session)
+        if self.db is not None:
+            try:
+                self.db.save(session)
+            except sqlite3.Error as exc:
+                LOGGER.warning("Session save failed: %s", exc)
+            self._maybe_purge()
+
+    def _maybe_purge(self) -> None:
+        if not self.purge_interval or time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + self.purge_interval
+        try:
+            self.purged += self.db.purge(self.idle_seconds)
+        except sqlite3.Error as exc:
+            LOGGER.warning("Session purge failed: %s", exc)
+
+    def stats(self) -> Dict:
+        data = self.memory.stats()
+        data["sqlite_enabled"] = self.db is not None
+        data["purged"] = self.purged
+        return data
+
+
+STORE = SessionStore(SESSION_MAX_ENTRIES, SESSION_IDLE_SECONDS, SESSION_DB_PATH)
+metrics.register_collector("sessions", STORE.stats)
@@ -1,12 +1,19 @@
 # services/vector_db.py
-# Minimal Astra DB Vector integration via REST Data API
-import requests, json
+# Vector store facade. ``VECTOR_BACKEND`` selects Astra DB (REST Data API) or the
+# in-process index in local_vector_store.py; both expose the same
+# ``upsert_documents``/``similarity_search`` API. Query and document vectors are
+# ``vectors.Embedding`` buffers; with ASTRA_VECTOR_BINARY they travel to Astra as
+# base64 ``{"$binary": ...}`` instead of JSON number arrays.
+import json
 import logging
-from typing import List, Dict, Any
-from . import rules_guardrails as guardrails
+import threading
+from typing import List, Dict, Any, Optional
+from . import http_client
+from .vectors import Embedding
 from ..config import (
     ASTRA_DB_API_ENDPOINT, ASTRA_DB_KEYSPACE, ASTRA_DB_DATABASE,
-    ASTRA_DB_COLLECTION, ASTRA_DB_APPLICATION_TOKEN, has_astra
+    ASTRA_DB_COLLECTION, ASTRA_DB_APPLICATION_TOKEN, ASTRA_VECTOR_BINARY, has_astra,
+    VECTOR_BACKEND, LOCAL_VECTOR_PATH, LOCAL_VECTOR_SEARCH, LOCAL_VECTOR_ANN_MIN_DOCS, LOCAL_VECTOR_NPROBE,
 )
 
 BASE = f"{ASTRA_DB_API_ENDPOINT}/api/json/v1/{ASTRA_DB_KEYSPACE}" if ASTRA_DB_API_ENDPOINT and ASTRA_DB_KEYSPACE else ""
@@ -15,35 +22,163 @@ HEADERS = {
     "x-cassandra-token": ASTRA_DB_APPLICATION_TOKEN
 } if ASTRA_DB_APPLICATION_TOKEN else {"Content-Type": "application/json"}
 
-def upsert_documents(docs: List[Dict[str, Any]]):
-    # docs: [{_id?, text, embedding?, meta?}]
-    if not has_astra():
-        logging.warning("Astra configuration missing; skipping upsert")
-        return []
-    url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}"
-    resps = []
-    for d in docs:
+# Data API error code for an insert whose _id is already taken.
+DUPLICATE_ID = "DOCUMENT_ALREADY_EXISTS"
+
+
+def _wire_vector(vec) -> Any:
+    """``$vector`` value for Astra: binary when enabled, else a JSON number list."""
+    vec = Embedding.from_response(vec)
+    return vec.to_binary() if ASTRA_VECTOR_BINARY else vec.tolist()
+
+
+def _wire_document(d: Dict[str, Any]) -> Dict[str, Any]:
+    doc = {k: v for k, v in d.items() if k not in ("embedding", "$vector")}
+    vec = d.get("embedding")
+    if vec is None:
+        vec = d.get("$vector")
+    if vec is not None and len(vec):
+        doc["$vector"] = _wire_vector(vec)
+    return doc
+
+
+class AstraVectorStore:
+    """Minimal Astra DB Vector integration via REST Data API."""
+
+    def upsert_documents(self, docs: List[Dict[str, Any]]):
+        # docs: [{_id?, text, embedding?, meta?}]
+        if not has_astra():
+            logging.warning("Astra configuration missing; skipping upsert")
+            return []
+        url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}"
+        resps = []
+        for d in docs:
+            try:
+                payload = {"document": _wire_document(d)}
+                r = http_client.post(url, headers=HEADERS, content=json.dumps(payload), read_timeout=10)
+                resps.append((r.status_code, r.text))
+            except Exception as exc:
+                logging.warning("Astra upsert failed: %s", exc)
+                resps.append((0, str(exc)))
+        return resps
+
+    def insert_many(self, docs: List[Dict[str, Any]], timeout: float = 30):
+        """Write a batch with one ``insertMany`` call; raises on failure so callers can retry.
+
+        Documents whose ``_id`` already exists (a re-run without the checkpoint) are
+        replaced in place, so ingestion is idempotent.
+        """
+        if not has_astra():
+            raise RuntimeError("Astra configuration missing")
+        url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}"
+        documents = [_wire_document(d) for d in docs]
+        payload = {"insertMany": {"documents": documents, "options": {"ordered": False}}}
+        r = http_client.post(url, headers=HEADERS, content=json.dumps(payload), read_timeout=timeout)
+        r.raise_for_status()
+        data = r.json()
+        inserted = list(data.get("status", {}).get("insertedIds", []))
+        errors = data.get("errors") or []
+        if any(e.get("errorCode") != DUPLICATE_ID for e in errors):
+            raise RuntimeError(f"Astra insertMany errors: {errors[:3]}")
+        if errors:
+            written = {str(i) for i in inserted}
+            for doc in documents:
+                if "_id" in doc and str(doc["_id"]) not in written:
+                    self._replace(url, doc, timeout)
+                    inserted.append(doc["_id"])
+        return inserted
+
+    def _replace(self, url: str, doc: Dict[str, Any], timeout: float) -> None:
+        payload = {"findOneAndReplace": {"filter": {"_id": doc["_id"]}, "replacement": doc,
+                                         "options": {"upsert": True}}}
+        r = http_client.post(url, headers=HEADERS, content=json.dumps(payload), read_timeout=timeout)
+        r.raise_for_status()
+        errors = r.json().get("errors")
+        if errors:
+            raise RuntimeError(f"Astra findOneAndReplace errors: {errors[:3]}")
+
+    def similarity_search(self, embedding: Embedding, top_k: int = 4) -> List[Dict[str, Any]]:
+        if not has_astra() or not embedding:
+            return []
         try:
-            payload = {"document": d}
-            r = requests.post(url, headers=HEADERS, data=json.dumps(payload), timeout=10)
-            resps.append((r.status_code, r.text))
+            if ASTRA_VECTOR_BINARY:
+                # Data API find sorted by vector; documents come back flat, so rewrap them
+                # in the {"_id", "document", "$similarity"} shape the rest of the code reads.
+                url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}"
+                payload = {"find": {"sort": {"$vector": _wire_vector(embedding)},
+                                    "options": {"limit": top_k, "includeSimilarity": True}}}
+            else:
+                # Astra JSON API vector search shape
+                url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}/vector-search"
+                payload = {"topK": top_k, "vector": _wire_vector(embedding), "includeSimilarity": True}
+            r = http_client.post(url, headers=HEADERS, content=json.dumps(payload), read_timeout=15)
+            if r.status_code != 200:
+                return []
+            data = r.json()
+            if ASTRA_VECTOR_BINARY:
+                return [{"_id": doc.get("_id"), "document": {k: v for k, v in doc.items() if k != "$similarity"},
+                         "$similarity": doc.get("$similarity")}
+                        for doc in data.get("data", {}).get("documents", [])]
+            return data.get("documents", [])
         except Exception as exc:
-            logging.warning("Astra upsert failed: %s", exc)
-            resps.append((0, str(exc)))
-    return resps
-
-def similarity_search(embedding: List[float], top_k: int = 4) -> List[Dict[str, Any]]:
-    # Astra JSON API vector search shape
-    if not has_astra() or not embedding:
-        return []
-    try:
-        url = f"{BASE}/collections/{ASTRA_DB_COLLECTION}/vector-search"
-        payload = {"topK": top_k, "vector": embedding, "includeSimilarity": True}
-        r = requests.post(url, headers=HEADERS, data=json.dumps(payload), timeout=15)
-        if r.status_code != 200:
+            logging.warning("Astra similarity search failed: %s", exc)
             return []
-        data = r.json()
-        return data.get("documents", [])
-    except Exception as exc:
-        logging.warning("Astra similarity search failed: %s", exc)
-        return []
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_store():
+    """Return the configured vector store backend (created once per process)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                if VECTOR_BACKEND == "local":
+                    from .local_vector_store import LocalVectorStore
+                    _STORE = LocalVectorStore(
+                        LOCAL_VECTOR_PATH,
+                        search_mode=LOCAL_VECTOR_SEARCH,
+                        ann_min_docs=LOCAL_VECTOR_ANN_MIN_DOCS,
+                        nprobe=LOCAL_VECTOR_NPROBE,
+                    )
+                else:
+                    _STORE = AstraVectorStore()
+    return _STORE
+
+
+def upsert_documents(docs: List[Dict[str, Any]]):
+    return get_store().upsert_documents(docs)
+
+
+def insert_many(docs: List[Dict[str, Any]]):
+    """Bulk write used by ingestion; raises on failure."""
+    store = get_store()
+    if hasattr(store, "insert_many"):
+        return store.insert_many(docs)
+    resps = store.upsert_documents(docs)
+    failed = [text for status, text in resps if status >= 300]
+    if failed:
+        raise RuntimeError(f"{len(failed)} documents rejected: {failed[:3]}")
+    return [text for _, text in resps]
+
+
+def similarity_search(embedding: Embedding, top_k: int = 4) -> List[Dict[str, Any]]:
+    return get_store().similarity_search(embedding, top_k=top_k)
+
+
+def delete_documents(ids: List[str]) -> Optional[int]:
+    """Remove documents by id (local backend only; returns None for Astra)."""
+    store = get_store()
+    if hasattr(store, "delete_documents"):
+        return store.delete_documents(ids)
+    logging.warning("delete_documents is not supported by the %s backend", VECTOR_BACKEND)
+    return None
+
+
+def flush() -> None:
+    """Persist buffered index state after a bulk load (local backend; no-op for Astra)."""
+    store = get_store()
+    if hasattr(store, "flush"):
+        store.flush()
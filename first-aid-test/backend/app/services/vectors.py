@@ -0,0 +1,126 @@
+# services/vectors.py
+# Compact embedding type. A vector is one contiguous numpy buffer instead of
+# a list of boxed Python floats: 6 KB for 1536 float32 dimensions instead of
+# ~50 KB of list and float objects. It can be quantized to float16 or to
+# int8 plus a scale for caches. It decodes straight from the provider's
+# base64 payload (``encoding_format: "base64"``) with no intermediate float
+# list. It encodes to Astra's ``{"$binary": ...}`` form, so no JSON number
+# array is built for a query. ``array()`` and ``np.asarray(embedding)`` give
+# a zero-copy float32 view for similarity math.
+import base64
+from typing import Any, List, Optional
+
+import numpy as np
+
+QUANTIZATIONS = ("none", "float16", "int8")
+
+
+def _readonly(arr: np.ndarray) -> np.ndarray:
+    arr.flags.writeable = False
+    return arr
+
+
+class Embedding:
+    """One embedding vector backed by a float32, float16 or int8 (with ``scale``) buffer.
+
+    Empty embeddings are falsy, so ``if not vec`` checks written for lists still work.
+    """
+
+    __slots__ = ("data", "scale")
+
+    def __init__(self, data: np.ndarray, scale: float = 1.0):
+        self.data = data
+        self.scale = scale
+
+    # -- constructors ------------------------------------------------------
+    @classmethod
+    def from_floats(cls, values) -> "Embedding":
+        return cls(_readonly(np.array(values, dtype=np.float32).reshape(-1)))
+
+    @classmethod
+    def from_base64(cls, text: str, byteorder: str = "<") -> "Embedding":
+        """Decode packed float32 (little-endian from OpenAI, big-endian for Astra ``$binary``)."""
+        data = np.frombuffer(base64.b64decode(text), dtype=np.dtype(byteorder + "f4"))
+        if not data.dtype.isnative:
+            data = data.astype(np.float32)
+        return cls(_readonly(data))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes, dtype: str = "float32", scale: float = 1.0) -> "Embedding":
+        """View ``blob`` (e.g. a SQLite BLOB) without copying it."""
+        return cls(np.frombuffer(blob, dtype=dtype), scale)
+
+    @classmethod
+    def from_response(cls, value: Any) -> "Embedding":
+        """Whatever an embeddings API put in ``embedding``: a base64 string or a float list."""
+        if isinstance(value, Embedding):
+            return value
+        if isinstance(value, str):
+            return cls.from_base64(value) if value else EMPTY
+        if isinstance(value, dict) and "$binary" in value:
+            return cls.from_base64(value["$binary"], ">")
+        return cls.from_floats(value) if value is not None and len(value) else EMPTY
+
+    # -- access ------------------------------------------------------------
+    @property
+    def dtype(self) -> str:
+        return self.data.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __bool__(self) -> bool:
+        return self.data.shape[0] > 0
+
+    def __repr__(self) -> str:
+        return f"Embedding(dims={len(self)}, dtype={self.dtype})"
+
+    def array(self) -> np.ndarray:
+        """The vector as float32: the buffer itself when unquantized, else dequantized."""
+        if self.data.dtype == np.float32:
+            return self.data
+        if self.data.dtype == np.int8:
+            return self.data.astype(np.float32) * np.float32(self.scale)
+        return self.data.astype(np.float32)
+
+    def __array__(self, dtype=None, copy=None):
+        arr = self.array()
+        return arr if dtype is None or arr.dtype == dtype else arr.astype(dtype)
+
+    def tolist(self) -> List[float]:
+        return self.array().tolist()
+
+    # -- encodings ---------------------------------------------------------
+    def quantize(self, mode: str) -> "Embedding":
+        """A smaller copy for caching: ``float16`` (2 bytes/dim) or ``int8`` (1 byte/dim + scale)."""
+        if mode == "float16":
+            return Embedding(_readonly(self.array().astype(np.float16)))
+        if mode == "int8":
+            arr = self.array()
+            peak = float(np.abs(arr).max()) if arr.size else 0.0
+            scale = peak / 127.0 or 1.0
+            return Embedding(_readonly(np.round(arr / scale).astype(np.int8)), scale)
+        return self
+
+    def to_bytes(self) -> bytes:
+        """Packed native float32 (the embedding cache's on-disk format)."""
+        return self.array().tobytes()
+
+    def to_base64(self, byteorder: str = "<") -> str:
+        return base64.b64encode(self.array().astype(byteorder + "f4", copy=False).tobytes()).decode("ascii")
+
+    def to_binary(self) -> dict:
+        """Astra Data API binary vector: base64 of big-endian float32."""
+        return {"$binary": self.to_base64(">")}
+
+
+EMPTY = Embedding(_readonly(np.empty(0, dtype=np.float32)))
+
+
+def as_embedding(value: Optional[Any]) -> Embedding:
+    """Accept an ``Embedding``, a float list or a provider payload; None gives ``EMPTY``."""
+    return Embedding.from_response(value) if value is not None else EMPTY
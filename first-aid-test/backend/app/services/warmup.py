@@ -0,0 +1,93 @@
+# services/warmup.py
+# Startup warm-up run from the app lifespan. The work the first requests would
+# otherwise pay for (compiling indexes, loading data files, starting the tool
+# server, refilling caches) is done up front as named steps that run
+# concurrently. Pooled connections are opened by the health prober's first
+# round, which runs in the background rather than as a step. Blocking steps go to worker threads. The
+# duration and outcome of each step are recorded for /api/health/details and
+# /api/metrics, and /api/health/ready stays 503 until every step has finished.
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+Step = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+class WarmUp:
+    def __init__(self):
+        self.steps: Dict[str, Dict] = {}
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return bool(self.finished_at)
+
+    async def _step(self, name: str, fn: Step) -> None:
+        start = time.perf_counter()
+        state = {"ok": False, "ms": None, "detail": None, "error": None}
+        self.steps[name] = state
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                detail = await fn()
+            else:
+                detail = await asyncio.to_thread(fn)
+            state.update(ok=True, detail=detail if isinstance(detail, (int, float, str)) else None)
+        except Exception as exc:  # a failed step leaves that component to load lazily
+            state["error"] = str(exc)[:200]
+            LOGGER.warning("Warm-up step %s failed: %s", name, exc)
+        state["ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    async def run(self, steps: Dict[str, Step]) -> None:
+        self.steps = {}
+        self.started_at, self.finished_at = time.time(), 0.0
+        begin = time.perf_counter()
+        await asyncio.gather(*(self._step(name, fn) for name, fn in steps.items()))
+        self.finished_at = time.time()
+        LOGGER.info("Warm-up finished in %.0f ms (%s)", (time.perf_counter() - begin) * 1000,
+                    ", ".join(f"{name} {s['ms']:.0f} ms" + ("" if s["ok"] else " FAILED")
+                              for name, s in self.steps.items()))
+
+    async def start(self, steps: Dict[str, Step], timeout: float) -> bool:
+        """Run ``steps``, waiting at most ``timeout`` seconds; True when warm-up completed.
+
+        On timeout the remaining steps keep running in the background.
+        """
+        self._task = asyncio.get_running_loop().create_task(self.run(steps), name="warmup")
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            LOGGER.warning("Warm-up still running after %.0f s; serving while it finishes", timeout)
+        return self.done
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def snapshot(self) -> Dict:
+        total = round((self.finished_at - self.started_at) * 1000, 1) if self.done else None
+        return {"done": self.done, "total_ms": total, "steps": {name: dict(s) for name, s in self.steps.items()}}
+
+    def stats(self) -> Dict:
+        data = {"done": 1 if self.done else 0}
+        if self.done:
+            data["total_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        for name, state in self.steps.items():
+            if state["ms"] is not None:
+                data[f"{name}_ms"] = state["ms"]
+        return data
+
+
+WARMUP = WarmUp()
+metrics.register_collector("warmup", WARMUP.stats)
@@ -0,0 +1,107 @@
+# benchmarks/bench_coldstart.py
+# First-request latency after a restart compared with steady state. Each
+# scenario runs in a fresh Python process against the stub upstreams from
+# benchmarks/stubs.py (config and lazy indexes are per process):
+#   - lazy:     WARMUP_ENABLED=false, no cache snapshot (the old startup)
+#   - warm:     warm-up on, empty snapshot directory
+#   - snapshot: warm-up on, restoring the caches a previous run saved at shutdown
+# Reports the startup (lifespan) time, each warm-up step, the first /api/chat
+# latency and the median of the requests that follow it. The stubs speak plain
+# HTTP, so the TLS handshakes that the first probe round saves in production are not counted.
+#
+#   cd backend && python -m benchmarks.bench_coldstart [--json] [--requests 8]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_load import MESSAGES
+from benchmarks.stubs import StubServer, add_profile_args, profiles_from_args
+
+SCENARIOS = ("lazy", "warm", "snapshot")
+
+
+async def _child(requests: int) -> dict:
+    import httpx
+
+    start = time.perf_counter()
+    from app.main import app
+    from app.services.warmup import WARMUP
+
+    import_ms = (time.perf_counter() - start) * 1000
+    latencies = []
+    async with app.router.lifespan_context(app):
+        startup_ms = (time.perf_counter() - start) * 1000 - import_ms
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for i in range(requests):
+                begin = time.perf_counter()
+                resp = await client.post("/api/chat", json={"message": MESSAGES[i % len(MESSAGES)]})
+                resp.raise_for_status()
+                latencies.append((time.perf_counter() - begin) * 1000)
+    return {
+        "import_ms": round(import_ms, 1),
+        "startup_ms": round(startup_ms, 1),
+        "warmup_steps_ms": {name: s["ms"] for name, s in WARMUP.steps.items()},
+        "first_request_ms": round(latencies[0], 1),
+        "steady_p50_ms": round(statistics.median(latencies[1:]), 1) if len(latencies) > 1 else None,
+    }
+
+
+def _run_scenario(env: dict, requests: int) -> dict:
+    proc = subprocess.run([sys.executable, "-m", "benchmarks.bench_coldstart", "--child", "--requests", str(requests)],
+                          env=env, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(args) -> list:
+    server = StubServer(profiles=profiles_from_args(args)).start()
+    snapshot_dir = tempfile.mkdtemp(prefix="coldstart-")
+    base = dict(os.environ, **server.env(), EMBED_CACHE_PATH="", SESSION_DB_PATH="", MCP_SERVER_COMMAND="")
+    scenarios = {
+        "lazy": {"WARMUP_ENABLED": "false", "CACHE_SNAPSHOT_DIR": ""},
+        "warm": {"WARMUP_ENABLED": "true", "CACHE_SNAPSHOT_DIR": tempfile.mkdtemp(prefix="coldstart-empty-")},
+        "snapshot": {"WARMUP_ENABLED": "true", "CACHE_SNAPSHOT_DIR": snapshot_dir},
+    }
+    rows = []
+    try:
+        _run_scenario(dict(base, **scenarios["snapshot"]), args.requests)  # seeds the snapshot
+        for name in SCENARIOS:
+            rows.append(dict(_run_scenario(dict(base, **scenarios[name]), args.requests), scenario=name))
+    finally:
+        server.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="First-request latency after a restart vs steady state.")
+    parser.add_argument("--requests", type=int, default=8, help="requests per scenario (the first is the cold one)")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    add_profile_args(parser)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    if args.child:
+        print(json.dumps(asyncio.run(_child(max(1, args.requests)))))
+        return
+    rows = run(args)
+    if args.json:
+        print(json.dumps({"benchmark": "coldstart", "results": rows}))
+        return
+    print(f"{'scenario':>9} {'import ms':>10} {'startup ms':>11} {'first ms':>9} {'steady p50':>11}")
+    for r in rows:
+        print(f"{r['scenario']:>9} {r['import_ms']:>10} {r['startup_ms']:>11} {r['first_request_ms']:>9} "
+              f"{r['steady_p50_ms']:>11}")
+    for r in rows:
+        steps = ", ".join(f"{name} {ms}" for name, ms in r["warmup_steps_ms"].items())
+        print(f"\n{r['scenario']} warm-up steps (ms): {steps}")
+
+
+if __name__ == "__main__":
+    main()
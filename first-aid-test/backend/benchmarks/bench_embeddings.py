@@ -0,0 +1,94 @@
+# benchmarks/bench_embeddings.py
+# Memory and serialization cost of one embedding: a list of Python floats
+# (what the app used to pass around) compared with the compact ``Embedding``
+# buffer. Reports bytes per cached vector, the time to decode a provider
+# response (JSON floats vs base64), the time to encode a vector-search
+# payload (JSON number array vs Astra $binary), and the cosine error of
+# float16/int8 quantization.
+#
+#   cd backend && python -m benchmarks.bench_embeddings [--json] [--dim 1536]
+import argparse
+import base64
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.services.vectors import Embedding
+
+
+def list_bytes(values) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def _us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(dim: int = 1536, repeat: int = 200):
+    rng = random.Random(7)
+    floats = [rng.uniform(-0.1, 0.1) for _ in range(dim)]
+    vec = Embedding.from_floats(floats)
+    as_json = json.dumps({"data": [{"index": 0, "embedding": floats}]})
+    as_b64 = json.dumps({"data": [{"index": 0, "embedding": vec.to_base64()}]})
+    reference = vec.array() / np.linalg.norm(vec.array())
+
+    def cosine_error(mode: str) -> float:
+        approx = vec.quantize(mode).array()
+        return float(1.0 - reference @ (approx / np.linalg.norm(approx)))
+
+    return {
+        "dim": dim,
+        "memory_bytes": {
+            "float_list": list_bytes(floats),
+            "float32": vec.nbytes,
+            "float16": vec.quantize("float16").nbytes,
+            "int8": vec.quantize("int8").nbytes,
+        },
+        "response_bytes": {"json_floats": len(as_json), "base64": len(as_b64)},
+        "decode_us": {
+            "json_floats": round(_us(lambda: json.loads(as_json)["data"][0]["embedding"], repeat), 1),
+            "base64": round(_us(lambda: Embedding.from_response(json.loads(as_b64)["data"][0]["embedding"]),
+                                repeat), 1),
+        },
+        "query_payload": {
+            "json_floats_bytes": len(json.dumps({"topK": 4, "vector": floats})),
+            "binary_bytes": len(json.dumps({"find": {"sort": {"$vector": vec.to_binary()}}})),
+            "json_floats_us": round(_us(lambda: json.dumps({"topK": 4, "vector": floats}), repeat), 1),
+            "binary_us": round(_us(lambda: json.dumps({"find": {"sort": {"$vector": vec.to_binary()}}}), repeat), 1),
+        },
+        "cosine_error": {"float16": cosine_error("float16"), "int8": cosine_error("int8")},
+        "roundtrip_exact": bool(np.array_equal(
+            Embedding.from_response(vec.to_binary()).array(),
+            np.frombuffer(base64.b64decode(vec.to_base64()), dtype="<f4"))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    report = run(args.dim, args.repeat)
+    if args.json:
+        print(json.dumps({"benchmark": "embeddings", "results": report}))
+        return
+    mem, dec, query = report["memory_bytes"], report["decode_us"], report["query_payload"]
+    print(f"dims {report['dim']}")
+    print(f"memory per vector   list {mem['float_list']:>7} B   float32 {mem['float32']:>6} B   "
+          f"float16 {mem['float16']:>6} B   int8 {mem['int8']:>6} B")
+    print(f"response decode     json floats {dec['json_floats']:>8} us   base64 {dec['base64']:>8} us   "
+          f"({report['response_bytes']['json_floats']} vs {report['response_bytes']['base64']} B)")
+    print(f"query payload       json floats {query['json_floats_us']:>8} us   $binary {query['binary_us']:>7} us   "
+          f"({query['json_floats_bytes']} vs {query['binary_bytes']} B)")
+    print(f"cosine error        float16 {report['cosine_error']['float16']:.2e}   int8 {report['cosine_error']['int8']:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/bench_fuzzy.py
+# Clarification detection: the original per-token difflib scan vs the
+# symmetric-delete spelling index, over long messages and growing vocabularies.
+#
+#   cd backend && python -m benchmarks.bench_fuzzy [--json]
+import argparse
+import json
+import random
+import re
+import string
+import time
+from difflib import get_close_matches
+
+from app.agents.conversational_agent import KNOWN_EMERGENCY_TERMS
+from app.services.fuzzy_index import SpellIndex
+
+VOCAB_SIZES = [len(KNOWN_EMERGENCY_TERMS), 1000, 5000]
+MESSAGE_WORDS = [20, 200]
+
+
+def difflib_scan(text: str, vocab) -> list:
+    found = []
+    for token in re.findall(r"[a-zA-Z']+", text.lower()):
+        if token in vocab or len(token) < 4:
+            continue
+        match = get_close_matches(token, vocab, n=1, cutoff=0.78)
+        if match:
+            found.append((token, match[0]))
+    return found
+
+
+def index_scan(text: str, index: SpellIndex) -> list:
+    found = []
+    for token in re.findall(r"[a-zA-Z']+", text.lower()):
+        if token in index or len(token) < 4:
+            continue
+        match = index.lookup(token, max_distance=1 if len(token) <= 5 else 2, limit=1)
+        if match:
+            found.append((token, match[0][0]))
+    return found
+
+
+def make_vocab(n: int, rng: random.Random):
+    vocab = set(KNOWN_EMERGENCY_TERMS)
+    while len(vocab) < n:
+        vocab.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 12))))
+    return vocab
+
+
+def make_message(words: int, vocab, rng: random.Random) -> str:
+    filler = ["my", "hand", "really", "hurts", "after", "falling", "down", "the", "stairs", "today",
+              "and", "there", "is", "some", "swelling", "around", "wrist", "please", "help", "quickly"]
+    terms = sorted(vocab)
+    out = []
+    for i in range(words):
+        if i % 10 == 0:
+            term = rng.choice(terms)
+            pos = rng.randrange(len(term))
+            out.append(term[:pos] + term[pos + 1:])  # typo: one deleted letter
+        else:
+            out.append(rng.choice(filler))
+    return " ".join(out)
+
+
+def _ms(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat: int = 5):
+    rng = random.Random(11)
+    rows = []
+    for size in VOCAB_SIZES:
+        vocab = make_vocab(size, rng)
+        start = time.perf_counter()
+        index = SpellIndex(sorted(vocab))
+        build_ms = (time.perf_counter() - start) * 1000
+        for words in MESSAGE_WORDS:
+            text = make_message(words, vocab, rng)
+            rows.append({
+                "vocabulary": size,
+                "message_words": words,
+                "index_build_ms": round(build_ms, 1),
+                "difflib_ms": round(_ms(lambda: difflib_scan(text, vocab), repeat), 3),
+                "index_ms": round(_ms(lambda: index_scan(text, index), repeat), 3),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    rows = run(args.repeat)
+    if args.json:
+        print(json.dumps({"benchmark": "fuzzy_clarification", "results": rows}))
+        return
+    print(f"{'vocab':>6} {'words':>6} {'build ms':>9} {'difflib ms':>11} {'index ms':>9}")
+    for r in rows:
+        print(f"{r['vocabulary']:>6} {r['message_words']:>6} {r['index_build_ms']:>9} {r['difflib_ms']:>11} {r['index_ms']:>9}")
+
+
+if __name__ == "__main__":
+    main()
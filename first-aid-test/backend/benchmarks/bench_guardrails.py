@@ -0,0 +1,82 @@
+# benchmarks/bench_guardrails.py
+# Cost of a guardrail scan per KB of text as the deny list grows.
+# Compares the original per-term substring loop with the compiled RuleSet.
+#
+#   cd backend && python -m benchmarks.bench_guardrails [--json]
+import argparse
+import json
+import random
+import re
+import string
+import time
+
+from app.services.rules_guardrails import RuleSet
+
+SIZES = [5, 100, 1000, 5000]
+TEXT_KB = 4
+
+
+def legacy_violates(text: str, denylist) -> bool:
+    t = text.lower()
+    if any(term.lower() in t for term in denylist):
+        return True
+    if re.search("diagnose|prescribe|dose\\b", t, re.I):
+        return True
+    return False
+
+
+def make_terms(n: int, rng: random.Random):
+    words = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))) for _ in range(n * 2)]
+    return [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(n)]
+
+
+def make_text(kb: int, rng: random.Random) -> str:
+    vocab = ["apply", "pressure", "to", "the", "wound", "cool", "water", "for", "ten", "minutes",
+             "call", "emergency", "services", "if", "bleeding", "continues", "rest", "ankle"]
+    out = []
+    while sum(len(w) + 1 for w in out) < kb * 1024:
+        out.append(rng.choice(vocab))
+    return " ".join(out)
+
+
+def _per_kb_us(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat / (len(text) / 1024) * 1e6
+
+
+def run(repeat: int = 20):
+    rng = random.Random(7)
+    text = make_text(TEXT_KB, rng)  # clean text: the worst case, every term is tried
+    rows = []
+    for n in SIZES:
+        terms = make_terms(n, rng)
+        start = time.perf_counter()
+        rules = RuleSet({"deny_terms": terms})
+        compile_ms = (time.perf_counter() - start) * 1000
+        rows.append({
+            "deny_terms": n,
+            "compile_ms": round(compile_ms, 2),
+            "legacy_us_per_kb": round(_per_kb_us(lambda t: legacy_violates(t, terms), text, repeat), 2),
+            "compiled_us_per_kb": round(_per_kb_us(rules.search, text, repeat), 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rows = run(args.repeat)
+    if args.json:
+        print(json.dumps({"benchmark": "guardrails", "text_kb": TEXT_KB, "results": rows}))
+        return
+    print(f"{'terms':>6} {'compile ms':>11} {'legacy us/KB':>13} {'compiled us/KB':>15}")
+    for r in rows:
+        print(f"{r['deny_terms']:>6} {r['compile_ms']:>11} {r['legacy_us_per_kb']:>13} {r['compiled_us_per_kb']:>15}")
+
+
+if __name__ == "__main__":
+    main()
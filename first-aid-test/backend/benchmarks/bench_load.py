@@ -0,0 +1,182 @@
+# benchmarks/bench_load.py
+# Offline load test for /api/chat and /api/chat/continue. Starts the stub
+# upstreams from benchmarks/stubs.py, points the app's provider and Astra URLs at
+# them through the environment, then drives the FastAPI app in-process at
+# increasing concurrency. Reports p50/p95/p99 latency, requests per second,
+# error/fallback counts and a per-stage breakdown (from ?timings=true).
+#
+#   cd backend && python -m benchmarks.bench_load --concurrency 1,8,32 --requests 64 [--json] [--output load.json]
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.stubs import StubServer, add_profile_args, profiles_from_args
+
+MESSAGES = [
+    "I burned my hand on the stove and it is blistering",
+    "my friend cut his arm on glass and it keeps bleeding",
+    "a child is choking on a grape and can't speak",
+    "I think I broke my wrist falling off my bike",
+    "my son got stung by a bee and his lips are swelling",
+    "she hit her head on the door frame and feels dizzy",
+    "hot coffee spilled on my leg, the skin is red",
+    "deep cut on my finger from a kitchen knife",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {f"p{p}": round(percentile(values, p), 2) for p in (50, 95, 99)}
+
+
+def _request(endpoint: str, i: int):
+    message = MESSAGES[i % len(MESSAGES)]
+    if endpoint == "chat":
+        return "/api/chat?timings=true", {"message": message}
+    history = [
+        {"role": "user", "content": "hello, I need some help"},
+        {"role": "assistant", "content": "I'm here to help. What happened?"},
+        {"role": "user", "content": message},
+    ]
+    return "/api/chat/continue?timings=true", {"messages": history}
+
+
+async def run_level(client, endpoint: str, concurrency: int, total: int) -> Dict:
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = defaultdict(list)
+    counts = {"errors": 0, "fallbacks": 0}
+    next_index = iter(range(total))
+
+    async def worker():
+        for i in next_index:
+            path, body = _request(endpoint, i)
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json=body)
+                data = resp.json()
+            except Exception:
+                counts["errors"] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            result = data.get("result") or {}
+            if resp.status_code != 200 or not data.get("ok") or result.get("error"):
+                counts["errors"] += 1
+            if (result.get("instructions") or {}).get("fallback"):
+                counts["fallbacks"] += 1
+            per_stage: Dict[str, float] = defaultdict(float)
+            for entry in (result.get("timings") or {}).get("stages", []):
+                per_stage[entry["stage"]] += entry["ms"]
+            for stage, ms in per_stage.items():
+                stages[stage].append(ms)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": _summary(latencies),
+        "errors": counts["errors"],
+        "fallbacks": counts["fallbacks"],
+        "stages_ms": {stage: dict(_summary(values), calls=len(values)) for stage, values in sorted(stages.items())},
+    }
+
+
+async def run(app, endpoints: List[str], levels: List[int], total: int) -> List[Dict]:
+    import httpx
+
+    rows = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for endpoint in endpoints:
+                await run_level(client, endpoint, 1, min(4, total))  # warm pools and lazy indexes
+                for level in levels:
+                    rows.append(await run_level(client, endpoint, level, total))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test against local upstream stubs.")
+    parser.add_argument("--endpoints", default="chat,continue", help="comma-separated: chat, continue")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--with-caches", action="store_true", help="keep the embedding/response caches on")
+    parser.add_argument("--no-local-triage", action="store_true", help="send every classification to the LLM stub")
+    parser.add_argument("--fused", action="store_true", help="triage and steps from one structured-output call")
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the app's warnings (injected errors are noisy)")
+    add_profile_args(parser)
+    args = parser.parse_args()
+    if not args.verbose:
+        logging.disable(logging.WARNING)
+
+    server = StubServer(profiles=profiles_from_args(args)).start()
+    # Config is read at import time, so the overrides must be in place before the app loads.
+    os.environ.update(server.env())
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ["EMBED_CACHE_PATH"] = ""
+    os.environ["SESSION_DB_PATH"] = ""
+    if not args.with_caches:
+        os.environ["EMBED_CACHE_MAX_ENTRIES"] = "0"
+        os.environ["RESPONSE_CACHE_MAX_ENTRIES"] = "0"
+    if args.no_local_triage:
+        os.environ["TRIAGE_LOCAL_ENABLED"] = "false"
+    if args.fused:
+        os.environ["LLM_FUSED_ENABLED"] = "true"
+    from app.main import app
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    try:
+        rows = asyncio.run(run(app, endpoints, levels, args.requests))
+    finally:
+        server.stop()
+
+    report = {
+        "benchmark": "load",
+        "config": {
+            "chat_latency_ms": args.chat_latency_ms, "embed_latency_ms": args.embed_latency_ms,
+            "astra_latency_ms": args.astra_latency_ms, "jitter": args.jitter, "error_rate": args.error_rate,
+            "caches": args.with_caches, "local_triage": not args.no_local_triage, "fused": args.fused,
+        },
+        "upstream_calls": server.counts,
+        "results": rows,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{'endpoint':>9} {'conc':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'fallback':>9}")
+    for r in rows:
+        lat = r["latency_ms"]
+        print(f"{r['endpoint']:>9} {r['concurrency']:>5} {r['rps']:>8} {lat['p50']:>8} {lat['p95']:>8} "
+              f"{lat['p99']:>8} {r['errors']:>7} {r['fallbacks']:>9}")
+    for r in rows:
+        print(f"\n{r['endpoint']} @ {r['concurrency']}: per-stage ms (p50 / p95)")
+        for stage, s in r["stages_ms"].items():
+            print(f"  {stage:<20} {s['p50']:>8} {s['p95']:>8}")
+
+
+if __name__ == "__main__":
+    main()
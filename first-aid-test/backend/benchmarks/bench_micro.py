@@ -0,0 +1,95 @@
+# benchmarks/bench_micro.py
+# Micro-benchmarks for the per-request CPU work that runs on every chat turn:
+# composing the assistant message, the guardrail scan and clarification
+# detection. No network is involved.
+#
+#   cd backend && python -m benchmarks.bench_micro [--json] [--output micro.json]
+import argparse
+import json
+import statistics
+import timeit
+
+from app.agents.conversational_agent import _detect_clarification_prompt
+from app.main import ChatMessage, _compose_assistant_message
+from app.services.rules_guardrails import violates
+
+STEPS = (
+    "1) Cool the burned area under cool running water for at least 10 minutes.\n"
+    "2) Remove tight items like rings or watches before swelling starts.\n"
+    "3) Cover the burn loosely with sterile, non-fluffy dressing.\n"
+    "4) Seek medical help if the burn is larger than the palm or on the face."
+)
+
+RESULT = {
+    "security": {"sanitized": "I burned my hand on the stove", "redactions": []},
+    "triage": {"category": "burn", "severity": "high", "keywords": ["burned"]},
+    "tools": {"emergency_numbers": {"country": "LK", "numbers": {"AMBULANCE": "1990"}},
+              "maps": {"query": "nearest hospital"}},
+    "instructions": {"steps": STEPS, "context_docs": []},
+    "verification": {"passed": True, "policy_flags": []},
+    "risk": {"risk": "high", "confidence": 0.8},
+    "conversation": {"needs_clarification": False, "clarification_prompt": None},
+}
+
+HISTORY = [
+    ChatMessage(role="user", content="hello"),
+    ChatMessage(role="assistant", content="I'm here to help. What happened?"),
+    ChatMessage(role="user", content="I burned my hand on the stove"),
+]
+
+SHORT = "I burned my hand on the stove and it is blistering badly"
+LONG = " ".join([SHORT, "there is some swelling around the wrist and the pain is getting worse"] * 20)
+TYPO = "my frend has a sevre alergic reacton and his lips are sweling"
+
+CASES = [
+    ("compose_assistant_message", lambda: _compose_assistant_message(RESULT, SHORT, HISTORY)),
+    ("violates_short", lambda: violates(SHORT)),
+    ("violates_long", lambda: violates(LONG)),
+    ("violates_steps", lambda: violates(STEPS)),
+    ("detect_clarification_clean", lambda: _detect_clarification_prompt(SHORT)),
+    ("detect_clarification_typos", lambda: _detect_clarification_prompt(TYPO)),
+    ("detect_clarification_long", lambda: _detect_clarification_prompt(LONG)),
+]
+
+
+def measure(fn, rounds: int):
+    """Return per-call microseconds for each of ``rounds`` timing rounds (~0.2s each)."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return [t / number * 1e6 for t in timer.repeat(repeat=rounds, number=number)]
+
+
+def run(rounds: int = 5):
+    rows = []
+    for name, fn in CASES:
+        fn()  # warm lazy indexes and regex caches
+        samples = measure(fn, rounds)
+        rows.append({
+            "case": name,
+            "best_us": round(min(samples), 3),
+            "median_us": round(statistics.median(samples), 3),
+            "ops_per_sec": round(1e6 / min(samples), 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    report = {"benchmark": "micro", "results": run(args.rounds)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{'case':<30} {'best us':>10} {'median us':>10} {'ops/s':>12}")
+    for r in report["results"]:
+        print(f"{r['case']:<30} {r['best_us']:>10} {r['median_us']:>10} {r['ops_per_sec']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_redaction.py
+# Cost of PII redaction per KB as inputs grow from 1 to 64 KB. A flat us/KB
+# column means the cost is linear. Compares the single-pass Redactor with
+# running each detector as its own re.sub pass. Also times adversarial inputs
+# (long digit runs, long words with no "@") that would make an unanchored
+# pattern backtrack.
+#
+#   cd backend && python -m benchmarks.bench_redaction [--json]
+import argparse
+import json
+import random
+import re
+import time
+
+from app.services.redaction import _DETECTORS, _WHITESPACE, Redactor
+
+SIZES_KB = [1, 4, 16, 64]
+
+
+def make_text(kb: int, rng: random.Random) -> str:
+    """Chat-like text with a phone, email, address, ID or name every ~200 bytes."""
+    vocab = ["my", "son", "fell", "and", "hit", "his", "head", "there", "is", "bleeding", "from", "the",
+             "cut", "he", "feels", "dizzy", "please", "help", "we", "are", "at", "home", "now"]
+    pii = [lambda: f"call me on 07{rng.randint(10000000, 99999999)}",
+           lambda: f"email {rng.choice(['amal', 'nimali', 'sam'])}{rng.randint(1, 99)}@example.lk",
+           lambda: f"I live at {rng.randint(1, 400)} Galle Road, Colombo {rng.randint(1, 15)}.",
+           lambda: f"NIC {rng.randint(100000000, 999999999)}V",
+           lambda: f"my name is {rng.choice(['Amal', 'Nimali', 'Sam'])} {rng.choice(['Perera', 'Silva'])}"]
+    out, size = [], 0
+    while size < kb * 1024:
+        piece = rng.choice(pii)() if rng.random() < 0.04 else rng.choice(vocab)
+        piece += "\n" if rng.random() < 0.05 else " "
+        out.append(piece)
+        size += len(piece)
+    return "".join(out)
+
+
+def adversarial(kb: int) -> str:
+    return (("9" * 200 + " ") + ("a" * 300 + ".") + "+1 (") * (kb * 1024 // 505 + 1)
+
+
+class MultiPass:
+    """One re.sub per detector: what a pattern-per-kind redactor costs."""
+
+    def __init__(self):
+        self.passes = [re.compile(pattern) for _, pattern in _DETECTORS]
+        self.whitespace = re.compile(_WHITESPACE)
+
+    def redact(self, text: str) -> str:
+        text = self.whitespace.sub(" ", text)
+        for pattern in self.passes:
+            text = pattern.sub(lambda m: "[X]", text)
+        return text.strip()
+
+
+def _per_kb_us(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat / (len(text) / 1024) * 1e6
+
+
+def run(repeat: int = 20):
+    rng = random.Random(7)
+    single, multi = Redactor(), MultiPass()
+    rows = []
+    for kb in SIZES_KB:
+        text = make_text(kb, rng)
+        n = max(1, repeat * 4 // kb)
+        rows.append({
+            "kb": kb,
+            "redactions": len(single.redact(text).spans),
+            "single_pass_us_per_kb": round(_per_kb_us(single.redact, text, n), 1),
+            "multi_pass_us_per_kb": round(_per_kb_us(multi.redact, text, n), 1),
+            "adversarial_us_per_kb": round(_per_kb_us(single.redact, adversarial(kb), n), 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    rows = run(args.repeat)
+    if args.json:
+        print(json.dumps({"benchmark": "redaction", "results": rows}))
+        return
+    print(f"{'KB':>4} {'masked':>7} {'single us/KB':>13} {'multi us/KB':>12} {'adversarial us/KB':>18}")
+    for r in rows:
+        print(f"{r['kb']:>4} {r['redactions']:>7} {r['single_pass_us_per_kb']:>13} "
+              f"{r['multi_pass_us_per_kb']:>12} {r['adversarial_us_per_kb']:>18}")
+
+
+if __name__ == "__main__":
+    main()
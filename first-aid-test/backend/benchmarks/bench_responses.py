@@ -0,0 +1,90 @@
+# benchmarks/bench_responses.py
+# /api/chat/continue response size and serialization time against
+# conversation length. It compares three encodings:
+#   - the full response through the old path (jsonable_encoder + stdlib json)
+#   - the same body through json_codec
+#   - the lean view (new message + summary)
+# Also reports the gzipped size of the full body. "total" columns sum every
+# turn of the conversation: the full response grows quadratically with
+# turns, the lean one linearly.
+#
+#   cd backend && python -m benchmarks.bench_responses [--json]
+import argparse
+import gzip
+import json
+import os
+import time
+
+os.environ.setdefault("MCP_SERVER_COMMAND", "")  # tools in-process; no server needed for a sample result
+
+from fastapi.encoders import jsonable_encoder
+
+from app.agents import conversational_agent
+from app.main import _compose_assistant_message, _lean_result
+from app.services import json_codec
+
+TURNS = [1, 5, 10, 25, 50]
+QUESTIONS = ["I burned my hand on the stove", "it is blistering now", "should I pop the blister",
+             "the pain is getting worse", "my friend cut his finger while cooking"]
+
+
+def legacy_dumps(body) -> bytes:
+    return json.dumps(jsonable_encoder(body), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(repeat: int = 50):
+    result = conversational_agent.handle_message(QUESTIONS[0])
+    reply = _compose_assistant_message(result, QUESTIONS[0], [])
+    rows = []
+    for turns in TURNS:
+        totals = {"full": 0, "lean": 0}
+        history = []
+        for turn in range(turns):
+            history.append({"role": "user", "content": QUESTIONS[turn % len(QUESTIONS)]})
+            full = {"ok": True, "messages": history + [{"role": "assistant", "content": reply}], "result": result}
+            lean = {"ok": True, "message": {"role": "assistant", "content": reply}, "result": _lean_result(result, set())}
+            totals["full"] += len(json_codec.dumps(full))
+            totals["lean"] += len(json_codec.dumps(lean))
+            history.append({"role": "assistant", "content": reply})
+        full_bytes = json_codec.dumps(full)
+        rows.append({
+            "turns": turns,
+            "full_bytes": len(full_bytes),
+            "full_gzip_bytes": len(gzip.compress(full_bytes, 9)),
+            "lean_bytes": len(json_codec.dumps(lean)),
+            "full_legacy_us": round(_us(lambda: legacy_dumps(full), repeat), 1),
+            "full_fast_us": round(_us(lambda: json_codec.dumps(full), repeat), 1),
+            "lean_fast_us": round(_us(lambda: json_codec.dumps(lean), repeat), 1),
+            "total_full_kb": round(totals["full"] / 1024, 1),
+            "total_lean_kb": round(totals["lean"] / 1024, 1),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--json", action="store_true", help="emit machine-readable output")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    rows = run(args.repeat)
+    if args.json:
+        print(json.dumps({"benchmark": "responses", "encoder": json_codec.BACKEND, "results": rows}))
+        return
+    print(f"encoder: {json_codec.BACKEND}")
+    print(f"{'turns':>5} {'full B':>8} {'gzip B':>7} {'lean B':>7} {'legacy us':>10} {'fast us':>8} "
+          f"{'lean us':>8} {'total full KB':>14} {'total lean KB':>14}")
+    for r in rows:
+        print(f"{r['turns']:>5} {r['full_bytes']:>8} {r['full_gzip_bytes']:>7} {r['lean_bytes']:>7} "
+              f"{r['full_legacy_us']:>10} {r['full_fast_us']:>8} {r['lean_fast_us']:>8} "
+              f"{r['total_full_kb']:>14} {r['total_lean_kb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+# benchmarks/stubs.py
+# Local stand-ins for the external APIs the backend calls, so load tests never
+# touch (or pay for) Groq, OpenAI or Astra. One HTTP server answers:
+#
+#   POST .../chat/completions               triage JSON, numbered steps (SSE when "stream"), or
+#                                           {"triage", "steps"} when a response_format is requested
+#   POST .../embeddings                     deterministic vectors for str or list input
+#                                           (packed float32 base64 when encoding_format is "base64")
+#   POST .../collections/<name>/vector-search   topK first-aid snippets
+#   POST .../collections/<name>             find (vector sort) results, insertOne/insertMany acknowledgements
+#   GET  anything                           200 (health probes, /models)
+#
+# Each service has its own injected latency (mean +/- jitter) and error rate.
+# Point the app at it through config: ``StubServer.env()`` returns the variables.
+#
+#   cd backend && python -m benchmarks.stubs --port 8765 --chat-latency-ms 400 --error-rate 0.02
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import numpy as np
+
+EMBED_DIM = 1536
+
+STEPS = (
+    "1) Make sure the area is safe before you approach.\n"
+    "2) Cool a burn under cool running water for at least 10 minutes.\n"
+    "3) Apply firm pressure with a clean cloth to any bleeding.\n"
+    "4) Keep the person still and warm while you wait for help.\n"
+    "5) Call emergency services if breathing, bleeding or pain gets worse."
+)
+
+SNIPPETS = [
+    "Burns: cool the burn with cool (not cold) running water for 20 minutes. Do not apply ice or butter.",
+    "Bleeding: apply direct pressure with a clean pad and raise the injured limb if possible.",
+    "Choking: give up to five back blows between the shoulder blades, then up to five abdominal thrusts.",
+    "Fractures: support the injured part and keep it still. Do not try to straighten the bone.",
+    "Allergic reaction: help the person use their adrenaline auto-injector and call emergency services.",
+    "Head injury: watch for drowsiness, vomiting or confusion and seek medical help if they appear.",
+]
+
+TRIAGE_KEYWORDS = [
+    ("burn", "burn", "medium"), ("bleed", "bleeding", "high"), ("chok", "choking", "high"),
+    ("fractur", "fracture", "medium"), ("broke", "fracture", "medium"), ("allerg", "allergic_reaction", "high"),
+    ("head", "head_injury", "medium"),
+]
+
+
+class ServiceProfile:
+    """Injected behaviour for one upstream service."""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self, rng: random.Random) -> float:
+        return max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def fails(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+def _vector(text: str) -> list:
+    seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+    rng = random.Random(seed)
+    return [round(rng.uniform(-1, 1), 6) for _ in range(EMBED_DIM)]
+
+
+def _base64_vector(text: str) -> str:
+    return base64.b64encode(np.asarray(_vector(text), dtype="<f4").tobytes()).decode("ascii")
+
+
+def _snippets(top_k: int):
+    return [{"_id": f"guide-{i}", "document": {"text": SNIPPETS[i % len(SNIPPETS)]},
+             "$similarity": round(0.9 - i * 0.05, 3)} for i in range(top_k)]
+
+
+def _triage(text: str) -> Dict:
+    lowered = text.lower()
+    for needle, category, severity in TRIAGE_KEYWORDS:
+        if needle in lowered:
+            return {"category": category, "severity": severity, "keywords": [needle]}
+    return {"category": "other", "severity": "low", "keywords": []}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    server: "_Server"
+
+    def log_message(self, *args):  # keep benchmark output clean
+        pass
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _service(self) -> str:
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            return "chat"
+        if path.endswith("/embeddings"):
+            return "embeddings"
+        if "/collections/" in path:
+            return "astra"
+        return "other"
+
+    def _inject(self, service: str) -> bool:
+        """Sleep for the service latency; return False after sending an injected error."""
+        profile = self.server.profiles.get(service)
+        if profile is None:
+            return True
+        with self.server.rng_lock:
+            delay, fail = profile.delay(self.server.rng), profile.fails(self.server.rng)
+        with self.server.counts_lock:
+            self.server.counts[service] = self.server.counts.get(service, 0) + 1
+        if service != "chat" or not self._streaming:
+            time.sleep(delay)
+        self._stream_delay = delay
+        if fail:
+            self._send_json(503, {"error": {"message": f"injected {service} failure"}})
+            return False
+        return True
+
+    def do_GET(self):
+        self._streaming = False
+        if self._inject("other"):
+            self._send_json(200, {"ok": True, "data": []})
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        service = self._service()
+        self._streaming = service == "chat" and bool(body.get("stream"))
+        if not self._inject(service):
+            return
+        if service == "chat":
+            self._chat(body)
+        elif service == "embeddings":
+            inputs = body.get("input", "")
+            inputs = [inputs] if isinstance(inputs, str) else list(inputs)
+            encode = _base64_vector if body.get("encoding_format") == "base64" else _vector
+            self._send_json(200, {"data": [{"index": i, "embedding": encode(t)} for i, t in enumerate(inputs)]})
+        elif service == "astra":
+            self._astra(body)
+        else:
+            self._send_json(200, {"ok": True})
+
+    def _chat(self, body: Dict) -> None:
+        messages = body.get("messages") or [{}]
+        system = str(messages[0].get("content", ""))
+        if body.get("response_format"):
+            query = str(messages[-1].get("content", "")).split("\n", 1)[0]
+            steps = [line.split(") ", 1)[1] for line in STEPS.splitlines()]
+            content = json.dumps({"triage": _triage(query), "steps": steps})
+        elif "triage" in system.lower():
+            content = json.dumps(_triage(str(messages[-1].get("content", ""))))
+        else:
+            content = STEPS
+        if not body.get("stream"):
+            self._send_json(200, {"choices": [{"message": {"content": content}}]})
+            return
+        # Token stream: the injected latency is spread over the tokens.
+        tokens = content.split(" ")
+        per_token = self._stream_delay / max(1, len(tokens))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(data: bytes) -> None:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        for i, token in enumerate(tokens):
+            delta = token if i == len(tokens) - 1 else token + " "
+            chunk(("data: " + json.dumps({"choices": [{"delta": {"content": delta}}]}) + "\n\n").encode("utf-8"))
+            if per_token:
+                time.sleep(per_token)
+        chunk(b"data: [DONE]\n\n")
+        chunk(b"")
+
+    def _astra(self, body: Dict) -> None:
+        if self.path.split("?", 1)[0].endswith("/vector-search"):
+            self._send_json(200, {"documents": _snippets(int(body.get("topK") or 4))})
+        elif "find" in body:
+            top_k = int(body["find"].get("options", {}).get("limit") or 4)
+            docs = [dict(d["document"], _id=d["_id"], **{"$similarity": d["$similarity"]}) for d in _snippets(top_k)]
+            self._send_json(200, {"data": {"documents": docs}})
+        elif "insertMany" in body:
+            ids = [d.get("_id", f"doc-{i}") for i, d in enumerate(body["insertMany"].get("documents", []))]
+            self._send_json(200, {"status": {"insertedIds": ids}})
+        else:
+            doc = body.get("document") or body.get("insertOne", {}).get("document", {})
+            self._send_json(200, {"status": {"insertedIds": [doc.get("_id", "doc-0")]}})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class StubServer:
+    """Chat, embeddings and Astra stand-ins on one local port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, seed: int = 7,
+                 profiles: Optional[Dict[str, ServiceProfile]] = None):
+        self.httpd = _Server((host, port), _Handler)
+        self.httpd.profiles = profiles or {}
+        self.httpd.rng = random.Random(seed)
+        self.httpd.rng_lock = threading.Lock()
+        self.httpd.counts = {}
+        self.httpd.counts_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        with self.httpd.counts_lock:
+            return dict(self.httpd.counts)
+
+    def env(self) -> Dict[str, str]:
+        """Config overrides that route every provider call to this server."""
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/openai/v1",
+            "GROQ_BASE_URL": f"{self.url}/groq/openai/v1",
+            "OPENAI_API_KEY": "stub-openai-key",
+            "GROQ_API_KEY": "stub-groq-key",
+            "ASTRA_DB_API_ENDPOINT": f"{self.url}/astra",
+            "ASTRA_DB_KEYSPACE": "bench",
+            "ASTRA_DB_COLLECTION": "guides",
+            "ASTRA_DB_APPLICATION_TOKEN": "stub-astra-token",
+            "VECTOR_BACKEND": "astra",
+        }
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--chat-latency-ms", type=float, default=350.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=60.0)
+    parser.add_argument("--astra-latency-ms", type=float, default=40.0)
+    parser.add_argument("--jitter", type=float, default=0.25, help="latency jitter as a fraction of the mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of upstream calls answered with 503")
+
+
+def profiles_from_args(args) -> Dict[str, ServiceProfile]:
+    def make(mean: float) -> ServiceProfile:
+        return ServiceProfile(mean, mean * args.jitter, args.error_rate)
+
+    return {"chat": make(args.chat_latency_ms), "embeddings": make(args.embed_latency_ms),
+            "astra": make(args.astra_latency_ms)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for Groq, OpenAI and Astra.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_profile_args(parser)
+    args = parser.parse_args()
+    server = StubServer(args.host, args.port, profiles=profiles_from_args(args))
+    print("# export these before starting the backend:")
+    for key, value in server.env().items():
+        print(f"export {key}={value}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# tests/test_admission.py
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services import admission, mcp_client
+from app.services.admission import Gate, Overloaded
+
+
+def test_admits_up_to_the_limit_then_sheds_when_queue_is_full():
+    gate = Gate("t", limit=1, queue_size=0, timeout=0.01)
+    assert gate.acquire()
+    assert not gate.acquire()
+    assert gate.stats()["shed_queue_full"] == 1
+    gate.release()
+    assert gate.acquire()
+
+
+def test_queued_waiter_is_shed_after_the_deadline():
+    gate = Gate("t", limit=1, queue_size=1, timeout=0.01)
+    assert gate.acquire()
+    assert not gate.acquire()
+    stats = gate.stats()
+    assert stats["shed_deadline"] == 1 and stats["queue_depth"] == 0 and stats["in_flight"] == 1
+
+
+def test_released_slot_goes_to_the_oldest_waiter():
+    gate = Gate("t", limit=1, queue_size=2, timeout=2)
+    assert gate.acquire()
+    order = []
+
+    def worker(name):
+        if gate.acquire():
+            order.append(name)
+
+    first = threading.Thread(target=worker, args=("first",))
+    first.start()
+    while gate.stats()["queue_depth"] < 1:
+        pass
+    second = threading.Thread(target=worker, args=("second",))
+    second.start()
+    while gate.stats()["queue_depth"] < 2:
+        pass
+    gate.release()
+    first.join(1)
+    gate.release()
+    second.join(1)
+    assert order == ["first", "second"]
+    assert gate.stats()["in_flight"] == 1
+
+
+def test_async_acquire_waits_for_a_release():
+    gate = Gate("t", limit=1, queue_size=1, timeout=1)
+
+    async def scenario():
+        assert await gate.acquire_async()
+        waiting = asyncio.ensure_future(gate.acquire_async())
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        gate.release()
+        return await waiting
+
+    assert asyncio.run(scenario())
+    assert gate.stats()["admitted"] == 2
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    gate = Gate("t", limit=1, queue_size=1, timeout=1)
+
+    async def scenario():
+        await gate.acquire_async()
+        waiting = asyncio.ensure_future(gate.acquire_async())
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(scenario())
+    stats = gate.stats()
+    assert stats["queue_depth"] == 0 and stats["shed_deadline"] == 0
+
+
+def test_slot_raises_overloaded_when_shed():
+    gate = Gate("t", limit=1, queue_size=0, timeout=0.01)
+    with gate.slot():
+        with pytest.raises(Overloaded):
+            with gate.slot():
+                pass
+    assert gate.stats()["in_flight"] == 0
+
+
+def test_unlimited_gate_admits_everything():
+    gate = Gate("t", limit=0, queue_size=0, timeout=0.01)
+    assert all(gate.acquire() for _ in range(5))
+    assert gate.stats()["admitted"] == 5
+
+
+def test_parse_limits_skips_malformed_entries():
+    assert admission._parse_limits("classify=4, generate=x,,embed=2") == {"classify": 4, "embed": 2}
+
+
+class _NoServer:
+    alive = True
+
+    def call_tool(self, name, arguments, timeout=None):
+        raise AssertionError("a shed request must not wait on the tool server")
+
+
+def test_shed_request_is_answered_in_process(monkeypatch):
+    gate = Gate("requests", limit=1, queue_size=0, timeout=0.01)
+    assert gate.acquire()  # the only slot is busy
+    monkeypatch.setattr(admission, "REQUESTS", gate)
+    monkeypatch.setattr(mcp_client.RUNTIME, "client", _NoServer())
+
+    async def pipeline(*args, **kwargs):
+        raise AssertionError("a shed request must not run the pipeline")
+
+    monkeypatch.setattr(main.conversational_agent, "handle_message_async", pipeline)
+    body = TestClient(main.app).post("/api/chat", json={"message": "stabbed in the chest, lots of blood"}).json()
+    result = body["result"]
+    assert result["shed"] == {"reason": "overloaded"}
+    assert result["instructions"]["fallback"] and "call an ambulance" in result["instructions"]["steps"]
+    assert result["triage"]["severity"] == "high"
+    assert result["tools"]["emergency_numbers"]["numbers"]["AMBULANCE"]
+
+
+def test_worker_pool_is_capped_and_restarts_after_shutdown(monkeypatch):
+    monkeypatch.setattr(admission, "_POOLS", [])
+    pool = admission.WorkerPool("test-pool")
+    assert pool.submit(lambda: threading.current_thread().name).result().startswith("test-pool")
+    assert pool._pool._max_workers == admission.worker_threads()
+    admission.shutdown_pools()
+    assert pool._pool is None
+    assert pool.submit(lambda x: x + 1, 1).result() == 2
+    pool.shutdown()
@@ -0,0 +1,92 @@
+# tests/test_batch.py
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.agents import conversational_agent as agent
+from app.services import admission
+from app.services.admission import Gate
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stand-in pipeline: records each run; a message containing "fail" raises."""
+    state = {"runs": [], "embed_calls": []}
+
+    async def pipeline_async(user_input, context_text, sec=None, query_vector=None, **kwargs):
+        state["runs"].append((user_input, query_vector))
+        if "fail" in user_input:
+            raise RuntimeError("provider down")
+        return {"triage": {"category": "burn"}, "instructions": {"steps": f"steps for {user_input}"}}
+
+    def embed_batch(texts, use_cache=True):
+        state["embed_calls"].append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(agent, "_pipeline_async", pipeline_async)
+    monkeypatch.setattr(agent, "has_openai", lambda: True)
+    monkeypatch.setattr(agent.instruction_agent, "embed_batch", embed_batch)
+    return state
+
+
+def test_duplicates_run_once_and_results_keep_input_order(pipeline):
+    out = agent.handle_batch(["burned hand", " burned hand ", "cut finger"], embed_batch_size=10)
+    assert [r["index"] for r in out["results"]] == [0, 1, 2]
+    assert [r["duplicate"] for r in out["results"]] == [False, True, False]
+    assert out["results"][1]["result"] == out["results"][0]["result"]
+    assert sorted(text for text, _ in pipeline["runs"]) == ["burned hand", "cut finger"]
+    assert out["summary"]["items"] == 3 and out["summary"]["unique"] == 2
+
+
+def test_embeddings_are_fetched_in_batches_and_passed_on(pipeline):
+    agent.handle_batch(["a", "bb", "ccc"], embed_batch_size=2)
+    assert pipeline["embed_calls"] == [["a", "bb"], ["ccc"]]
+    assert dict(pipeline["runs"]) == {"a": [1.0], "bb": [2.0], "ccc": [3.0]}
+
+
+def test_a_failing_item_only_affects_its_own_record(pipeline):
+    out = agent.handle_batch(["burned hand", "please fail", ""])
+    oks = [r["ok"] for r in out["results"]]
+    assert oks == [True, False, False]
+    assert out["results"][2]["result"] == {"error": "Empty message"}
+    assert out["summary"]["errors"] == 2
+
+
+def test_endpoint_streams_ndjson_records_then_a_summary(pipeline):
+    response = TestClient(main.app).post("/api/chat/batch", json={"messages": ["burned hand", "cut finger"]})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["index"] for r in lines[:-1]) == [0, 1]
+    assert lines[-1]["summary"]["items"] == 2
+
+
+def test_endpoint_rejects_empty_and_oversized_batches(pipeline, monkeypatch):
+    client = TestClient(main.app)
+    assert client.post("/api/chat/batch", json={"messages": []}).json()["ok"] is False
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 1)
+    assert client.post("/api/chat/batch", json={"messages": ["a", "b"]}).json()["ok"] is False
+
+
+def test_batch_larger_than_the_gate_is_fully_answered(pipeline, monkeypatch):
+    gate = Gate("requests", limit=1, queue_size=0, timeout=0.01)
+    monkeypatch.setattr(admission, "REQUESTS", gate)
+    messages = [f"burned hand {i}" for i in range(6)]
+    out = agent.handle_batch(messages, concurrency=4)
+    assert all(r["ok"] and not r["shed"] for r in out["results"])
+    assert len(pipeline["runs"]) == 6 and out["summary"]["shed"] == 0
+    assert gate.stats()["admitted"] == 1 and gate.stats()["in_flight"] == 0
+
+
+def test_shed_batch_reports_every_item_as_not_answered(pipeline, monkeypatch):
+    gate = Gate("requests", limit=1, queue_size=0, timeout=0.01)
+    assert gate.acquire()  # the only slot is busy
+    monkeypatch.setattr(admission, "REQUESTS", gate)
+    out = agent.handle_batch(["burned hand", "cut finger", "burned hand"])
+    assert pipeline["runs"] == [] and pipeline["embed_calls"] == []
+    for record in out["results"]:
+        assert not record["ok"] and record["shed"]
+        assert record["result"]["error"] and "instructions" not in record["result"]
+    assert out["summary"]["shed"] == 3 and out["summary"]["errors"] == 0
+    assert gate.stats()["in_flight"] == 1
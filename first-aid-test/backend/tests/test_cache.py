@@ -0,0 +1,201 @@
+# tests/test_cache.py
+import time
+
+import numpy as np
+
+from app.services import response_cache, rules_guardrails
+from app.services.cache import LRUCache
+from app.services.embedding_cache import EmbeddingCache, cache_key
+from app.services.response_cache import ResponseCache
+from app.services.vectors import Embedding
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_lru_ttl_expiry():
+    clock = _Clock()
+    cache = LRUCache(max_entries=10, ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now += 5
+    assert cache.get("a") == 1
+    clock.now += 6
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_lru_ttl_expiry_with_per_entry_override():
+    clock = _Clock()
+    cache = LRUCache(max_entries=10, ttl=10, clock=clock)
+    cache.put("short", 1)
+    cache.put("forever", 2, ttl=0)
+    clock.now += 11
+    assert cache.get("short") is None
+    assert cache.get("forever") == 2
+
+
+def test_lru_zero_entries_disables_the_cache():
+    cache = LRUCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_embedding_cache_key_ignores_case_and_spacing():
+    assert cache_key("  Burned   HAND ") == cache_key("burned hand")
+    assert cache_key("burned hand", "model-a") != cache_key("burned hand", "model-b")
+
+
+def test_embedding_cache_disk_tier_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    cache = EmbeddingCache(max_entries=10, ttl=0, path=path)
+    cache.put("cut finger", [0.5, 0.25])
+    cache.put("empty", [])  # failed embeddings are not cached
+
+    restored = EmbeddingCache(max_entries=10, ttl=0, path=path)
+    assert restored.get("Cut  Finger").tolist() == [0.5, 0.25]
+    assert restored.get("empty") is None
+    assert restored.stats()["disk_hits"] == 1
+
+
+def test_response_cache_exact_hit_is_a_copy():
+    cache = ResponseCache(max_entries=10, ttl=0)
+    instructions = {"steps": ["Keep still", "Call emergency services"]}
+    cache.store("snake bite on leg", {"category": "bites", "severity": "high"}, instructions)
+    hit = cache.lookup("  Snake bite ON leg")
+    assert hit["match"] == "exact" and hit["instructions"] == instructions
+    hit["instructions"]["steps"].append("changed")
+    assert cache.lookup("snake bite on leg")["instructions"] == instructions
+
+
+def test_response_cache_skips_degraded_results():
+    cache = ResponseCache(max_entries=10, ttl=0)
+    cache.store("unclassified", {"category": "unknown"}, {"steps": "Call for help"})
+    cache.store("no model", {"category": "burns"}, {"steps": "Cool it", "fallback": True})
+    cache.store("cut off", {"category": "burns"}, {"steps": "1) Cool", "partial": True})
+    assert cache.lookup("unclassified") is None and cache.lookup("no model") is None
+    assert cache.lookup("cut off") is None
+
+
+def test_response_cache_semantic_hit_above_threshold():
+    embed = {"snake bite on leg": [1.0, 0.0], "snake bit my leg": [0.99, 0.1], "burned hand": [0.0, 1.0]}.get
+    cache = ResponseCache(max_entries=10, ttl=0, semantic_threshold=0.9)
+    cache.store("snake bite on leg", {"category": "bites"}, {"steps": "Keep still"}, embed=embed)
+    hit = cache.lookup("snake bit my leg", embed=embed)
+    assert hit["match"] == "semantic" and hit["similarity"] > 0.9
+    assert cache.lookup("burned hand", embed=embed) is None
+
+
+def test_lru_reports_size_and_ttl_evictions():
+    clock = _Clock()
+    evicted = []
+    cache = LRUCache(max_entries=2, ttl=10, clock=clock, on_evict=evicted.append)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    clock.now += 11
+    assert cache.get("b") is None
+    cache.pop("c")
+    assert evicted == ["a", "b"]
+
+
+def test_response_cache_semantic_index_follows_eviction():
+    embed = {"snake bite": [1.0, 0.0, 0.0], "burned hand": [0.0, 1.0, 0.0], "cut finger": [0.0, 0.0, 1.0],
+             "snake bit me": [0.99, 0.1, 0.0]}.get
+    cache = ResponseCache(max_entries=2, ttl=0, semantic_threshold=0.9)
+    cache.store("snake bite", {"category": "bites"}, {"steps": "Keep still"}, embed=embed)
+    cache.store("burned hand", {"category": "burns"}, {"steps": "Cool it"}, embed=embed)
+    cache.store("cut finger", {"category": "cuts"}, {"steps": "Press on it"}, embed=embed)  # evicts the bite
+    assert cache.lookup("snake bit me", embed=embed) is None
+    assert sorted(cache._rows) == sorted([cache.key("burned hand"), cache.key("cut finger")])
+    # The freed row is reused rather than the matrix growing.
+    rows = len(cache._row_keys)
+    cache.store("snake bite", {"category": "bites"}, {"steps": "Keep still"}, embed=embed)
+    assert len(cache._row_keys) == rows and len(cache._rows) == 2
+    assert cache.lookup("snake bit me", embed=embed)["triage"]["category"] == "bites"
+    cache.invalidate()
+    assert cache.lookup("snake bit me", embed=embed) is None and not cache._rows
+
+
+def test_lru_dump_load_keeps_order_and_expiry():
+    source = LRUCache(max_entries=10, ttl=60)
+    source.put("a", 1)
+    source.put("b", 2, ttl=0)
+    source.put("c", 3)
+    entries = source.dump()
+    assert [k for k, _, _ in entries] == ["a", "b", "c"]
+    assert entries[1][2] == 0.0
+    assert abs(entries[0][2] - (time.time() + 60)) < 5
+
+    target = LRUCache(max_entries=10)
+    expired = ("gone", 4, time.time() - 1)
+    assert target.load(entries + [expired]) == 3
+    assert target.items() == [("a", 1), ("b", 2), ("c", 3)]
+
+
+def test_embedding_cache_snapshot_roundtrip(tmp_path):
+    cache = EmbeddingCache(max_entries=10, ttl=0)
+    cache.put("burned hand", Embedding.from_floats([0.1, 0.2, 0.3]))
+    cache.put("cut finger", Embedding.from_floats([0.4, 0.5, 0.6]))
+    assert cache.save_snapshot(str(tmp_path)) == 2
+
+    restored = EmbeddingCache(max_entries=10, ttl=0, quantization="float16")
+    assert restored.load_snapshot(str(tmp_path)) == 2
+    vec = restored.get("  Burned   HAND ")
+    assert vec.dtype == "float16"
+    assert np.allclose(vec.array(), [0.1, 0.2, 0.3], atol=1e-3)
+
+
+def test_embedding_cache_snapshot_missing_or_empty(tmp_path):
+    cache = EmbeddingCache(max_entries=10, ttl=0)
+    assert cache.save_snapshot(str(tmp_path)) == 0
+    assert cache.load_snapshot(str(tmp_path)) == 0
+
+
+def test_response_cache_snapshot_roundtrip(tmp_path):
+    embed = {"snake bite on leg": [1.0, 0.0], "snake bit my leg": [0.99, 0.1]}.get
+    cache = ResponseCache(max_entries=10, ttl=0, semantic_threshold=0.9)
+    triage = {"category": "bites", "severity": "high"}
+    instructions = {"steps": ["Keep still", "Call emergency services"]}
+    cache.store("snake bite on leg", triage, instructions, embed=embed)
+    cache.store("unclassified", {"category": "unknown"}, instructions)  # degraded: not kept
+    assert cache.save_snapshot(str(tmp_path)) == 1
+
+    restored = ResponseCache(max_entries=10, ttl=0, semantic_threshold=0.9)
+    assert restored.load_snapshot(str(tmp_path)) == 1
+    exact = restored.lookup("Snake bite on leg")
+    assert exact["match"] == "exact" and exact["instructions"] == instructions
+    assert restored.lookup("snake bit my leg", embed=embed)["match"] == "semantic"
+
+
+def test_response_cache_does_no_file_io_and_clears_on_guardrail_reload(monkeypatch):
+    class _NoStat:
+        def stat(self):
+            raise AssertionError("a cache hit must not stat the guardrails file")
+
+    monkeypatch.setattr(rules_guardrails._REGISTRY, "path", _NoStat())
+    monkeypatch.setattr(response_cache, "stage_model", None)
+    cache = ResponseCache(max_entries=10, ttl=0)
+    monkeypatch.setattr(rules_guardrails._REGISTRY, "_listeners", [cache.rules_changed])
+    cache.store("snake bite on leg", {"category": "bites"}, {"steps": "Keep still"})
+    assert cache.lookup("snake bite on leg")["match"] == "exact"
+
+    monkeypatch.undo()
+    monkeypatch.setattr(rules_guardrails._REGISTRY, "_listeners", [cache.rules_changed])
+    assert rules_guardrails.reload(force=True)
+    assert cache.lookup("snake bite on leg") is None and cache.invalidations == 1
@@ -0,0 +1,52 @@
+# tests/test_context_packer.py
+from app.services import context_packer
+from app.services.context_packer import count_tokens, pack
+
+
+def _hit(doc_id, text, score):
+    return {"_id": doc_id, "document": {"_id": doc_id, "text": text}, "$similarity": score}
+
+
+BURN = "Cool the burn under running water for twenty minutes. Do not apply ice or butter."
+CUT = "Press a clean cloth firmly on the cut. Raise the limb above the heart if you can."
+
+
+def test_near_duplicates_are_dropped_keeping_the_better_hit():
+    packed = pack([_hit("a", BURN, 0.9), _hit("b", BURN + " ", 0.8), _hit("c", CUT, 0.7)], budget=500)
+    assert packed.sources == ["a", "c"]
+    assert packed.duplicates == 1
+
+
+def test_contained_passage_counts_as_duplicate():
+    longer = BURN + " Cover it loosely with cling film once cooled."
+    packed = pack([_hit("long", longer, 0.9), _hit("short", BURN, 0.85)], budget=500)
+    assert packed.sources == ["long"]
+
+
+def test_packed_context_respects_the_budget():
+    docs = [_hit(str(i), f"Step {i}: " + CUT * 3, 1.0 - i / 10) for i in range(6)]
+    packed = pack(docs, budget=60, dedup_threshold=1.1)
+    assert packed.tokens <= 60
+    assert count_tokens(packed.text) <= 60 + len(packed.passages)
+
+
+def test_last_passage_is_cut_at_a_sentence_boundary():
+    budget = count_tokens(BURN) + count_tokens(context_packer.SEPARATOR) + count_tokens("Press a clean cloth firmly on the cut.")
+    packed = pack([_hit("burn", BURN, 0.9), _hit("cut", CUT, 0.8)], budget=budget)
+    assert packed.sources == ["burn", "cut"]
+    assert packed.passages[-1].trimmed
+    assert packed.passages[-1].text == "Press a clean cloth firmly on the cut."
+    assert packed.stats()["trimmed"] == 1
+
+
+def test_mmr_moves_redundant_passage_after_a_diverse_one():
+    similar = "Cool the burn under running water for ten minutes and remove rings near the burn."
+    packed = pack([_hit("a", BURN, 0.9), _hit("b", similar, 0.89), _hit("c", CUT, 0.85)],
+                  budget=500, dedup_threshold=1.1, mmr_lambda=0.3)
+    assert packed.sources[0] == "a"
+    assert packed.sources.index("c") < packed.sources.index("b")
+
+
+def test_empty_and_textless_hits_give_empty_context():
+    packed = pack([{"_id": "x", "document": {}}], budget=100)
+    assert packed.text == "" and packed.passages == []
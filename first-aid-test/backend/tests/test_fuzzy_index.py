@@ -0,0 +1,57 @@
+# tests/test_fuzzy_index.py
+import pytest
+
+from app.agents.conversational_agent import suggest_terms
+from app.services.fuzzy_index import SpellIndex, edit_distance, load_vocabulary
+
+
+def test_edit_distance_counts_adjacent_swap_once():
+    assert edit_distance("burn", "burn", 2) == 0
+    assert edit_distance("burn", "bunr", 2) == 1
+    assert edit_distance("sprain", "sprian", 2) == 1
+    assert edit_distance("seizure", "siezure", 2) == 1
+
+
+def test_edit_distance_stops_above_limit():
+    assert edit_distance("fracture", "frac", 2) == 3
+    assert edit_distance("abcdef", "uvwxyz", 1) == 2
+
+
+def test_lookup_ranks_by_distance_then_vocabulary_order():
+    index = SpellIndex(["fracture", "puncture", "rupture", "burn"], max_distance=2)
+    assert index.lookup("fractur")[0] == ("fracture", 1)
+    assert index.lookup("burn") == [("burn", 0)]
+    assert index.lookup("ructure") == [("rupture", 1), ("fracture", 2), ("puncture", 2)]
+    assert SpellIndex(["cat", "bat"]).lookup("at") == [("cat", 1), ("bat", 1)]
+
+
+def test_lookup_respects_max_distance_and_case():
+    index = SpellIndex(["anaphylaxis"], max_distance=2)
+    assert index.lookup("ANAPHYLAXSI") == [("anaphylaxis", 1)]
+    assert index.lookup("anafylaxis", max_distance=1) == []
+    assert index.lookup("anafylaxis", max_distance=5) == [("anaphylaxis", 2)]
+
+
+def test_add_deduplicates_and_normalizes():
+    index = SpellIndex()
+    index.add(" Burn ")
+    index.add("burn")
+    assert len(index) == 1 and "burn" in index
+
+
+def test_load_vocabulary_reads_terms_and_glosses(tmp_path):
+    path = tmp_path / "vocab.txt"
+    path.write_text("# comment\nEpinephrine|adrenaline\n\ntourniquet\n", encoding="utf-8")
+    assert load_vocabulary(str(path)) == (["epinephrine", "tourniquet"], {"epinephrine": "adrenaline"})
+    assert load_vocabulary(str(tmp_path / "missing.txt")) == ([], {})
+
+
+@pytest.mark.parametrize("word", ["sling", "sing", "swing", "string", "stink", "cute", "stain", "strait",
+                                  "should", "knew", "train"])
+def test_dictionary_words_are_never_corrected(word):
+    assert suggest_terms(f"my arm has a {word} on it") == []
+
+
+def test_misspelled_terms_are_still_suggested():
+    found = {s["token"]: s["suggestions"][0]["term"] for s in suggest_terms("a bleding cut and a sprian ankle")}
+    assert found == {"bleding": "bleeding", "sprian": "sprain"}
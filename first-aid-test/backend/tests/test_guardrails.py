@@ -0,0 +1,69 @@
+# tests/test_guardrails.py
+from app.services.rules_guardrails import DENY_RULE, DIAGNOSIS_RULE, RuleSet, StreamMatcher, _Registry, _trie_regex
+
+RULES = RuleSet({"deny_terms": ["overdose", "overdosing", "self harm", "kill"]})
+
+
+def test_trie_regex_matches_exactly_the_terms():
+    import re
+
+    pattern = re.compile(f"^(?:{_trie_regex(['ab', 'abc', 'b'])})$")
+    assert all(pattern.match(t) for t in ("ab", "abc", "b"))
+    assert not any(pattern.match(t) for t in ("a", "abcd", "c"))
+
+
+def test_search_and_match_report_rule_and_span():
+    text = "How do I DIAGNOSE an Overdose?"
+    assert RULES.search(text)
+    matches = RULES.match(text)
+    assert [(m.rule, m.term) for m in matches] == [(DIAGNOSIS_RULE, "diagnose"), (DENY_RULE, "overdose")]
+    assert text[matches[1].start:matches[1].end] == "Overdose"
+    assert not RULES.search("my hand is burned")
+
+
+def test_spans_index_text_whose_length_changes_when_lowercased():
+    text = "İİ then kill"
+    (m,) = RULES.match(text)
+    assert text[m.start:m.end] == "kill"
+
+
+def test_empty_rules_never_match():
+    rules = RuleSet({"block_unqualified_medical_diagnosis": False})
+    assert rules.pattern is None and not rules.search("diagnose kill")
+
+
+def test_stream_matcher_finds_term_split_across_chunks():
+    matcher = StreamMatcher(RULES)
+    found = []
+    for chunk in ["Signs of an over", "do", "se include ", "self ", "harm."]:
+        found += matcher.feed(chunk)
+    found += matcher.close()
+    assert [m.term for m in found] == ["overdose", "self harm"]
+    assert found[0].start == len("Signs of an ")
+
+
+def test_stream_matcher_holds_diagnosis_at_buffer_end_until_close():
+    matcher = StreamMatcher(RULES)
+    assert matcher.feed("do not diagnose") == []
+    assert [m.term for m in matcher.close()] == ["diagnose"]
+
+
+def test_stream_matcher_does_not_report_a_match_twice():
+    matcher = StreamMatcher(RULES)
+    found = matcher.feed("kill ") + matcher.feed("x" * 40) + matcher.close()
+    assert [m.term for m in found] == ["kill"]
+
+
+def test_registry_reloads_changed_file_and_keeps_last_good_rules(tmp_path):
+    path = tmp_path / "guardrails.yaml"
+    path.write_text("deny_terms: [kill]\n", encoding="utf-8")
+    registry = _Registry(path, interval=0)
+    assert registry.current().search("kill") and not registry.current().search("bomb")
+
+    path.write_text("deny_terms: [kill, bomb, explosives]\n", encoding="utf-8")
+    assert registry.maybe_reload()
+    assert registry.current().search("make a bomb") and registry.current().version == 2
+
+    path.write_text("deny_terms: [unclosed\n", encoding="utf-8")
+    assert not registry.maybe_reload()
+    assert registry.current().search("make a bomb")
@@ -0,0 +1,69 @@
+# tests/test_ingest.py
+import pytest
+
+from app import ingest
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Stand-ins for the embeddings call and the vector store."""
+    state = {"docs": {}, "embed_calls": 0, "fail": set(), "flushed": 0}
+
+    def embed_batch(texts, use_cache=True):
+        state["embed_calls"] += 1
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def insert_many(docs):
+        bad = state["fail"] & {d["_id"] for d in docs}
+        if bad:
+            state["fail"] -= bad
+            raise RuntimeError("transient")
+        state["docs"].update({d["_id"]: d for d in docs})
+
+    monkeypatch.setattr(ingest.instruction_agent, "embed_batch", embed_batch)
+    monkeypatch.setattr(ingest.vector_db, "insert_many", insert_many)
+    monkeypatch.setattr(ingest.vector_db, "flush", lambda: state.update(flushed=state["flushed"] + 1))
+    return state
+
+
+def test_read_documents_from_jsonl_and_markdown(tmp_path):
+    jsonl = tmp_path / "guides.jsonl"
+    jsonl.write_text('{"id": "b1", "text": "Cool the burn.", "topic": "burns"}\nnot json\n{"text": ""}\n',
+                     encoding="utf-8")
+    md = tmp_path / "cuts.md"
+    md.write_text("# Cuts\nPress firmly.\n\n## Nosebleeds\nLean forward.\n", encoding="utf-8")
+    assert list(ingest.read_documents(jsonl)) == [
+        {"_id": "b1", "text": "Cool the burn.", "meta": {"topic": "burns", "source": "guides.jsonl"}}]
+    assert [(d["_id"], d["meta"]["title"], d["text"]) for d in ingest.read_documents(md)] == [
+        ("cuts#0", "Cuts", "Press firmly."), ("cuts#1", "Nosebleeds", "Lean forward.")]
+
+
+def test_chunks_stay_under_the_limit_and_keep_their_parent():
+    text = "\n\n".join(["One sentence here. Another one there."] * 10)
+    chunks = ingest.chunk_document({"_id": "doc", "text": text, "meta": {"source": "x"}}, max_chars=100)
+    assert len(chunks) > 1 and all(len(c["text"]) <= 100 for c in chunks)
+    assert chunks[1]["_id"] == "doc::1" and chunks[1]["meta"] == {"source": "x", "parent": "doc", "chunk": 1}
+
+
+def test_ingest_batches_retries_and_flushes(tmp_path, store):
+    path = tmp_path / "kb.jsonl"
+    path.write_text("".join(f'{{"id": "d{i}", "text": "guide {i}"}}\n' for i in range(5)), encoding="utf-8")
+    store["fail"] = {"d0::0"}
+    stats = ingest.ingest([str(path)], batch_size=2, concurrency=2, backoff=0)
+    assert stats["chunks"] == 5 and stats["batches"] == 3 and stats["failed_batches"] == 0
+    assert sorted(store["docs"]) == [f"d{i}::0" for i in range(5)]
+    assert store["docs"]["d3::0"]["embedding"] == [7.0, 1.0]
+    assert store["flushed"] == 1
+
+
+def test_checkpoint_resumes_after_a_failed_batch(tmp_path, store):
+    path = tmp_path / "kb.jsonl"
+    path.write_text("".join(f'{{"id": "d{i}", "text": "guide {i}"}}\n' for i in range(4)), encoding="utf-8")
+    ckpt = str(tmp_path / "ingest.ckpt")
+    store["fail"] = {"d2::0"}
+    first = ingest.ingest([str(path)], batch_size=2, concurrency=1, checkpoint=ckpt, retries=0)
+    assert first["failed_batches"] == 1 and first["failed_chunks"] == 2
+
+    second = ingest.ingest([str(path)], batch_size=2, concurrency=1, checkpoint=ckpt, retries=0)
+    assert second["skipped"] == 2 and second["chunks"] == 2 and second["failed_batches"] == 0
+    assert sorted(store["docs"]) == [f"d{i}::0" for i in range(4)]
@@ -0,0 +1,84 @@
+# tests/test_lexical_index.py
+import threading
+
+from app.agents import instruction_agent
+from app.services.lexical_index import LexicalIndex, fuse_rankings, tokenize
+
+DOCS = [
+    {"_id": "burn", "text": "Cool burns under running water for twenty minutes."},
+    {"_id": "allergy", "text": "For anaphylaxis use the epinephrine auto-injector and call an ambulance."},
+    {"_id": "cut", "text": "Press on the cut to stop the bleeding, then cover it."},
+]
+
+
+def _index(path=None) -> LexicalIndex:
+    index = LexicalIndex(str(path) if path else None)
+    index.add(DOCS)
+    return index
+
+
+def test_tokenize_stems_and_drops_stopwords():
+    assert tokenize("The burns were burning") == ["burn", "burn"]
+    assert tokenize("bruises") == tokenize("bruise")
+
+
+def test_exact_medical_term_ranks_its_guide_first():
+    hits = _index().search("where is my epinephrine", top_k=2)
+    assert [h["_id"] for h in hits] == ["allergy"]
+    assert hits[0]["document"]["text"].startswith("For anaphylaxis")
+
+
+def test_re_adding_an_id_replaces_the_document():
+    index = _index()
+    index.add([{"_id": "burn", "text": "Chemical splash: rinse the eye with water."}])
+    assert len(index) == 3
+    assert index.search("running twenty") == []
+    assert index.search("chemical splash")[0]["_id"] == "burn"
+
+
+def test_removed_documents_are_not_returned():
+    index = _index()
+    assert index.remove(["cut", "missing"]) == 1
+    assert index.search("bleeding cut") == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = _index(tmp_path)
+    index.add([{"_id": "cut", "text": "Clean the wound and apply a plaster."}])
+    index.save()
+    loaded = LexicalIndex.load(str(tmp_path))
+    assert len(loaded) == 3
+    assert loaded.search("plaster") == index.search("plaster")
+    loaded.add([{"_id": "sting", "text": "Scrape the bee sting out sideways."}])
+    assert loaded.search("bee sting")[0]["_id"] == "sting"
+
+
+def test_load_of_missing_index_is_empty(tmp_path):
+    assert len(LexicalIndex.load(str(tmp_path / "nothing"))) == 0
+
+
+def test_fuse_rankings_rewards_documents_in_both_lists():
+    dense = [{"_id": "a", "document": {}, "$similarity": 0.9}, {"_id": "b", "document": {}, "$similarity": 0.8}]
+    sparse = [{"_id": "b", "document": {}, "$bm25": 3.0}, {"_id": "c", "document": {}, "$bm25": 2.0}]
+    fused = fuse_rankings([dense, sparse], top_k=3)
+    assert [h["_id"] for h in fused] == ["b", "a", "c"]
+    assert fused[0]["$vector_similarity"] == 0.8 and fused[0]["$bm25"] == 3.0
+    assert all(0 < h["$similarity"] <= 1 for h in fused)
+
+
+def test_hybrid_retrieval_runs_bm25_on_the_worker_pool(monkeypatch):
+    threads = []
+    index = _index()
+    search = index.search
+
+    def lexical(query, top_k):
+        threads.append(threading.current_thread().name)
+        return search(query, top_k=top_k)
+
+    monkeypatch.setattr(index, "search", lexical)
+    monkeypatch.setattr(instruction_agent.lexical_index, "get_index", lambda: index)
+    monkeypatch.setattr(instruction_agent, "_vector_search",
+                        lambda query, vector: [{"_id": "cut", "document": DOCS[2], "$similarity": 0.9}])
+    hits = instruction_agent.retrieve_context("epinephrine for a cut", vector=[0.1, 0.2])
+    assert {h["_id"] for h in hits} == {"allergy", "cut"}
+    assert len(threads) == 1 and threads[0].startswith("lexical")
@@ -0,0 +1,124 @@
+# tests/test_llm_router.py
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.services import llm_router
+from app.services.llm_router import LLMRouter, RouterError, _Provider
+
+
+def _response(status: int, content: str = "ok") -> httpx.Response:
+    request = httpx.Request("POST", "https://llm.test/chat/completions")
+    return httpx.Response(status, json={"choices": [{"message": {"content": content}}]}, request=request)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Scripted upstream: ``state[provider]`` is a status code, or an exception to raise."""
+    state = {"groq": 200, "openai": 200, "calls": []}
+
+    def post(url, headers=None, json=None, read_timeout=None):
+        provider = "groq" if "groq" in url else "openai"
+        state["calls"].append(provider)
+        outcome = state[provider]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _response(outcome, content=provider)
+
+    monkeypatch.setattr(llm_router.http_client, "post", post)
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_FAILURES", 2)
+    monkeypatch.setattr(llm_router, "LLM_BREAKER_COOLDOWN_SECONDS", 30)
+    return state
+
+
+def _router(preferred: str = "groq") -> LLMRouter:
+    return LLMRouter([_Provider("groq", "https://groq.test", "g-key"),
+                      _Provider("openai", "https://openai.test", "o-key")], preferred=preferred)
+
+
+def test_preferred_provider_answers_first(upstream):
+    router = _router()
+    result = router.complete("triage", {"messages": []})
+    assert result.provider == "groq" and result.content == "groq"
+    assert upstream["calls"] == ["groq"]
+
+
+def test_server_errors_fail_over_and_open_the_circuit(upstream):
+    router = _router()
+    router.record("groq", 0.1, True)  # groq is much faster, so it stays ranked first while failing
+    router.record("openai", 1.0, True)
+    upstream["groq"] = 503
+    for _ in range(2):
+        assert router.complete("triage", {"messages": []}).provider == "openai"
+    assert router.providers["groq"].snapshot()["circuit"] == "open"
+    upstream["calls"].clear()
+    assert router.complete("triage", {"messages": []}).provider == "openai"
+    assert upstream["calls"] == ["openai"]
+    assert router.counts["failovers"] == 2
+
+
+def test_client_errors_do_not_open_the_circuit(upstream):
+    router = _router()
+    upstream["groq"] = 400
+    upstream["openai"] = 400
+    for _ in range(3):
+        with pytest.raises(RouterError):
+            router.complete("triage", {"messages": []})
+    assert router.providers["groq"].snapshot()["circuit"] == "closed"
+    assert router.counts["exhausted"] == 3
+
+
+def test_is_provider_failure_classification():
+    request = httpx.Request("POST", "https://llm.test")
+    status_error = lambda code: httpx.HTTPStatusError("x", request=request, response=httpx.Response(code, request=request))
+    assert llm_router.is_provider_failure(status_error(429))
+    assert llm_router.is_provider_failure(status_error(502))
+    assert llm_router.is_provider_failure(httpx.ReadTimeout("slow"))
+    assert not llm_router.is_provider_failure(status_error(400))
+    assert not llm_router.is_provider_failure(ValueError("bad json"))
+
+
+def test_half_open_circuit_lets_one_trial_through(upstream, monkeypatch):
+    router = _router()
+    groq = router.providers["groq"]
+    for _ in range(2):
+        groq.record(0.1, False)
+    now = groq.opened_at + 31
+    assert groq.state(now) == "half_open"
+    assert groq.acquire(now)
+    assert not groq.acquire(now)  # the trial is still in flight
+    router.record_error("groq", 0.1, ValueError("not about health"))
+    assert groq.acquire(now)  # a non-provider error frees the trial slot
+    groq.record(0.1, True)
+    assert groq.state(now) == "closed"
+
+
+def test_routes_skip_open_providers(upstream):
+    router = _router(preferred="openai")
+    for _ in range(2):
+        router.record("openai", 0.1, False)
+    assert [route.provider for route in router.routes("triage")] == ["groq"]
+
+
+def test_slow_primary_is_hedged_on_the_shared_worker_pool(upstream, monkeypatch):
+    threads = []
+    post = llm_router.http_client.post
+
+    def slow_groq(url, **kwargs):
+        threads.append(threading.current_thread().name)
+        if "groq" in url:
+            time.sleep(0.3)
+        return post(url, **kwargs)
+
+    monkeypatch.setattr(llm_router.http_client, "post", slow_groq)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_DEFAULT_DELAY_MS", 20)
+    monkeypatch.setattr(llm_router, "LLM_HEDGE_MIN_DELAY_MS", 20)
+    router = LLMRouter([_Provider("groq", "https://groq.test", "g-key"),
+                        _Provider("openai", "https://openai.test", "o-key")], preferred="groq", hedge=True)
+    result = router.complete("triage", {"messages": []})
+    assert result.provider == "openai" and result.hedged
+    assert router.counts["hedges"] == 1 and router.counts["hedge_wins"] == 1
+    assert all(name.startswith("llm-hedge") for name in threads)
+    router._pool.shutdown()
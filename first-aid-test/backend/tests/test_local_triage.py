@@ -0,0 +1,97 @@
+# tests/test_local_triage.py
+import asyncio
+
+from app.agents import conversational_agent as agent
+from app.agents import emergency_classifier, local_triage
+from app.config import TRIAGE_LOCAL_THRESHOLD
+
+
+def test_clear_cut_cases_are_confident():
+    for text, category in [("I burned my hand on the stove, it is blistering", "burn"),
+                           ("my nose is bleeding", "bleeding"),
+                           ("I sprained my ankle playing football", "sprain")]:
+        triage, confidence = local_triage.classify(text)
+        assert triage["category"] == category
+        assert confidence >= TRIAGE_LOCAL_THRESHOLD
+
+
+def test_keywords_match_whole_words_only():
+    triage, _ = local_triage.classify("such a cute puppy")
+    assert triage is None or "cut" not in triage["keywords"]
+
+
+def test_no_signal_returns_none():
+    assert local_triage.classify("") == (None, 0.0)
+    assert local_triage.classify("qwerty zxcvb") == (None, 0.0)
+
+
+def test_red_flags_raise_severity():
+    triage, _ = local_triage.classify("deep cut on his arm, blood is spurting")
+    assert triage["category"] == "bleeding" and triage["severity"] == "high"
+    assert "spurting" in triage["keywords"]
+
+
+def test_poisoning_and_airway_signs_always_escalate():
+    for text in ("my child swallowed bleach", "bee sting and now her throat feels tight",
+                 "burned my arm and now I can't breathe"):
+        assert local_triage.classify(text)[1] == 0.0
+
+
+def test_critical_injuries_escalate_with_high_severity():
+    for text in ("stabbed in the chest, lots of blood", "cut my wrists on purpose, bleeding",
+                 "fell off ladder and hit my head, bleeding", "baby fell and has a bruise on head, vomiting",
+                 "he was shot in the leg", "took an overdose of her pills", "I keep thinking about suicide"):
+        triage, confidence = local_triage.classify(text)
+        assert confidence == 0.0, text
+        assert triage["severity"] == "high", text
+        assert emergency_classifier.classify_local(text) is None
+
+
+def test_several_scenarios_stay_below_the_threshold():
+    _, confidence = local_triage.classify("burned my hand and sprained my wrist")
+    assert confidence < TRIAGE_LOCAL_THRESHOLD
+
+
+def test_naive_bayes_prefers_the_label_with_matching_words():
+    nb = local_triage.NaiveBayes().fit([("hot stove burn", "burn"), ("knife cut blood", "bleeding")])
+    label, prob = nb.predict("a burn from the stove")
+    assert label == "burn" and 0.5 < prob <= 1.0
+    assert nb.predict("nothing known") == (None, 0.0)
+
+
+def test_classifier_serves_confident_cases_locally(monkeypatch):
+    def remote(text):
+        raise AssertionError("the LLM must not be called")
+
+    monkeypatch.setattr(emergency_classifier, "_classify_remote", remote)
+    before = emergency_classifier.stats()["local"]
+    result = emergency_classifier.classify("I burned my hand on the stove, it is blistering")
+    assert result["source"] == "local" and result["category"] == "burn"
+    assert emergency_classifier.stats()["local"] == before + 1
+
+
+def test_classifier_sends_ambiguous_cases_to_the_llm(monkeypatch):
+    calls = []
+    monkeypatch.setattr(emergency_classifier, "_classify_remote",
+                        lambda text: calls.append(text) or {"category": "poisoning", "severity": "high"})
+    assert emergency_classifier.classify("my child swallowed bleach")["category"] == "poisoning"
+    assert calls == ["my child swallowed bleach"]
+
+
+def test_fused_path_scores_the_text_once(monkeypatch):
+    calls = []
+    original = emergency_classifier.classify_local
+
+    def counting(text):
+        calls.append(text)
+        return original(text)
+
+    monkeypatch.setattr(agent, "LLM_FUSED_ENABLED", True)
+    monkeypatch.setattr(emergency_classifier, "classify_local", counting)
+    monkeypatch.setattr(agent.instruction_agent, "generate", lambda *args: {"steps": "1) Cool it."})
+    text = "I burned my hand on the stove, it is blistering"
+    triage, _ = agent._classify_and_generate(text)
+    assert triage["source"] == "local" and triage["category"] == "burn"
+    triage, _ = asyncio.run(agent._classify_and_generate_async(text))
+    assert triage["source"] == "local"
+    assert calls == [text, text]
@@ -0,0 +1,71 @@
+# tests/test_local_vector_store.py
+from app.services.local_vector_store import LOG_FILE, META_FILE, LocalVectorStore
+
+DOCS = [
+    {"_id": "burn", "embedding": [1.0, 0.0, 0.0], "text": "Cool the burn"},
+    {"_id": "cut", "embedding": [0.0, 1.0, 0.0], "text": "Press on the cut"},
+    {"_id": "sprain", "embedding": [0.0, 0.0, 1.0], "text": "Rest the sprain"},
+]
+
+
+def test_search_ranks_by_cosine_similarity(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    assert [status for status, _ in store.upsert_documents(DOCS)] == [200, 200, 200]
+    hits = store.similarity_search([0.9, 0.1, 0.0], top_k=2)
+    assert [h["_id"] for h in hits] == ["burn", "cut"]
+    assert hits[0]["document"] == {"_id": "burn", "text": "Cool the burn"}
+
+
+def test_rejects_missing_and_mismatched_embeddings(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert_documents(DOCS[:1])
+    resps = store.upsert_documents([{"_id": "a"}, {"_id": "b", "embedding": [1.0, 0.0]}])
+    assert [status for status, _ in resps] == [400, 400]
+    assert len(store) == 1
+
+
+def test_writes_append_to_the_log_and_reload(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert_documents(DOCS[:2])
+    store.upsert_documents([dict(DOCS[0], text="Cool the burn for 20 minutes")])
+    store.delete_documents(["cut"])
+    assert not (tmp_path / META_FILE).exists()
+    assert len((tmp_path / LOG_FILE).read_text().splitlines()) == 3
+
+    reopened = LocalVectorStore(str(tmp_path))
+    assert len(reopened) == 1
+    assert reopened.similarity_search([1.0, 0.0, 0.0])[0]["document"]["text"] == "Cool the burn for 20 minutes"
+
+
+def test_flush_folds_the_log_into_the_snapshot(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert_documents(DOCS)
+    store.flush()
+    assert (tmp_path / META_FILE).exists() and not (tmp_path / LOG_FILE).exists()
+    assert [h["_id"] for h in LocalVectorStore(str(tmp_path)).similarity_search([0.0, 0.0, 1.0], 1)] == ["sprain"]
+
+
+def test_torn_last_log_line_is_ignored(tmp_path):
+    store = LocalVectorStore(str(tmp_path))
+    store.upsert_documents(DOCS[:1])
+    with (tmp_path / LOG_FILE).open("a", encoding="utf-8") as handle:
+        handle.write('{"docs": [[1, {"_id": "cu')
+    assert len(LocalVectorStore(str(tmp_path))) == 1
+
+
+def test_approx_search_finds_the_nearest_document(tmp_path):
+    store = LocalVectorStore(str(tmp_path), search_mode="approx", nprobe=4)
+    store.upsert_documents(DOCS)
+    assert store.similarity_search([0.1, 0.9, 0.0], top_k=1)[0]["_id"] == "cut"
+
+
+def test_approx_search_follows_a_re_upserted_vector(tmp_path):
+    axes = [[1.0 if i == axis else 0.0 for i in range(4)] for axis in range(4)]
+    docs = [{"_id": f"{axis}-{j}", "embedding": [v + 0.01 * j for v in axes[axis]]}
+            for axis in range(4) for j in range(4)]
+    store = LocalVectorStore(str(tmp_path), search_mode="approx", nprobe=1)
+    store.upsert_documents(docs)
+    assert store.similarity_search(axes[0], top_k=1)[0]["_id"].startswith("0-")  # builds the index
+    store.upsert_documents([{"_id": "0-0", "embedding": axes[2]}])
+    assert store.similarity_search(axes[2], top_k=1)[0]["_id"] == "0-0"
+    assert "0-0" not in [h["_id"] for h in store.similarity_search(axes[0], top_k=4)]
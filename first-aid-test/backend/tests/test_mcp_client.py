@@ -0,0 +1,101 @@
+# tests/test_mcp_client.py
+import sys
+import threading
+import time
+
+import pytest
+
+from app.services import mcp_server
+from app.services.mcp_client import MCPClient, MCPError, ToolRuntime, ToolSpec, BACKEND_DIR
+
+SERVER = [sys.executable, "-m", "app.mcp_stdio_server"]
+
+
+def _runtime(client, ttl=60.0, timeout=5.0):
+    specs = {name: ToolSpec(name, ttl, timeout, fn) for name, (fn, _, _) in mcp_server.TOOLS.items()}
+    return ToolRuntime(client, specs)
+
+
+@pytest.fixture
+def client():
+    client = MCPClient(SERVER, start_timeout=10, restart_backoff=0.05, cwd=str(BACKEND_DIR))
+    yield client
+    client.close()
+
+
+def test_calls_go_to_the_server_and_are_cached(client):
+    client.start()
+    assert "get_emergency_numbers" in client.tools
+    runtime = _runtime(client)
+    first = runtime.call("get_emergency_numbers", {"country_code": "GB"})
+    assert first["numbers"]["AMBULANCE"] == "999"
+    assert runtime.call("get_emergency_numbers", {"country_code": "GB"}) == first
+    assert runtime.counts["remote"] == 1 and runtime.counts["cache_hits"] == 1
+
+
+def test_concurrent_calls_share_the_connection(client):
+    client.start()
+    runtime = _runtime(client, ttl=0)
+    pending = runtime.start([("get_emergency_numbers", {"country_code": c}) for c in ("LK", "US", "AU")]
+                            + [("get_location_from_maps", {"query": "nearest hospital"})])
+    results = pending.results()
+    assert [r.get("country") for r in results[:3]] == ["LK", "US", "AU"]
+    assert results[3]["query"] == "nearest hospital"
+    assert runtime.counts["remote"] == 4 and client.starts == 1
+
+
+def test_calls_wait_for_the_initialize_handshake(client):
+    client.start()
+    client.initialized.clear()  # as if the handshake of a fresh process were still running
+    with pytest.raises(MCPError):
+        client.call_tool("get_emergency_numbers", {"country_code": "GB"}, timeout=0.05)
+    threading.Timer(0.1, client.initialized.set).start()
+    sent = client.call_tool("get_emergency_numbers", {"country_code": "GB"}, timeout=5)
+    assert client.tool_result(sent, 5)["numbers"]["AMBULANCE"] == "999"
+
+
+def test_dead_server_falls_back_and_restarts_in_background(client):
+    client.start()
+    client._proc.kill()
+    client._proc.wait()
+    runtime = _runtime(client, ttl=0)
+    assert runtime.call("get_emergency_numbers", {"country_code": "IN"})["numbers"]["AMBULANCE"] == "108"
+    assert runtime.counts["fallbacks"] == 1
+    for _ in range(200):
+        if client.starts == 2:
+            break
+        time.sleep(0.05)
+    assert client.alive and client.starts == 2
+
+
+def test_close_stops_a_pending_background_restart():
+    client = MCPClient(SERVER, start_timeout=10, restart_backoff=0.2, cwd=str(BACKEND_DIR))
+    client.start()
+    client._proc.kill()
+    client._proc.wait()
+    client._retry_at = time.monotonic() + 0.2
+    client.restart_in_background()
+    client.close()
+    time.sleep(0.4)
+    assert not client.alive and client.starts == 1
+    with pytest.raises(MCPError):
+        client.start()
+    client.restart_in_background()
+    assert not client._restarting
+
+
+def test_server_that_cannot_start_uses_the_fallback():
+    client = MCPClient([sys.executable, "-c", "pass"], start_timeout=2, restart_backoff=60)
+    runtime = _runtime(client)
+    runtime.warm()
+    assert not client.alive
+    with pytest.raises(MCPError):
+        client.start()  # still inside the restart backoff
+    assert runtime.call("get_emergency_numbers", {})["country"] == "LK"
+    assert runtime.counts["fallbacks"] == 1
+    client.close()
+
+
+def test_runtime_without_a_client_calls_tools_in_process():
+    runtime = _runtime(None)
+    assert runtime.call("get_emergency_numbers", {"country_code": "zz"})["default"] is True
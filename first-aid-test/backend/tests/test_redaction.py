@@ -0,0 +1,51 @@
+# tests/test_redaction.py
+from app.services.redaction import Redactor, StreamRestorer, restore
+
+
+def test_masks_each_kind_with_numbered_placeholders():
+    r = Redactor().redact("My name is Kasun Perera, call 0771234567 or mail kasun@example.com")
+    assert r.text == "My name is [NAME_1], call [PHONE_1] or mail [EMAIL_1]"
+    assert r.placeholders == {"[NAME_1]": "Kasun Perera", "[PHONE_1]": "0771234567",
+                              "[EMAIL_1]": "kasun@example.com"}
+    assert [s["type"] for s in r.spans] == ["NAME", "PHONE", "EMAIL"]
+
+
+def test_repeated_value_reuses_its_placeholder():
+    r = Redactor().redact("call 077 123 4567, yes 0771234567, or 0719876543")
+    assert r.text == "call [PHONE_1], yes [PHONE_1], or [PHONE_2]"
+
+
+def test_same_shape_messages_normalize_to_the_same_text():
+    a = Redactor().redact("my son's number is 0771234567").text
+    b = Redactor().redact("my son's number is 0719876543").text
+    assert a == b
+
+
+def test_ordinary_capitalised_words_are_not_names():
+    for text in ("please call me Now", "call me Asap, my hand is Burned", "her name is Unknown"):
+        r = Redactor().redact(text)
+        assert r.text == text
+        assert not r.spans
+
+
+def test_dates_are_not_phones():
+    assert not Redactor().redact("it happened on 2024-01-15 10:30").spans
+
+
+def test_whitespace_and_control_characters_are_collapsed():
+    assert Redactor(kinds=[]).redact("  hand\x00 is\n\n  burned ").text == "hand is burned"
+
+
+def test_only_enabled_kinds_are_masked():
+    r = Redactor(kinds=["EMAIL"]).redact("call 0771234567 or mail a@b.org")
+    assert r.text == "call 0771234567 or mail [EMAIL_1]"
+
+
+def test_restore_leaves_unknown_placeholders():
+    assert restore("call [PHONE_1] not [PHONE_2]", {"[PHONE_1]": "0771234567"}) == "call 0771234567 not [PHONE_2]"
+
+
+def test_stream_restorer_handles_placeholder_split_across_chunks():
+    restorer = StreamRestorer({"[PHONE_1]": "0771234567"})
+    out = "".join(restorer.feed(chunk) for chunk in ["Call [PH", "ONE_", "1] now [", "x"]) + restorer.flush()
+    assert out == "Call 0771234567 now [x"
@@ -0,0 +1,96 @@
+# tests/test_sessions.py
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.services.session_store import SessionStore
+
+RESULT = {"triage": {"category": "burn", "severity": "low"}, "instructions": {"steps": "1) Cool the burn."}}
+
+
+def test_context_keeps_the_last_three_user_turns():
+    store = SessionStore(max_entries=10, idle_seconds=0)
+    session = store.create([{"role": "user", "content": "one"}, {"role": "assistant", "content": "ok"}])
+    session.add_turn("two", "ok")
+    session.add_turn("three", "ok")
+    assert session.context_for("four") == "two \nthree \nfour"
+    assert len(session.messages) == 6
+
+
+def test_ids_are_generated_by_the_store():
+    store = SessionStore(max_entries=10, idle_seconds=0)
+    a, b = store.create(), store.create()
+    assert a.session_id != b.session_id and len(a.session_id) == 32
+    assert store.get(a.session_id) is a and store.get("made-up") is None
+
+
+def test_idle_sessions_expire(monkeypatch):
+    store = SessionStore(max_entries=10, idle_seconds=60)
+    session = store.create()
+    now = store.memory._clock() + 61
+    monkeypatch.setattr(store.memory, "_clock", lambda: now)
+    assert store.get(session.session_id) is None
+
+
+def test_sqlite_tier_survives_a_restart_and_purges_idle_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "sessions.sqlite")
+    store = SessionStore(max_entries=10, idle_seconds=60, db_path=path)
+    session = store.create([{"role": "user", "content": "my hand is burned"}])
+    restored = SessionStore(max_entries=10, idle_seconds=60, db_path=path).get(session.session_id)
+    assert restored.recent_user == ["my hand is burned"]
+
+    later = SessionStore(max_entries=10, idle_seconds=60, db_path=path)
+    monkeypatch.setattr("app.services.session_store.time.time", lambda: session.updated + 120)
+    assert later.db.purge(later.idle_seconds) == 1
+    assert later.get(session.session_id) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def handle_message_async(user_input, **kwargs):
+        calls.append((user_input, kwargs))
+        return dict(RESULT)
+
+    monkeypatch.setattr(main.conversational_agent, "handle_message_async", handle_message_async)
+    monkeypatch.setattr(main, "SESSIONS", SessionStore(max_entries=10, idle_seconds=0))
+    client = TestClient(main.app)
+    client.calls = calls
+    return client
+
+
+def test_session_client_sends_only_new_messages(client):
+    first = client.post("/api/chat/continue", json={"message": "I burned my hand"}).json()
+    assert first["ok"] and first["message"]["role"] == "assistant" and "messages" not in first
+    second = client.post("/api/chat/continue",
+                         json={"session_id": first["session_id"], "message": "it is blistering"}).json()
+    assert second["session_id"] == first["session_id"]
+    assert client.calls[1] == ("it is blistering", {"context_text": "I burned my hand \nit is blistering"})
+    assert len(main.SESSIONS.get(first["session_id"]).messages) == 4
+
+
+def test_full_history_client_gets_the_history_back(client):
+    history = [{"role": "user", "content": "I burned my hand"}]
+    body = client.post("/api/chat/continue", json={"messages": history}).json()
+    assert body["ok"] and [m["role"] for m in body["messages"]] == ["user", "assistant"]
+    assert client.calls[0] == ("I burned my hand", {"history": history})
+
+
+def test_full_history_client_with_an_unknown_session_is_served(client):
+    history = [{"role": "user", "content": "I burned my hand"}]
+    body = client.post("/api/chat/continue", json={"session_id": "expired", "messages": history}).json()
+    assert body["ok"] and [m["role"] for m in body["messages"]] == ["user", "assistant"]
+    assert client.calls[0] == ("I burned my hand", {"history": history})
+    assert main.SESSIONS.get("expired") is None
+
+
+def test_session_client_with_an_unknown_session_is_rejected(client):
+    body = client.post("/api/chat/continue", json={"session_id": "expired", "message": "hello"}).json()
+    assert body == {"ok": False, "error": "Unknown or expired session_id"}
+    assert client.calls == []
+
+
+def test_empty_message_is_rejected(client):
+    assert client.post("/api/chat/continue", json={"message": "  "}).json()["ok"] is False
+    assert client.post("/api/chat/continue", json={"messages": []}).json()["ok"] is False
@@ -0,0 +1,139 @@
+# tests/test_streaming.py
+import threading
+from contextlib import contextmanager
+
+import httpx
+import pytest
+
+from app.agents import conversational_agent as agent
+from app.agents import instruction_agent
+from app.services import context_packer, llm_router
+from app.services.response_cache import ResponseCache
+
+TRIAGE = {"category": "burns", "severity": "low", "confidence": 0.9}
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stream ``deltas`` from a stand-in provider; classification and tools are stubbed."""
+    state = {"deltas": [], "closed": False}
+
+    def generate_stream(query):
+        try:
+            for delta in state["deltas"]:
+                yield {"delta": delta}
+            text = "".join(state["deltas"])
+            result = {"steps": text, "sources": [], "fallback": False}
+            if state.get("partial"):
+                result.update(fallback=True, partial=True)
+            yield {"done": True, "result": result}
+        finally:
+            state["closed"] = True
+
+    monkeypatch.setattr(agent.instruction_agent, "generate_stream", generate_stream)
+    monkeypatch.setattr(agent.emergency_classifier, "classify", lambda text: dict(TRIAGE))
+    monkeypatch.setattr(agent, "_fetch_tools", lambda: {"emergency_numbers": {}, "maps": {}})
+    monkeypatch.setattr(agent, "RESPONSE_CACHE", ResponseCache(max_entries=10, ttl=0))
+    return state
+
+
+def _run(text="I burned my hand"):
+    events = list(agent.stream_message(text))
+    tokens = "".join(data["text"] for event, data in events if event == "token")
+    return events, tokens
+
+
+def test_events_arrive_in_order_and_tokens_add_up(pipeline):
+    pipeline["deltas"] = ["1) Cool the burn under running water ", "for 20 minutes.\n", "2) Cover it loosely."]
+    events, tokens = _run()
+    names = [event for event, _ in events]
+    assert names[-3:] == ["verification", "risk_confidence", "done"]
+    assert "triage" in names and names.index("triage") < names.index("verification")
+    assert tokens == "".join(pipeline["deltas"])
+    assert events[-1][1]["instructions"]["steps"] == tokens
+
+
+def test_deny_term_split_across_chunks_never_reaches_the_client(pipeline):
+    pipeline["deltas"] = ["1) Stay calm and do not ", "commit sui", "cide, call for help."]
+    events, tokens = _run()
+    assert "sui" not in tokens
+    guardrail = [data for event, data in events if event == "guardrail"]
+    assert guardrail and guardrail[0]["blocked"]
+    assert events[-1][1]["instructions"]["blocked"]
+    assert pipeline["closed"]
+
+
+def test_blocked_stream_is_not_cached(pipeline):
+    pipeline["deltas"] = ["explosives"]
+    _run()
+    assert agent.RESPONSE_CACHE.lookup("I burned my hand") is None
+
+
+def test_second_identical_request_is_served_from_the_cache(pipeline):
+    pipeline["deltas"] = ["1) Cool the burn."]
+    _run()
+    pipeline["deltas"] = ["something else"]
+    events, tokens = _run()
+    assert tokens == "1) Cool the burn."
+    assert events[-1][1]["cache"]["hit"]
+
+
+def test_provider_failure_mid_stream_tells_the_client_and_is_not_cached(pipeline):
+    pipeline["deltas"] = ["1) Cool the burn under "]
+    pipeline["partial"] = True
+    events, tokens = _run()
+    assert tokens == "1) Cool the burn under "
+    partial = [data for event, data in events if event == "partial"]
+    assert partial and partial[0]["replacement"]
+    instructions = events[-1][1]["instructions"]
+    assert instructions["partial"] and instructions["fallback"]
+    assert instructions["steps"] == partial[0]["replacement"]
+    assert agent.RESPONSE_CACHE.lookup("I burned my hand") is None
+
+
+def test_generate_stream_marks_an_interrupted_answer_partial(monkeypatch):
+    lines = ['data: {"choices": [{"delta": {"content": "1) Cool "}}]}',
+             'data: {"choices": [{"delta": {"content": "the burn"}}]}']
+
+    class _Response:
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self):
+            yield from lines
+            raise httpx.ReadTimeout("provider went quiet")
+
+    urls = []
+
+    @contextmanager
+    def stream(method, url, **kwargs):
+        urls.append(url)
+        yield _Response()
+
+    router = llm_router.LLMRouter([llm_router._Provider("groq", "https://groq.test", "key"),
+                                   llm_router._Provider("openai", "https://openai.test", "key")], preferred="groq")
+    monkeypatch.setattr(llm_router, "ROUTER", router)
+    monkeypatch.setattr(instruction_agent.http_client, "stream", stream)
+    monkeypatch.setattr(instruction_agent, "prepare_context", lambda query: context_packer.pack([]))
+    events = list(instruction_agent.generate_stream("I burned my hand"))
+    assert [e["delta"] for e in events if "delta" in e] == ["1) Cool ", "the burn"]
+    result = events[-1]["result"]
+    assert result["steps"] == "1) Cool the burn"
+    assert result["partial"] and result["fallback"]
+    # The cut-off counts against the provider, and the answer is not restarted on another one.
+    assert list(router.providers["groq"].outcomes) == [False]
+    assert len(urls) == 1
+
+
+def test_stream_stages_run_on_the_shared_pool(pipeline, monkeypatch):
+    threads = []
+
+    def classify(text):
+        threads.append(threading.current_thread().name)
+        return dict(TRIAGE)
+
+    monkeypatch.setattr(agent.emergency_classifier, "classify", classify)
+    pipeline["deltas"] = ["1) Cool the burn."]
+    for text in ("I burned my hand", "I burned my arm", "I burned my foot"):
+        _run(text)
+    assert len(threads) == 3 and all(name.startswith("stream") for name in threads)
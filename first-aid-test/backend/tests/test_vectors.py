@@ -0,0 +1,59 @@
+# tests/test_vectors.py
+import base64
+
+import numpy as np
+import pytest
+
+from app.services.vectors import EMPTY, Embedding, as_embedding
+
+
+def test_base64_roundtrip_both_byte_orders():
+    vec = Embedding.from_floats([0.5, -1.25, 3.0])
+    assert Embedding.from_base64(vec.to_base64()).tolist() == [0.5, -1.25, 3.0]
+    assert Embedding.from_base64(vec.to_base64(">"), ">").tolist() == [0.5, -1.25, 3.0]
+
+
+def test_binary_is_big_endian_float32():
+    vec = Embedding.from_floats([1.0, 2.0])
+    raw = base64.b64decode(vec.to_binary()["$binary"])
+    assert np.frombuffer(raw, dtype=">f4").tolist() == [1.0, 2.0]
+    assert Embedding.from_response(vec.to_binary()).tolist() == [1.0, 2.0]
+
+
+def test_from_response_accepts_lists_base64_and_empty():
+    vec = Embedding.from_floats([1.0, 2.0])
+    assert Embedding.from_response([1.0, 2.0]).tolist() == [1.0, 2.0]
+    assert Embedding.from_response(vec.to_base64()).tolist() == [1.0, 2.0]
+    assert Embedding.from_response(vec) is vec
+    assert not Embedding.from_response([]) and not Embedding.from_response("")
+    assert as_embedding(None) is EMPTY
+
+
+def test_buffers_are_read_only():
+    vec = Embedding.from_floats([1.0, 2.0])
+    with pytest.raises(ValueError):
+        vec.array()[0] = 5.0
+
+
+@pytest.mark.parametrize("mode, dtype, tolerance", [("float16", "float16", 1e-3), ("int8", "int8", 1e-2)])
+def test_quantize_shrinks_and_stays_close(mode, dtype, tolerance):
+    values = np.random.default_rng(0).normal(size=64).astype(np.float32)
+    vec = Embedding.from_floats(values)
+    small = vec.quantize(mode)
+    assert small.dtype == dtype
+    assert small.nbytes < vec.nbytes
+    assert np.allclose(small.array(), values, atol=tolerance * float(np.abs(values).max()))
+
+
+def test_quantize_none_and_zero_vector():
+    vec = Embedding.from_floats([0.0, 0.0])
+    assert vec.quantize("none") is vec
+    assert vec.quantize("int8").tolist() == [0.0, 0.0]
+
+
+def test_bytes_roundtrip_is_zero_copy_view():
+    vec = Embedding.from_floats([1.5, 2.5])
+    blob = vec.to_bytes()
+    again = Embedding.from_bytes(blob)
+    assert again.tolist() == [1.5, 2.5]
+    assert not again.data.flags.owndata